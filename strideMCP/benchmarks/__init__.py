@@ -0,0 +1,6 @@
+"""Offline benchmarks for strideMCP.
+
+Everything here runs against local stand-ins (a fake Strava API, a hashing
+embedder, local-mode Qdrant and a throwaway SQLite database), so results only
+depend on the code under test. Run with ``python -m benchmarks.run``.
+"""
@@ -0,0 +1,36 @@
+"""Compare two benchmark result files: python -m benchmarks.compare old.json new.json"""
+import sys
+import json
+
+
+def _flatten(node, prefix=""):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            yield from _flatten(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        yield prefix, node
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if len(argv) != 2:
+        print(__doc__)
+        return 1
+
+    with open(argv[0]) as f:
+        old = json.load(f)
+    with open(argv[1]) as f:
+        new = json.load(f)
+
+    old_values = dict(_flatten(old.get("sizes", {})))
+    new_values = dict(_flatten(new.get("sizes", {})))
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    for key in sorted(old_values.keys() & new_values.keys()):
+        before, after = old_values[key], new_values[key]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{key:<70} {before:>12} {after:>12} {change:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
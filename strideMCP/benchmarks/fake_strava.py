@@ -0,0 +1,113 @@
+import json
+import time
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from benchmarks.synthetic import summarize_activity, streams_for_activity
+
+API_PREFIX = "/api/v3"
+
+
+def _start_epoch(activity):
+    return int(datetime.fromisoformat(activity["start_date"].replace("Z", "+00:00")).timestamp())
+
+
+class _StravaHandler(BaseHTTPRequestHandler):
+    server_version = "FakeStrava/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, status: int = 200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        fake = self.server.fake_strava
+        if fake.latency:
+            time.sleep(fake.latency)
+        fake.request_count += 1
+
+        url = urlparse(self.path)
+        path = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else url.path
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        parts = [p for p in path.split("/") if p]
+
+        if parts == ["athlete"]:
+            return self._send_json({"id": fake.athlete_id, "firstname": "Synthetic", "lastname": "Athlete"})
+
+        if parts == ["athlete", "activities"]:
+            return self._send_json(fake.list_activities(params))
+
+        if len(parts) >= 2 and parts[0] == "activities" and parts[1].isdigit():
+            activity = fake.activities_by_id.get(int(parts[1]))
+            if activity is None:
+                return self._send_json({"message": "Record Not Found"}, status=404)
+            if len(parts) == 2:
+                return self._send_json(activity)
+            if parts[2:] == ["streams"]:
+                return self._send_json(streams_for_activity(activity))
+
+        self._send_json({"message": "Not Found"}, status=404)
+
+
+class _StravaHTTPServer(ThreadingHTTPServer):
+    # detail fetches are fanned out all at once, so allow a deep accept queue
+    request_queue_size = 4096
+    daemon_threads = True
+
+
+class FakeStravaServer:
+    """A threaded HTTP server answering the subset of the Strava v3 API the service uses."""
+
+    def __init__(self, activities=(), athlete_id: int = 1, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.athlete_id = athlete_id
+        self.latency = latency
+        self.set_activities(activities)
+
+        self.httpd = _StravaHTTPServer((host, port), _StravaHandler)
+        self.httpd.fake_strava = self
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def set_activities(self, activities):
+        self.activities = sorted(activities, key=_start_epoch)
+        self.activities_by_id = {a["id"]: a for a in self.activities}
+        self.request_count = 0
+
+    def list_activities(self, params: dict):
+        after = int(params.get("after", 0))
+        before = int(params["before"]) if "before" in params else None
+        page = int(params.get("page", 1))
+        per_page = int(params.get("per_page", 30))
+
+        matching = [
+            a for a in self.activities
+            if _start_epoch(a) > after and (before is None or _start_epoch(a) < before)
+        ]
+        page_items = matching[(page - 1) * per_page: page * per_page]
+        return [summarize_activity(a) for a in page_items]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,452 @@
+"""Load test one deployment with concurrent agent sessions and write the report as JSON.
+
+    python -m benchmarks.load --transport streamable-http --concurrency 32 --ramp-up 30 --duration 60
+    python -m benchmarks.load --transport stdio --concurrency 8 --activities 1000
+
+Every virtual user opens its own MCP session, over stdio (one server process
+per session, like a desktop agent) or against one streamable HTTP server, and
+keeps calling tools and the chart routes picked from a weighted mix until the
+test ends. Users start evenly spread over the ramp-up, so the timeline shows
+how latency and errors move as sessions are added. The servers run against
+the same offline stand-ins as benchmarks.run.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import httpx
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+from benchmarks.run import percentile, git_commit, RESULTS_DIR
+from benchmarks.synthetic import SyntheticAthlete, METERS_PER_MILE
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHART_ROUTES = ("plotRunData", "plotMetricsOverTime")
+
+# roughly what an agent asks for in a session, lookups and summaries dominate
+DEFAULT_MIX = {
+    "lookup_by_retrieval_query": 15,
+    "lookup_specific_run_by_date": 12,
+    "look_up_last_N_runs": 12,
+    "compute_metric_by_date_range": 10,
+    "get_training_overview": 8,
+    "find_similar_runs": 8,
+    "compute_metric_historic_avg": 6,
+    "get_training_load_trend": 6,
+    "get_data_points_for_metric_between_dates": 4,
+    "find_best_effort_in_run": 3,
+    "get_precise_splits_for_run": 3,
+    "compute_heart_rate_drift_for_run": 2,
+    "authenticate_with_strava": 1,
+    "plotRunData": 6,
+    "plotMetricsOverTime": 4,
+}
+
+METRICS = ["distance_miles", "moving_time_sec", "average_speed", "pace_min_per_mile", "total_elevation_gain"]
+LOAD_METRICS = ["distance_miles", "moving_time_sec", "total_elevation_gain"]
+QUERIES = [
+    "tempo run with a fast progression",
+    "long easy run on the weekend",
+    "hill repeats that felt hard",
+    "recovery jog after a race",
+    "track workout with fast intervals",
+]
+
+
+class Workload:
+    """Draws operations and their arguments from the synthetic history the servers were prepared with."""
+
+    def __init__(self, activities, mix: dict):
+        self.activities = activities
+        self.dates = [a["start_date"][:10] for a in activities]
+        self.operations = list(mix)
+        self.weights = [mix[op] for op in self.operations]
+
+    def pick(self, rng: random.Random):
+        return rng.choices(self.operations, self.weights)[0]
+
+    def _window(self, rng: random.Random):
+        days = rng.choice([7, 28, 90, 365])
+        end = rng.randrange(len(self.dates))
+        start = max(end - days, 0)
+        return self.dates[start], self.dates[end]
+
+    def arguments(self, op: str, rng: random.Random):
+        date = rng.choice(self.dates)
+        start_date, end_date = self._window(rng)
+        metric = rng.choice(METRICS)
+        return {
+            "authenticate_with_strava": {},
+            "lookup_specific_run_by_date": {"date": date},
+            "lookup_by_retrieval_query": {"retrieval_query": rng.choice(QUERIES)},
+            "look_up_last_N_runs": {"N": rng.randint(1, 10)},
+            "compute_metric_historic_avg": {"metric_name": metric},
+            "compute_metric_by_date_range": {
+                "metric_name": metric, "start_date": start_date, "end_date": end_date, "time_range": "custom"
+            },
+            "get_data_points_for_metric_between_dates": {
+                "metric_name": metric, "start_date": start_date, "end_date": end_date, "time_range": "custom"
+            },
+            "find_best_effort_in_run": {"date": date, "distance_meters": rng.choice([400, 1000, METERS_PER_MILE, 5000])},
+            "get_precise_splits_for_run": {"date": date, "split_meters": rng.choice([1000, METERS_PER_MILE])},
+            "compute_heart_rate_drift_for_run": {"date": date},
+            "get_training_load_trend": {"metric_name": rng.choice(LOAD_METRICS), "start_date": start_date, "end_date": end_date},
+            "get_training_overview": {
+                "retrieval_query": rng.choice(QUERIES), "metric_name": metric, "start_date": start_date, "end_date": end_date
+            },
+            "find_similar_runs": {"date": date, "limit": 5},
+        }[op]
+
+    async def call_chart(self, client: httpx.AsyncClient, op: str, rng: random.Random):
+        if op == "plotRunData":
+            activity = rng.choice(self.activities)
+            splits = [s["moving_time"] / 60 * (METERS_PER_MILE / s["distance"]) for s in activity["splits_metric"]]
+            response = await client.get("/plotRunData", params={"payload": json.dumps({"raw_mile_splits": splits})})
+        else:
+            end = rng.randrange(len(self.activities))
+            window = self.activities[max(end - rng.choice([30, 90, 365]), 0):end + 1]
+            data_points = [
+                {"value": a["distance"] / METERS_PER_MILE, "date": a["start_date"].replace("T", " ").replace("Z", "")}
+                for a in window
+            ]
+            response = await client.post("/plotMetricsOverTime", json={"data_points": data_points})
+        response.raise_for_status()
+
+
+class Recorder:
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.calls = []
+        self.sessions = []
+        self.errors = Counter()
+
+    def now(self):
+        return time.monotonic() - self.started_at
+
+    def call(self, op: str, started: float, latency: float, error: str = None):
+        self.calls.append((op, started, latency, error is None))
+        if error is not None:
+            self.errors[f"{op}: {error}"[:200]] += 1
+
+
+def rss_bytes(pid: int):
+    """Resident set size of a process from /proc, None where it cannot be read."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def child_processes():
+    """Role and pid of every direct child of this process, the servers and the stdio sessions."""
+    children = []
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read().split(b"\0")
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid != os.getpid() or b"benchmarks.load_server" not in cmdline:
+            continue
+        if b"listener" in cmdline:
+            role = "listener"
+        elif b"stdio" in cmdline:
+            role = "stdio_sessions"
+        else:
+            role = "mcp_http"
+        children.append((role, int(entry)))
+    return children
+
+
+async def sample_rss(samples: list, interval: float):
+    while True:
+        by_role = defaultdict(int)
+        for role, pid in child_processes():
+            by_role[role] += rss_bytes(pid) or 0
+        samples.append(dict(by_role))
+        await asyncio.sleep(interval)
+
+
+def start_process(workdir: str, *args):
+    log = open(os.path.join(workdir, f"{args[0]}-{args[-1]}.log"), "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.load_server", "--workdir", workdir, *args],
+        cwd=PACKAGE_DIR, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def wait_for_port(url: str, process, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} while starting")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not start within {timeout} seconds")
+
+
+def stdio_session(workdir: str, name: str, listener_url: str):
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=["-m", "benchmarks.load_server", "--workdir", workdir, "serve", "--transport", "stdio",
+              "--name", name, "--listener-url", listener_url],
+        cwd=PACKAGE_DIR,
+        env={**os.environ, "PYTHONPATH": PACKAGE_DIR},
+    )
+    return stdio_client(params, errlog=open(os.path.join(workdir, f"{name}.log"), "w"))
+
+
+async def virtual_user(index: int, args, workload: Workload, recorder: Recorder, open_transport, deadline: float):
+    rng = random.Random(args.seed * 100003 + index)
+    await asyncio.sleep(args.ramp_up * index / args.concurrency)
+
+    opened = recorder.now()
+    session_record = {"user": index, "opened": opened, "closed": None, "initialize_seconds": None, "error": None}
+    recorder.sessions.append(session_record)
+    try:
+        async with open_transport(index) as streams, ClientSession(streams[0], streams[1]) as session, \
+                httpx.AsyncClient(base_url=args.listener_url, timeout=args.request_timeout) as charts:
+            await session.initialize()
+            session_record["initialize_seconds"] = recorder.now() - opened
+
+            while recorder.now() < deadline:
+                op = workload.pick(rng)
+                started = recorder.now()
+                error = None
+                try:
+                    if op in CHART_ROUTES:
+                        await asyncio.wait_for(workload.call_chart(charts, op, rng), args.request_timeout)
+                    else:
+                        result = await asyncio.wait_for(
+                            session.call_tool(op, workload.arguments(op, rng)), args.request_timeout
+                        )
+                        if result.isError:
+                            error = (result.content[0].text if result.content else "tool error").splitlines()[0]
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                recorder.call(op, started, recorder.now() - started, error)
+
+                if args.think_time:
+                    await asyncio.sleep(rng.expovariate(1 / args.think_time))
+    except Exception as e:
+        session_record["error"] = f"{type(e).__name__}: {e}"
+        recorder.errors[f"session: {session_record['error']}"[:200]] += 1
+    session_record["closed"] = recorder.now()
+
+
+def latency_summary(latencies):
+    if not latencies:
+        return {"n": 0}
+    return {
+        "n": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+    }
+
+
+def build_report(args, recorder: Recorder, rss_samples, wall_seconds: float, ramp_end: float):
+    calls = recorder.calls
+    errors = sum(1 for *_, ok in calls if not ok)
+    steady = [c for c in calls if c[1] >= ramp_end]
+    steady_seconds = max(wall_seconds - ramp_end, 0)
+
+    operations = {}
+    for op in sorted({c[0] for c in calls}):
+        op_calls = [c for c in calls if c[0] == op]
+        op_errors = sum(1 for *_, ok in op_calls if not ok)
+        operations[op] = {
+            **latency_summary([c[2] for c in op_calls if c[3]]),
+            "calls": len(op_calls),
+            "errors": op_errors,
+            "error_rate": round(op_errors / len(op_calls), 4),
+        }
+
+    timeline = []
+    buckets = int(wall_seconds // args.bucket_seconds) + 1
+    for b in range(buckets):
+        start, end = b * args.bucket_seconds, (b + 1) * args.bucket_seconds
+        bucket = [c for c in calls if start <= c[1] < end]
+        active = sum(
+            1 for s in recorder.sessions
+            if s["initialize_seconds"] is not None and s["opened"] < end and (s["closed"] is None or s["closed"] > start)
+        )
+        timeline.append({
+            "start_seconds": start,
+            "active_sessions": active,
+            "calls": len(bucket),
+            "errors": sum(1 for *_, ok in bucket if not ok),
+            "p95_ms": round(percentile([c[2] for c in bucket], 0.95) * 1000, 3) if bucket else None,
+        })
+
+    roles = sorted({role for sample in rss_samples for role in sample})
+    rss = {
+        role: {
+            "peak_mb": round(max(s.get(role, 0) for s in rss_samples) / 2**20, 1),
+            "final_mb": round(rss_samples[-1].get(role, 0) / 2**20, 1),
+        }
+        for role in roles
+    }
+    rss["total_peak_mb"] = round(max((sum(s.values()) for s in rss_samples), default=0) / 2**20, 1)
+
+    initialize = [s["initialize_seconds"] for s in recorder.sessions if s["initialize_seconds"] is not None]
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "summary": {
+            **latency_summary([c[2] for c in calls if c[3]]),
+            "calls": len(calls),
+            "errors": errors,
+            "error_rate": round(errors / len(calls), 4) if calls else None,
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput_per_second": round(len(calls) / wall_seconds, 2) if wall_seconds else None,
+            "steady_state_throughput_per_second": round(len(steady) / steady_seconds, 2) if steady_seconds else None,
+            "steady_state": latency_summary([c[2] for c in steady if c[3]]),
+        },
+        "sessions": {
+            "opened": len(recorder.sessions),
+            "failed": sum(1 for s in recorder.sessions if s["error"]),
+            "initialize": latency_summary(initialize),
+        },
+        "operations": operations,
+        "errors": dict(recorder.errors.most_common(20)),
+        "rss": rss,
+        "timeline": timeline,
+    }
+
+
+async def run_load(args, workload: Workload):
+    recorder = Recorder()
+    ramp_end = args.ramp_up
+    deadline = args.ramp_up + args.duration
+
+    if args.transport == "stdio":
+        def open_transport(index):
+            return stdio_session(args.workdir, f"vu{index}", args.listener_url)
+    else:
+        def open_transport(index):
+            return streamablehttp_client(args.mcp_url, timeout=args.request_timeout)
+
+    rss_samples = []
+    sampler = asyncio.create_task(sample_rss(rss_samples, args.rss_interval))
+    try:
+        await asyncio.gather(*(
+            virtual_user(index, args, workload, recorder, open_transport, deadline)
+            for index in range(args.concurrency)
+        ))
+    finally:
+        sampler.cancel()
+    return build_report(args, recorder, rss_samples or [{}], recorder.now(), ramp_end)
+
+
+def parse_mix(values):
+    mix = dict(DEFAULT_MIX)
+    for value in values or []:
+        name, _, weight = value.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {name}, pick from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test of the MCP tools and chart routes")
+    parser.add_argument("--transport", choices=["stdio", "streamable-http"], default="streamable-http")
+    parser.add_argument("--concurrency", type=int, default=16, help="agent sessions at the end of the ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=30, help="seconds over which sessions are added")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to hold full concurrency after the ramp-up")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean pause in seconds between calls of one session, 0 for none")
+    parser.add_argument("--mix", nargs="*", metavar="OPERATION=WEIGHT", help="override weights of the default mix, 0 removes an operation")
+    parser.add_argument("--activities", type=int, default=1000)
+    parser.add_argument("--no-streams", action="store_true", help="do not ingest streams, the stream tools then answer with an error")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--request-timeout", type=float, default=60)
+    parser.add_argument("--bucket-seconds", type=float, default=5, help="width of the timeline buckets")
+    parser.add_argument("--rss-interval", type=float, default=0.5)
+    parser.add_argument("--mcp-port", type=int, default=5051)
+    parser.add_argument("--listener-port", type=int, default=5052)
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--output", help="report file, defaults to benchmarks/results/load_<time>_<commit>.json")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    args.workdir = tempfile.mkdtemp(prefix="stride-load-")
+    args.listener_url = f"http://127.0.0.1:{args.listener_port}"
+    args.mcp_url = f"http://127.0.0.1:{args.mcp_port}/mcp"
+    athlete = SyntheticAthlete(seed=args.seed)
+    workload = Workload(athlete.activities(args.activities), mix)
+
+    print(f"preparing {args.activities} activities in {args.workdir}", file=sys.stderr)
+    prepare = ["prepare", "--activities", str(args.activities), "--seed", str(args.seed)]
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.load_server", "--workdir", args.workdir, *prepare]
+        + ([] if args.no_streams else ["--streams"]),
+        cwd=PACKAGE_DIR, check=True, stdout=subprocess.DEVNULL
+    )
+
+    processes = [start_process(args.workdir, "listener", "--port", str(args.listener_port))]
+    try:
+        wait_for_port(args.listener_url, processes[0])
+        if args.transport == "streamable-http":
+            processes.append(start_process(
+                args.workdir, "serve", "--transport", "streamable-http", "--listener-url", args.listener_url,
+                "--port", str(args.mcp_port)
+            ))
+            wait_for_port(args.mcp_url, processes[-1])
+
+        print(f"running {args.concurrency} {args.transport} sessions, {args.ramp_up}s ramp-up and {args.duration}s at full load", file=sys.stderr)
+        report = asyncio.run(run_load(args, workload))
+        report["config"]["mix"] = mix
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        if not args.keep_workdir:
+            shutil.rmtree(args.workdir, ignore_errors=True)
+
+    summary = report["summary"]
+    print(
+        f"{summary['calls']} calls, {summary['throughput_per_second']}/s, "
+        f"p50 {summary.get('p50_ms')} ms, p95 {summary.get('p95_ms')} ms, p99 {summary.get('p99_ms')} ms, "
+        f"error rate {summary['error_rate']}, peak RSS {report['rss']['total_peak_mb']} MB",
+        file=sys.stderr
+    )
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"load_{datetime.now().strftime('%Y%m%dT%H%M%S')}_{report['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"report written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Server side of the load test, the real MCP server and listener wired to the local stand-ins.
+
+    python -m benchmarks.load_server --workdir DIR prepare --activities 1000 --streams
+    python -m benchmarks.load_server --workdir DIR serve --transport stdio --name vu3
+    python -m benchmarks.load_server --workdir DIR serve --transport streamable-http --port 5051
+    python -m benchmarks.load_server --workdir DIR listener --port 5052
+
+`prepare` ingests a synthetic athlete once, every other command serves that
+data. Local-mode Qdrant can only be opened by one process, so each serving
+process works on its own copy of the prepared collection.
+"""
+import os
+import sys
+import shutil
+import argparse
+import contextlib
+from benchmarks.fake_strava import FakeStravaServer
+from benchmarks.synthetic import SyntheticAthlete
+from benchmarks.stand_ins import HashEmbedder, configure_environment, disposable_database_url, reset_stores
+
+DATABASE_NAME = "load"
+
+
+def _use_stand_in_embedder():
+    from server.services.qdrant_tool import qdrant_service
+
+    qdrant_service.embedder = HashEmbedder()
+    qdrant_service.embedding_model = qdrant_service.embedder.model
+    # hashed vectors are not calibrated like Gemini's, keep every neighbour
+    qdrant_service.score_threshold = 0.0
+
+
+def _own_qdrant_copy(workdir: str, name: str):
+    path = os.path.join(workdir, f"qdrant-{name}")
+    shutil.rmtree(path, ignore_errors=True)
+    shutil.copytree(os.path.join(workdir, "qdrant"), path)
+    os.environ["QDRANT_PATH"] = path
+
+
+def prepare(args):
+    fake_strava = FakeStravaServer().start()
+    try:
+        configure_environment(args.workdir, fake_strava.base_url)
+        _use_stand_in_embedder()
+        from server.services.strava_service import StravaService
+
+        fake_strava.set_activities(SyntheticAthlete(seed=args.seed).activities(args.activities))
+        reset_stores(args.workdir, DATABASE_NAME)
+        StravaService("load-test-token", ingest_streams=args.streams).run()
+    finally:
+        fake_strava.stop()
+
+
+def serve(args):
+    # tools never call Strava, an unreachable url makes any accidental call fail fast
+    configure_environment(args.workdir, "http://127.0.0.1:9")
+    _own_qdrant_copy(args.workdir, args.name)
+    os.environ["MCP_TRANSPORT"] = args.transport
+    os.environ["PORT"] = str(args.port)
+    os.environ["LISTENER_URL"] = args.listener_url
+
+    # stdout carries the protocol over stdio, keep startup output off it
+    with contextlib.redirect_stdout(sys.stderr):
+        _use_stand_in_embedder()
+        from server.database.db import init_db
+        from server.main import run_mcp
+        init_db(disposable_database_url(args.workdir, DATABASE_NAME))
+    run_mcp()
+
+
+def listener(args):
+    configure_environment(args.workdir, "http://127.0.0.1:9")
+    _own_qdrant_copy(args.workdir, "listener")
+    os.environ["LISTENER_URL"] = f"http://127.0.0.1:{args.port}"
+
+    import uvicorn
+    _use_stand_in_embedder()
+    from server.database.db import init_db
+    from server.main import mcp_listener
+    # the listener's lifespan keeps a session that is already open
+    init_db(disposable_database_url(args.workdir, DATABASE_NAME))
+    uvicorn.run(mcp_listener, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="strideMCP processes for the load test")
+    parser.add_argument("--workdir", required=True)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    prepare_parser = commands.add_parser("prepare")
+    prepare_parser.add_argument("--activities", type=int, default=1000)
+    prepare_parser.add_argument("--seed", type=int, default=0)
+    prepare_parser.add_argument("--streams", action="store_true")
+
+    serve_parser = commands.add_parser("serve")
+    serve_parser.add_argument("--transport", choices=["stdio", "streamable-http"], default="stdio")
+    serve_parser.add_argument("--port", type=int, default=5051)
+    serve_parser.add_argument("--name", default="mcp")
+    serve_parser.add_argument("--listener-url", default="http://127.0.0.1:5052")
+
+    listener_parser = commands.add_parser("listener")
+    listener_parser.add_argument("--port", type=int, default=5052)
+
+    args = parser.parse_args(argv)
+    {"prepare": prepare, "serve": serve, "listener": listener}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Run the offline benchmark suite and write the results as JSON.
+
+    python -m benchmarks.run --sizes 100 1000 10000 --iterations 30
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from benchmarks.synthetic import SyntheticAthlete
+from benchmarks.fake_strava import FakeStravaServer
+from benchmarks.stand_ins import HashEmbedder, configure_environment, reset_stores
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+LISTENER_PORT = 5000
+
+
+def percentile(samples, q: float):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    index = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        "n": len(samples),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+    }
+
+
+# one loop for every call, like the MCP server, so loop and thread pool startup is not timed
+_event_loop = asyncio.new_event_loop()
+
+
+def call_tool(tool, kwargs):
+    result = tool(**kwargs)
+    if inspect.isawaitable(result):
+        result = _event_loop.run_until_complete(result)
+    return result
+
+
+def tool_arguments(activities):
+    """Arguments for every tool registered in run_mcp, drawn from the synthetic history."""
+    last = activities[-1]["start_date"][:10]
+    first = activities[0]["start_date"][:10]
+    window_start = activities[max(len(activities) - 30, 0)]["start_date"][:10]
+    return {
+        "authenticate_with_strava": {},
+        "lookup_specific_run_by_date": {"date": last},
+        "lookup_by_retrieval_query": {"retrieval_query": "tempo run with a fast progression"},
+        "look_up_last_N_runs": {"N": 5},
+        "compute_metric_historic_avg": {"metric_name": "pace_min_per_mile"},
+        "compute_metric_by_date_range": {
+            "metric_name": "distance_miles", "start_date": window_start, "end_date": last, "time_range": "last month"
+        },
+        "get_data_points_for_metric_between_dates": {
+            "metric_name": "distance_miles", "start_date": first, "end_date": last, "time_range": "all time"
+        },
+        "find_best_effort_in_run": {"date": last, "distance_meters": 400},
+        "get_precise_splits_for_run": {"date": last, "split_meters": 1609.34},
+        "compute_heart_rate_drift_for_run": {"date": last},
+        "get_training_load_trend": {"metric_name": "distance_miles", "start_date": window_start, "end_date": last},
+        "get_training_overview": {
+            "retrieval_query": "long easy run", "metric_name": "distance_miles", "start_date": window_start, "end_date": last
+        },
+        "find_similar_runs": {"date": last, "activity_id": None, "limit": 5},
+    }
+
+
+def start_listener():
+    import uvicorn
+    from server.main import mcp_listener
+
+    server = uvicorn.Server(uvicorn.Config(mcp_listener, host="127.0.0.1", port=LISTENER_PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def bench_ingest(workdir: str, size: int, activities, fake_strava: FakeStravaServer, ingest_streams: bool):
+    from server.services.strava_service import StravaService
+    from server.database.queries import get_sync_state
+
+    fake_strava.set_activities(activities)
+    reset_stores(workdir, f"bench_{size}")
+
+    start = time.perf_counter()
+    StravaService("benchmark-token", ingest_streams=ingest_streams).run()
+    elapsed = time.perf_counter() - start
+    strava_requests = fake_strava.request_count
+
+    sync_state = get_sync_state(1)
+    ingested = sync_state.total_embedded if sync_state else 0
+    return {
+        "activities": size,
+        "ingested": ingested,
+        "seconds": round(elapsed, 3),
+        "activities_per_second": round(ingested / elapsed, 2) if elapsed else None,
+        "strava_requests": strava_requests,
+    }
+
+
+def _time_calls(tool, kwargs, iterations: int, before_call=None):
+    samples = []
+    errors = 0
+    for _ in range(iterations):
+        if before_call:
+            before_call()
+        start = time.perf_counter()
+        try:
+            call_tool(tool, kwargs)
+        except Exception:
+            errors += 1
+        samples.append(time.perf_counter() - start)
+    return {**summarize(samples), "errors": errors}
+
+
+def bench_tools(activities, iterations: int):
+    from server.main import MCP_TOOLS
+    from server.services.cache_service import tool_cache
+
+    arguments = tool_arguments(activities)
+    results = {}
+    for tool in MCP_TOOLS:
+        kwargs = arguments.get(tool.__name__)
+        if kwargs is None:
+            results[tool.__name__] = {"skipped": "no benchmark arguments defined"}
+            continue
+
+        # cold calls always miss the result cache, warm calls repeat the same question
+        results[tool.__name__] = {
+            "cold": _time_calls(tool, kwargs, iterations, before_call=tool_cache.clear),
+            "warm": _time_calls(tool, kwargs, iterations),
+        }
+    return results
+
+
+def bench_charts(activities, iterations: int):
+    import httpx
+    from benchmarks.synthetic import METERS_PER_MILE
+
+    data_points = [
+        {"value": a["distance"] / METERS_PER_MILE, "date": a["start_date"].replace("T", " ").replace("Z", "")}
+        for a in activities
+    ]
+    splits = [s["moving_time"] / 60 * (METERS_PER_MILE / s["distance"]) for s in activities[-1]["splits_metric"]]
+    base_url = f"http://127.0.0.1:{LISTENER_PORT}"
+
+    over_time, mile_splits = [], []
+    with httpx.Client(base_url=base_url, timeout=120) as client:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            client.post("/plotMetricsOverTime", json={"data_points": data_points}).raise_for_status()
+            over_time.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            client.get("/plotRunData", params={"payload": json.dumps({"raw_mile_splits": splits})}).raise_for_status()
+            mile_splits.append(time.perf_counter() - start)
+
+    return {"plotMetricsOverTime": summarize(over_time), "plotRunData": summarize(mile_splits)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline strideMCP benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--iterations", type=int, default=30, help="calls per tool and chart per size")
+    parser.add_argument("--chart-iterations", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--streams", action="store_true", help="also ingest activity streams")
+    parser.add_argument("--output", help="results file, defaults to benchmarks/results/<time>_<commit>.json")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="stride-bench-")
+    fake_strava = FakeStravaServer().start()
+    configure_environment(workdir, fake_strava.base_url)
+
+    from server.services.qdrant_tool import qdrant_service
+    qdrant_service.embedder = HashEmbedder()
+    qdrant_service.embedding_model = qdrant_service.embedder.model
+    # hashed vectors are not calibrated like Gemini's, keep every neighbour
+    qdrant_service.score_threshold = 0.0
+
+    # the listener initializes the database on startup, give it a disposable one first
+    reset_stores(workdir, "bench_startup")
+    listener = start_listener()
+    athlete = SyntheticAthlete(seed=args.seed)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": {},
+    }
+    try:
+        for size in args.sizes:
+            print(f"benchmarking {size} activities", file=sys.stderr)
+            activities = athlete.activities(size)
+            results["sizes"][str(size)] = {
+                "ingest": bench_ingest(workdir, size, activities, fake_strava, args.streams),
+                "tools": bench_tools(activities, args.iterations),
+                "charts": bench_charts(activities, args.chart_iterations),
+            }
+    finally:
+        listener.should_exit = True
+        fake_strava.stop()
+        _event_loop.close()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%dT%H%M%S')}_{results['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=4)
+    print(f"results written to {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
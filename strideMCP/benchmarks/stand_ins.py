@@ -0,0 +1,77 @@
+import os
+import re
+import math
+import hashlib
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class HashEmbedder:
+    """Deterministic embedder that hashes word unigrams and bigrams into a fixed size vector.
+
+    Texts sharing words end up close in cosine space, which is enough to make
+    vector search return meaningful neighbours without calling Gemini.
+    """
+
+    def __init__(self, dimensions: int = 768):
+        self.model = "hash-embedder"
+        self.dimensions = dimensions
+
+    def _vector(self, text: str):
+        vector = [0.0] * self.dimensions
+        words = WORD_PATTERN.findall(text.lower())
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[index] += sign
+
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, query: str):
+        return self._vector(query)
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, query: str):
+        return self.embed_query(query)
+
+
+def configure_environment(workdir: str, strava_api_url: str):
+    """Point the server at local stand-ins. Must run before any server module is imported."""
+    os.environ["STRAVA_API_URL"] = strava_api_url
+    os.environ["QDRANT_PATH"] = os.path.join(workdir, "qdrant")
+    os.environ["STREAMS_DIR"] = os.path.join(workdir, "streams")
+    os.environ.pop("QDRANT_URL", None)
+    # synthetic histories reach back years, the first sync must see all of them
+    os.environ["INITIAL_SYNC_AFTER"] = "2000-01-01"
+    # authenticate_with_strava builds its authorization url with it
+    os.environ.setdefault("CLIENT_ID", "0")
+
+
+def disposable_database_url(workdir: str, name: str):
+    return f"sqlite:///{os.path.join(workdir, name)}.db"
+
+
+def reset_stores(workdir: str, name: str):
+    """Give each benchmark run an empty Qdrant collection and a fresh database file."""
+    from server.database.db import init_db, get_db
+    from server.services.qdrant_tool import qdrant_service
+
+    # build a fresh collection behind the alias, then drop every older one
+    qdrant_service.swap_alias(qdrant_service.create_collection_version())
+    live = qdrant_service.resolve_collection()
+    for collection in qdrant_service.client.get_collections().collections:
+        if collection.name != live:
+            qdrant_service.client.delete_collection(collection.name)
+
+    try:
+        get_db().remove()
+    except ValueError:
+        pass
+    init_db(disposable_database_url(workdir, name))
@@ -0,0 +1,162 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+METERS_PER_MILE = 1609.34
+
+# run type: (distance range in miles, pace factor relative to easy pace, weight)
+RUN_TYPES = {
+    "easy": ((3.0, 7.0), 1.0, 0.45),
+    "recovery": ((2.0, 4.0), 1.12, 0.1),
+    "tempo": ((4.0, 8.0), 0.86, 0.15),
+    "intervals": ((4.0, 7.0), 0.9, 0.1),
+    "long": ((10.0, 20.0), 1.04, 0.2),
+}
+
+RUN_NAMES = {
+    "easy": ["Morning Run", "Easy Miles", "Lunch Run", "Evening Run"],
+    "recovery": ["Recovery Jog", "Shakeout"],
+    "tempo": ["Tempo Tuesday", "Threshold Run", "Progression Run"],
+    "intervals": ["Track Repeats", "Hill Repeats", "Fartlek"],
+    "long": ["Long Run", "Sunday Long Run"],
+}
+
+GEAR = ["Nike Pegasus 41", "Saucony Endorphin Speed 4", "Hoka Clifton 9"]
+
+
+class SyntheticAthlete:
+    """Generates reproducible Strava activity detail payloads for one athlete."""
+
+    def __init__(self, athlete_id: int = 1, seed: int = 0, easy_pace_min_per_mile: float = 9.0,
+                 end_date: datetime = datetime(2025, 10, 1, tzinfo=timezone.utc)):
+        self.athlete_id = athlete_id
+        self.seed = seed
+        self.easy_pace_min_per_mile = easy_pace_min_per_mile
+        self.end_date = end_date
+
+    def activities(self, n: int):
+        """Return n activity details, one per day, oldest first."""
+        rng = random.Random(self.seed)
+        run_types = list(RUN_TYPES)
+        weights = [RUN_TYPES[t][2] for t in run_types]
+
+        activities = []
+        for i in range(n):
+            run_type = rng.choices(run_types, weights)[0]
+            start = self.end_date - timedelta(days=n - i) + timedelta(hours=rng.randint(6, 19), minutes=rng.randint(0, 59))
+            activities.append(self._activity(rng, i, run_type, start))
+        return activities
+
+    def _activity(self, rng: random.Random, index: int, run_type: str, start: datetime):
+        (low, high), pace_factor, _ = RUN_TYPES[run_type]
+        distance_m = rng.uniform(low, high) * METERS_PER_MILE
+        base_speed = METERS_PER_MILE / (self.easy_pace_min_per_mile * pace_factor * 60)
+
+        splits = self._splits(rng, run_type, distance_m, base_speed)
+        moving_time = sum(s["moving_time"] for s in splits)
+        elapsed_time = sum(s["elapsed_time"] for s in splits)
+        elevation_gain = sum(max(s["elevation_difference"], 0) for s in splits)
+        gear_name = rng.choice(GEAR)
+
+        return {
+            "id": self.athlete_id * 10_000_000 + index + 1,
+            "athlete": {"id": self.athlete_id},
+            "name": rng.choice(RUN_NAMES[run_type]),
+            "description": f"Synthetic {run_type} run",
+            "type": "Run",
+            "sport_type": "Run",
+            "distance": round(distance_m, 1),
+            "moving_time": moving_time,
+            "elapsed_time": elapsed_time,
+            "total_elevation_gain": round(elevation_gain, 1),
+            "start_date": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "start_date_local": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "timezone": "(GMT-08:00) America/Los_Angeles",
+            "average_speed": round(distance_m / moving_time, 3),
+            "max_speed": round(max(s["average_speed"] for s in splits) * 1.2, 3),
+            "average_heartrate": round(sum(s["average_heartrate"] for s in splits) / len(splits), 1),
+            "pr_count": rng.choice([0, 0, 0, 1, 2]),
+            "gear": {"id": f"g{GEAR.index(gear_name) + 1}", "name": gear_name},
+            "splits_metric": splits,
+        }
+
+    def _splits(self, rng: random.Random, run_type: str, distance_m: float, base_speed: float):
+        splits = []
+        remaining = distance_m
+        split_number = 1
+        heartrate = rng.uniform(135, 145)
+        while remaining > 1:
+            split_distance = min(1000.0, remaining)
+            speed = base_speed * (1 + rng.gauss(0, 0.03))
+            if run_type == "intervals":
+                speed *= 1.12 if split_number % 2 else 0.9
+            elif run_type == "tempo":
+                # progression, each km slightly quicker than the last
+                speed *= 1 + 0.01 * split_number
+            elevation_difference = rng.gauss(0, 6)
+            moving_time = max(int(round(split_distance / speed)), 1)
+            heartrate += rng.uniform(0, 1.5)
+
+            splits.append({
+                "distance": round(split_distance, 1),
+                "elapsed_time": moving_time + rng.randint(0, 4),
+                "elevation_difference": round(elevation_difference, 1),
+                "moving_time": moving_time,
+                "split": split_number,
+                "average_speed": round(split_distance / moving_time, 3),
+                "average_grade_adjusted_speed": round(split_distance / moving_time, 3),
+                "average_heartrate": round(heartrate, 1),
+                "pace_zone": 2,
+            })
+            remaining -= split_distance
+            split_number += 1
+        return splits
+
+
+def summarize_activity(detail: dict):
+    """The summary representation returned by /athlete/activities."""
+    summary_keys = (
+        "id", "athlete", "name", "type", "sport_type", "distance", "moving_time", "elapsed_time",
+        "total_elevation_gain", "start_date", "start_date_local", "timezone", "average_speed",
+        "max_speed", "average_heartrate", "pr_count",
+    )
+    return {key: detail[key] for key in summary_keys if key in detail}
+
+
+def streams_for_activity(detail: dict):
+    """1 Hz time/distance/heartrate/altitude/cadence streams consistent with the km splits.
+
+    Streams are derived from the activity id, so they are reproducible without
+    being kept in memory for every activity.
+    """
+    rng = random.Random(detail["id"])
+    time_data, distance_data, heartrate_data, altitude_data, cadence_data = [0], [0.0], [], [], []
+    altitude = 30.0
+    previous_heartrate = detail["splits_metric"][0]["average_heartrate"] - 5
+
+    for split in detail["splits_metric"]:
+        seconds = split["moving_time"]
+        speed = split["distance"] / seconds
+        climb_per_second = split["elevation_difference"] / seconds
+        for _ in range(seconds):
+            time_data.append(time_data[-1] + 1)
+            distance_data.append(round(distance_data[-1] + speed * (1 + rng.gauss(0, 0.02)), 1))
+            altitude += climb_per_second
+            altitude_data.append(round(altitude, 1))
+            previous_heartrate += (split["average_heartrate"] - previous_heartrate) * 0.05 + rng.gauss(0, 0.5)
+            heartrate_data.append(int(round(previous_heartrate)))
+            cadence_data.append(int(round(84 + speed * 2 + rng.gauss(0, 1))))
+
+    heartrate_data.insert(0, heartrate_data[0])
+    altitude_data.insert(0, 30.0)
+    cadence_data.insert(0, cadence_data[0])
+
+    def stream(data):
+        return {"data": data, "series_type": "distance", "original_size": len(data), "resolution": "high"}
+
+    return {
+        "time": stream(time_data),
+        "distance": stream(distance_data),
+        "heartrate": stream(heartrate_data),
+        "altitude": stream(altitude_data),
+        "cadence": stream(cadence_data),
+    }
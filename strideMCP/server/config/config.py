@@ -6,8 +6,53 @@ load_dotenv()
 
 PORT: int = int(os.getenv('PORT', 5050))
 
+# postgres, or sqlite to keep the metric tables in an embedded file next to the server
+DATABASE_BACKEND: str = os.getenv('DATABASE_BACKEND', 'postgres')
 DATABASE_HOST: str = os.getenv('DATABASE_HOST')
-DATABASE_PORT: int = int(os.getenv('DATABASE_PORT'))
+DATABASE_PORT: int = int(os.getenv('DATABASE_PORT', 5432))
 DATABASE_USER: str = os.getenv('DATABASE_USER')
 DATABASE_PASSWORD: str = os.getenv('DATABASE_PASSWORD')
-DATABASE_NAME: str = os.getenv('DATABASE_NAME')
\ No newline at end of file
+DATABASE_NAME: str = os.getenv('DATABASE_NAME')
+DATABASE_PATH: str = os.getenv('DATABASE_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'stride.db'))
+
+STRAVA_API_URL: str = os.getenv('STRAVA_API_URL', 'https://www.strava.com/api/v3')
+# activities before this date are never pulled by the first incremental sync
+INITIAL_SYNC_AFTER: str = os.getenv('INITIAL_SYNC_AFTER', '2025-06-01')
+# activity detail and stream requests a sync keeps in flight at once
+STRAVA_MAX_CONCURRENT_REQUESTS: int = int(os.getenv('STRAVA_MAX_CONCURRENT_REQUESTS', 8))
+
+# raw activity streams are optional, they cost one extra Strava request per activity
+INGEST_STREAMS: bool = os.getenv('INGEST_STREAMS', '').lower() in ('1', 'true', 'yes')
+STREAMS_DIR: str = os.getenv('STREAMS_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'streams'))
+
+LISTENER_HOST: str = os.getenv('LISTENER_HOST', '127.0.0.1')
+LISTENER_PORT: int = int(os.getenv('LISTENER_PORT', 5000))
+LISTENER_WORKERS: int = int(os.getenv('LISTENER_WORKERS', 1))
+# base url the listener is reachable on, used for chart links and the OAuth redirect
+LISTENER_URL: str = os.getenv('LISTENER_URL', f'http://127.0.0.1:{LISTENER_PORT}')
+
+# stdio, streamable-http or sse, the http transports listen on PORT
+MCP_TRANSPORT: str = os.getenv('MCP_TRANSPORT', 'stdio')
+MCP_HOST: str = os.getenv('MCP_HOST', '127.0.0.1')
+MCP_WORKERS: int = int(os.getenv('MCP_WORKERS', 1))
+
+# a sync holding its lease longer than this is assumed dead and can be taken over
+SYNC_LEASE_SECONDS: int = int(os.getenv('SYNC_LEASE_SECONDS', 3600))
+# how often a process checks the shared data version before trusting its tool cache
+CACHE_VERSION_CHECK_SECONDS: float = float(os.getenv('CACHE_VERSION_CHECK_SECONDS', 1))
+
+# every tool call shares this budget across all of its downstream calls
+TOOL_DEADLINE_SECONDS: float = float(os.getenv('TOOL_DEADLINE_SECONDS', 20))
+# longest a single call to each dependency may take, the tool deadline can cut it shorter
+STRAVA_TIMEOUT_SECONDS: float = float(os.getenv('STRAVA_TIMEOUT_SECONDS', 30))
+EMBEDDER_TIMEOUT_SECONDS: float = float(os.getenv('EMBEDDER_TIMEOUT_SECONDS', 10))
+QDRANT_TIMEOUT_SECONDS: float = float(os.getenv('QDRANT_TIMEOUT_SECONDS', 5))
+LISTENER_TIMEOUT_SECONDS: float = float(os.getenv('LISTENER_TIMEOUT_SECONDS', 15))
+# enforced by postgres per statement, so long jobs are not cut off as a whole, sqlite waits this long for a write lock
+DATABASE_STATEMENT_TIMEOUT_SECONDS: float = float(os.getenv('DATABASE_STATEMENT_TIMEOUT_SECONDS', 30))
+# consecutive failures that open a dependency's circuit, and how long it stays open
+CIRCUIT_BREAKER_FAILURES: int = int(os.getenv('CIRCUIT_BREAKER_FAILURES', 5))
+CIRCUIT_BREAKER_RESET_SECONDS: float = float(os.getenv('CIRCUIT_BREAKER_RESET_SECONDS', 30))
+# send a duplicate of an idempotent read when the first has not answered after this long, 0 disables hedging
+QDRANT_HEDGE_AFTER_SECONDS: float = float(os.getenv('QDRANT_HEDGE_AFTER_SECONDS', 0))
+EMBEDDER_HEDGE_AFTER_SECONDS: float = float(os.getenv('EMBEDDER_HEDGE_AFTER_SECONDS', 0))
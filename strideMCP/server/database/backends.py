@@ -0,0 +1,85 @@
+import os
+from sqlalchemy import event
+from server.config.config import (
+    DATABASE_BACKEND,
+    DATABASE_HOST,
+    DATABASE_PORT,
+    DATABASE_USER,
+    DATABASE_PASSWORD,
+    DATABASE_NAME,
+    DATABASE_PATH,
+    DATABASE_STATEMENT_TIMEOUT_SECONDS
+)
+
+
+class PostgresBackend:
+    """A networked Postgres server, shared by every process and node."""
+
+    def url(self) -> str:
+        if not DATABASE_HOST:
+            raise ValueError("DATABASE_HOST is not set")
+        elif not DATABASE_PORT:
+            raise ValueError("DATABASE_PORT is not set")
+        elif not DATABASE_USER:
+            raise ValueError("DATABASE_USER is not set")
+        elif not DATABASE_PASSWORD:
+            raise ValueError("DATABASE_PASSWORD is not set")
+        elif not DATABASE_NAME:
+            raise ValueError("DATABASE_NAME is not set")
+        return f"postgresql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
+
+    def connect_args(self) -> dict:
+        return {
+            'options': f'-c timezone=UTC -c statement_timeout={int(DATABASE_STATEMENT_TIMEOUT_SECONDS * 1000)}',
+            'connect_timeout': 10
+        }
+
+    def configure(self, engine):
+        pass
+
+
+class SQLiteBackend:
+    """An embedded SQLite file in WAL mode, for a single athlete served without a database server.
+
+    WAL lets the MCP server and the listener read while a sync writes, from
+    separate processes on the same host.
+    """
+
+    def url(self) -> str:
+        os.makedirs(os.path.dirname(os.path.abspath(DATABASE_PATH)), exist_ok=True)
+        return f"sqlite:///{DATABASE_PATH}"
+
+    def connect_args(self) -> dict:
+        # how long a writer waits on another process's write lock before giving up
+        return {'timeout': DATABASE_STATEMENT_TIMEOUT_SECONDS}
+
+    def configure(self, engine):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # with WAL a crash can only lose the last commits, never corrupt the file
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+BACKENDS = {
+    "postgres": PostgresBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+def configured_backend():
+    """The backend DATABASE_BACKEND names."""
+    if DATABASE_BACKEND not in BACKENDS:
+        raise ValueError(f"DATABASE_BACKEND must be one of {', '.join(BACKENDS)}, not {DATABASE_BACKEND}")
+    return BACKENDS[DATABASE_BACKEND]()
+
+
+def backend_for_url(database_url: str):
+    """The backend an explicit database url belongs to."""
+    if database_url.startswith("sqlite"):
+        return SQLiteBackend()
+    return PostgresBackend()
@@ -1,52 +1,53 @@
+import asyncio
 from sqlalchemy import create_engine
 from sqlalchemy.orm import scoped_session, sessionmaker
-from server.config.config import (
-    DATABASE_HOST,
-    DATABASE_PORT,
-    DATABASE_USER,
-    DATABASE_PASSWORD,
-    DATABASE_NAME
-)
+from server.database.backends import configured_backend, backend_for_url
+from server.database.schema import ensure_current_schema
+from server.services.resilience_service import resilience_service
 
 from server.models.base import Base
-from server.models import rolling_average_snapshots, snapshot_metrics
-
-DATABASE_URL = f"postgresql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
+from server.models import rolling_average_snapshots, snapshot_metrics, sync_state, rolling_metric_series
+from server.models import strava_token, sync_job, data_version, backfill_window, activity_detail
 
 db_session = None
 
 
-def init_db():
-    """Initialize the database session"""
-    if not DATABASE_HOST:
-        raise ValueError("DATABASE_HOST is not set")
-    elif not DATABASE_PORT:
-        raise ValueError("DATABASE_PORT is not set")
-    elif not DATABASE_USER:
-        raise ValueError("DATABASE_USER is not set")
-    elif not DATABASE_PASSWORD:
-        raise ValueError("DATABASE_PASSWORD is not set")
-    elif not DATABASE_NAME:
-        raise ValueError("DATABASE_NAME is not set")
+def init_db(database_url: str = None, check_schema: bool = True):
+    """Initialize the database session, against database_url when one is given.
+
+    Raises SchemaOutdated when check_schema is set and the database still has the
+    snapshot schema of an older version, only the migration itself skips the check.
+    """
+    if database_url:
+        _create_session(database_url, backend_for_url(database_url), check_schema)
+    elif db_session is not None:
+        # the listener and the MCP server share one session when they run in one process
+        return
     else:
-        global db_session
-        engine = create_engine(
-            DATABASE_URL,
-            connect_args={
-                'options': '-c timezone=UTC'
-            }
-        )
-        db_session = scoped_session(
-            sessionmaker(
-                autocommit=False,
-                autoflush=False,
-                bind=engine
-            )
+        backend = configured_backend()
+        _create_session(backend.url(), backend, check_schema)
+
+def _create_session(database_url: str, backend, check_schema: bool):
+    global db_session
+    engine = create_engine(
+        database_url,
+        connect_args=backend.connect_args()
+    )
+    backend.configure(engine)
+
+    # Create all tables, existing ones are left as they are
+    Base.metadata.create_all(bind=engine)
+    if check_schema:
+        ensure_current_schema(engine)
+
+    db_session = scoped_session(
+        sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            bind=engine
         )
-        
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
-        print("Database initialized")
+    )
+    print("Database initialized")
 
 def get_db():
     """Get the database session"""
@@ -54,6 +55,17 @@ def get_db():
         raise ValueError("Database session is not initialized")
     return db_session
         
+async def run_db(query, *args, **kwargs):
+    """Run a blocking query in a worker thread, so async callers keep the event loop free"""
+    def run():
+        try:
+            return query(*args, **kwargs)
+        finally:
+            # sessions are thread local, hand the connection back before the thread is reused
+            get_db().remove()
+    # bounded by the calling tool's deadline, the statement timeout bounds everything else
+    return await resilience_service.call("database", asyncio.to_thread, run)
+
 def shutdown_session(exception=None):
     """Remove the session at the end of request"""
     db_session.remove()
\ No newline at end of file
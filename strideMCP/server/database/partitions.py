@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+# months whose partition this process already created or found
+_known_partitions = set()
+# session.info key for the months created in a transaction that has not committed yet
+PENDING_PARTITIONS = "pending_metric_partitions"
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def partition_name(month: datetime) -> str:
+    return f"snapshot_metrics_{month:%Y_%m}"
+
+
+def ensure_metric_partitions(db, dates):
+    """Create the monthly snapshot_metrics partitions covering dates, a no-op except on postgres.
+
+    The partitions are created in the caller's transaction and the caller commits
+    them with its rows, they are only remembered once that commit succeeds.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+
+    pending = db.info.setdefault(PENDING_PARTITIONS, set())
+    months = {month_start(date) for date in dates} - _known_partitions - pending
+    for month in sorted(months):
+        next_month = month_start(month + timedelta(days=32))
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF snapshot_metrics "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+        ))
+    pending.update(months)
+
+
+def forget_metric_partitions(db):
+    """Drop the remembered partitions, for code that recreates snapshot_metrics and with it every partition."""
+    _known_partitions.clear()
+    db.info.pop(PENDING_PARTITIONS, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_partitions(session):
+    _known_partitions.update(session.info.pop(PENDING_PARTITIONS, ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_partitions(session):
+    # the rolled back transaction took its partitions with it
+    session.info.pop(PENDING_PARTITIONS, None)
+
+
+def is_partitioned(db, table: str) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table"
+    ), {"table": table}).first() is not None
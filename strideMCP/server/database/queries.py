@@ -1,9 +1,14 @@
 from server.database.db import get_db
 from sqlalchemy import func
+from server.services.metrics_service import metrics_service
 from server.models.rolling_average_snapshots import RollingAverageSnapshots
 from server.models.snapshot_metrics import SnapshotMetrics
+from server.models.sync_state import SyncState
+from server.models.rolling_metric_series import RollingMetricSeries
+from server.models.backfill_window import BackfillWindow
 
 
+@metrics_service.timed("sql.historic_average")
 def get_historic_average_by_metric(metric_name: str):
     db = get_db()
 
@@ -18,37 +23,89 @@ def get_historic_average_by_metric(metric_name: str):
         'average' : result.average
     }
 
+@metrics_service.timed("sql.average_between_dates")
 def get_average_by_metric_between_dates(metric_name: str, start_date, end_date):
     db = get_db()
 
+    # date_of_run is copied onto every metric row, so the (metric_name, date_of_run)
+    # index answers this without touching rolling_average_snapshots
     result = db.query(
         func.avg(SnapshotMetrics.metric_value).label('average')
-    ).join(
-        RollingAverageSnapshots, SnapshotMetrics.snapshot_id == RollingAverageSnapshots.id
     ).filter(
         SnapshotMetrics.metric_name == metric_name,
-        RollingAverageSnapshots.date_of_run >= start_date,
-        RollingAverageSnapshots.date_of_run <= end_date
+        SnapshotMetrics.date_of_run >= start_date,
+        SnapshotMetrics.date_of_run <= end_date
     ).first()
 
     return {
         'average': result.average
     }
 
+@metrics_service.timed("sql.data_points_between_dates")
 def query_get_data_points_for_metric_between_dates(metric_name: str, start_date, end_date):
     db = get_db()
 
     results = db.query(
         SnapshotMetrics.metric_value,
-        RollingAverageSnapshots.date_of_run
-    ).join(
-        RollingAverageSnapshots, SnapshotMetrics.snapshot_id == RollingAverageSnapshots.id
+        SnapshotMetrics.date_of_run
     ).filter(
         SnapshotMetrics.metric_name == metric_name,
-        RollingAverageSnapshots.date_of_run >= start_date,
-        RollingAverageSnapshots.date_of_run <= end_date
+        SnapshotMetrics.date_of_run >= start_date,
+        SnapshotMetrics.date_of_run <= end_date
     ).all()
 
     
 
-    return results
\ No newline at end of file
+    return results
+
+@metrics_service.timed("sql.sync_state")
+def get_sync_state(athlete_id: int):
+    db = get_db()
+
+    return db.query(SyncState).filter(
+        SyncState.athlete_id == athlete_id
+    ).first()
+
+
+@metrics_service.timed("sql.first_run_date")
+def get_first_run_date():
+    db = get_db()
+
+    result = db.query(
+        func.min(RollingAverageSnapshots.date_of_run).label('first')
+    ).first()
+
+    return result.first
+
+@metrics_service.timed("sql.latest_rolling_series_day")
+def get_latest_rolling_series_row(metric_name: str, before_day):
+    db = get_db()
+
+    return db.query(RollingMetricSeries).filter(
+        RollingMetricSeries.metric_name == metric_name,
+        RollingMetricSeries.day < before_day
+    ).order_by(
+        RollingMetricSeries.day.desc()
+    ).first()
+
+@metrics_service.timed("sql.rolling_series_between_dates")
+def get_rolling_series_between_dates(metric_name: str, start_day, end_day):
+    db = get_db()
+
+    return db.query(RollingMetricSeries).filter(
+        RollingMetricSeries.metric_name == metric_name,
+        RollingMetricSeries.day >= start_day,
+        RollingMetricSeries.day <= end_day
+    ).order_by(
+        RollingMetricSeries.day
+    ).all()
+
+@metrics_service.timed("sql.backfill_windows")
+def get_completed_backfill_windows(athlete_id: int):
+    db = get_db()
+
+    return db.query(BackfillWindow).filter(
+        BackfillWindow.athlete_id == athlete_id
+    ).order_by(
+        BackfillWindow.window_start
+    ).all()
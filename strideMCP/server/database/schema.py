@@ -0,0 +1,31 @@
+from sqlalchemy import inspect
+
+# the job that migrates a database created before the keyed, indexed snapshot schema
+MIGRATION_COMMAND = "compact-metrics"
+
+
+class SchemaOutdated(RuntimeError):
+    """The database was created by an older version and has to be migrated before the tools can query it."""
+
+
+def outdated_schema(engine) -> list:
+    """What a database created before the current snapshot schema lacks, empty when it is current."""
+    inspector = inspect(engine)
+    missing = []
+    for table, columns in (("rolling_average_snapshots", ("activity_id",)), ("snapshot_metrics", ("date_of_run", "activity_id"))):
+        present = {column["name"] for column in inspector.get_columns(table)}
+        missing += [f"column {table}.{column}" for column in columns if column not in present]
+    # syncs replace the snapshot of an activity through it, and it only exists once duplicates are gone
+    if not any(index["unique"] and index["column_names"] == ["activity_id"] for index in inspector.get_indexes("rolling_average_snapshots")):
+        missing.append("unique index on rolling_average_snapshots.activity_id")
+    return missing
+
+
+def ensure_current_schema(engine):
+    """Fail with what to run when the database still has the old snapshot schema, every metric query needs the new one."""
+    missing = outdated_schema(engine)
+    if missing:
+        raise SchemaOutdated(
+            f"The database has the snapshot schema of an older version ({', '.join(missing)} missing). "
+            f"Run `{MIGRATION_COMMAND}` to migrate it, then start again."
+        )
@@ -0,0 +1,241 @@
+"""Backfill an athlete's activity history window by window.
+
+    backfill --after 2015-01-01 --before 2025-06-01 --window-days 30 --workers 4
+
+Each window is fetched, embedded and stored, then checkpointed in the same
+commit as its rows. A crashed or interrupted backfill resumes from the windows
+that are not checkpointed yet, and a window that fails is retried by the next
+run without holding up the others.
+"""
+import time
+import asyncio
+import argparse
+from datetime import datetime, timezone, timedelta
+from sqlalchemy import select
+from server.database.db import init_db, get_db, run_db
+from server.database.queries import get_completed_backfill_windows, get_sync_state
+from server.database.partitions import ensure_metric_partitions
+from server.models.backfill_window import BackfillWindow
+from server.models.rolling_average_snapshots import RollingAverageSnapshots
+from server.services.strava_service import StravaService
+from server.services.qdrant_tool import qdrant_service
+from server.services.token_service import token_service
+from server.services.sync_job_service import sync_job_service
+from server.services.training_load_service import training_load_service
+from server.services.cache_service import tool_cache
+from server.services.metrics_service import metrics_service
+from server.utils.activity_text import activity_to_paragraph
+from server.utils.activity_record import start_epoch
+from server.utils.rate_limiter import AsyncRateLimiter
+from server.config.config import INGEST_STREAMS, INITIAL_SYNC_AFTER
+
+# Strava launched in 2009, nothing can be older
+DEFAULT_AFTER = "2009-01-01"
+
+
+def _epoch(date: str) -> int:
+    return int(datetime.strptime(date, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+
+
+def plan_windows(after: int, before: int, window_seconds: int, completed):
+    """Split [after, before) into windows, leaving out the ranges already completed."""
+    windows = []
+    cursor = after
+    for start, end in sorted(completed) + [(before, before)]:
+        gap_end = min(start, before)
+        while cursor < gap_end:
+            windows.append((cursor, min(cursor + window_seconds, gap_end)))
+            cursor = windows[-1][1]
+        cursor = max(cursor, end)
+    return windows
+
+
+class BackfillJob:
+    def __init__(self, access_token: str, after: int, before: int, window_days: int = 30, workers: int = 4,
+                 max_requests_per_minute: float = None, ingest_streams: bool = INGEST_STREAMS):
+        rate_limiter = AsyncRateLimiter(max_requests_per_minute / 60, burst=workers) if max_requests_per_minute else None
+        self.strava = StravaService(access_token, ingest_streams=ingest_streams, rate_limiter=rate_limiter)
+        self.after = after
+        self.before = before
+        self.window_seconds = window_days * 86400
+        self.workers = workers
+        self.sync_state = None
+        self.windows_total = 0
+        self.windows_done = 0
+        self.windows_failed = 0
+        self.activities = 0
+        # activities this run stored for the first time, a re-run replaces the others
+        self.embedded = 0
+        self.newest = None
+        self.oldest = None
+        self.started_at = None
+        self.window_duration = metrics_service.histogram("backfill_window_seconds", "Time to fetch, embed and store one backfill window")
+
+    def run(self):
+        athlete_id = self.strava._get_athlete_id()
+        self.strava.athlete_id = athlete_id
+        if not sync_job_service.acquire(athlete_id):
+            print(f"A sync for athlete {athlete_id} is already running")
+            return
+
+        try:
+            asyncio.run(self._run())
+        except Exception as e:
+            sync_job_service.release(athlete_id, error=str(e))
+            raise
+        sync_job_service.release(athlete_id, error=f"{self.windows_failed} windows failed" if self.windows_failed else None)
+
+    async def _run(self):
+        athlete_id = self.strava.athlete_id
+        self.sync_state = await run_db(get_sync_state, athlete_id)
+        completed = await run_db(get_completed_backfill_windows, athlete_id)
+        windows = plan_windows(self.after, self.before, self.window_seconds, [(w.window_start, w.window_end) for w in completed])
+
+        self.windows_total = len(windows)
+        self.started_at = time.monotonic()
+        print(f"Backfilling {len(windows)} windows for athlete {athlete_id}, {len(completed)} already checkpointed")
+
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def process(window):
+            async with semaphore:
+                await self._process_window(*window)
+
+        await asyncio.gather(*(process(window) for window in windows))
+
+        if self.windows_failed:
+            print(f"{self.windows_failed} windows failed, run the backfill again to retry them")
+        if self.newest is not None:
+            await run_db(self._update_sync_state)
+
+        if self.oldest is not None:
+            # only the rolling windows from the oldest backfilled run onwards can change
+            await run_db(training_load_service.update, self.oldest.date())
+
+    def _already_synced(self, activity) -> bool:
+        # the regular sync ingested everything from INITIAL_SYNC_AFTER up to its cursor
+        if self.sync_state is None:
+            return False
+        start = start_epoch(activity["start_date"])
+        cursor = (self.sync_state.last_start_time, self.sync_state.last_activity_id)
+        return start >= _epoch(INITIAL_SYNC_AFTER) and (start, activity["id"]) <= cursor
+
+    async def _process_window(self, start: int, end: int):
+        window_started_at = time.monotonic()
+        try:
+            # Strava treats both bounds as exclusive, the window includes its start
+            summaries = await self.strava._list_activities_after(start - 1, end)
+            summaries = [a for a in summaries if not self._already_synced(a)]
+            activities = self.strava._parse_activities(await self.strava._get_all_activity_details(summaries))
+            texts = [activity_to_paragraph(a) for a in activities]
+
+            if texts and self.strava.ingest_streams:
+                all_streams = await self.strava._get_all_activity_streams(activities.activity_ids)
+                await asyncio.to_thread(self.strava._save_activity_streams, activities.activity_ids, all_streams)
+            if texts:
+                await asyncio.to_thread(qdrant_service.insert_points, activities, texts)
+            self.embedded += await run_db(self._commit_window, start, end, activities)
+        except Exception as e:
+            self.windows_failed += 1
+            print(f"Backfilling {self._format_window(start, end)} failed: {e}")
+            return
+
+        self.window_duration.observe(time.monotonic() - window_started_at)
+        self.windows_done += 1
+        self.activities += len(activities)
+        for run_date in activities.start_datetimes():
+            self.oldest = min(self.oldest or run_date, run_date)
+        for cursor in zip(activities.start_epochs, activities.activity_ids):
+            self.newest = max(self.newest or cursor, cursor)
+        self._report(start, end, len(activities))
+
+    def _commit_window(self, start: int, end: int, activities) -> int:
+        """Store a window's activities with its checkpoint, returning how many were not stored before."""
+        db = get_db()
+        try:
+            stored = set(db.execute(
+                select(RollingAverageSnapshots.activity_id).where(RollingAverageSnapshots.activity_id.in_(list(activities.activity_ids)))
+            ).scalars())
+            ensure_metric_partitions(db, activities.start_datetimes())
+            self.strava._replace_snapshots(db, activities)
+            db.add(BackfillWindow(
+                athlete_id=self.strava.athlete_id,
+                window_start=start,
+                window_end=end,
+                activities=len(activities),
+                completed_at=datetime.now(timezone.utc).replace(tzinfo=None),
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        sync_job_service.renew(self.strava.athlete_id)
+        if len(activities):
+            tool_cache.bump_data_version()
+        return len(set(activities.activity_ids) - stored)
+
+    def _update_sync_state(self):
+        """Count the newly embedded activities, and move the sync cursor past them when nothing is left out between."""
+        db = get_db()
+        sync_state = get_sync_state(self.strava.athlete_id) or self.strava._load_sync_state()
+        cursor = (sync_state.last_start_time, sync_state.last_activity_id)
+        # the next sync fetches what started after the cursor, so it may only skip ahead over history this
+        # backfill fetched without a gap, from at or before the cursor and with every window done
+        covers_cursor = self.after <= sync_state.last_start_time and not self.windows_failed
+        if self.newest > cursor and covers_cursor:
+            sync_state.last_start_time, sync_state.last_activity_id = self.newest
+        elif self.newest > cursor:
+            print("The backfill does not reach back to the sync cursor without a gap, the cursor stays where it is")
+        sync_state.total_embedded = (sync_state.total_embedded or 0) + self.embedded
+        sync_state.updated_at = datetime.now(timezone.utc)
+        db.merge(sync_state)
+        db.commit()
+
+    def _format_window(self, start: int, end: int):
+        first = datetime.fromtimestamp(start, timezone.utc).strftime("%Y-%m-%d")
+        last = datetime.fromtimestamp(end, timezone.utc).strftime("%Y-%m-%d")
+        return f"{first} to {last}"
+
+    def _report(self, start: int, end: int, count: int):
+        elapsed = time.monotonic() - self.started_at
+        finished = self.windows_done + self.windows_failed
+        rate = self.activities / elapsed if elapsed else 0.0
+        eta = timedelta(seconds=round(elapsed / finished * (self.windows_total - finished))) if finished else None
+        print(
+            f"[{finished}/{self.windows_total}] {self._format_window(start, end)}: {count} activities, "
+            f"{self.activities} total, {rate:.1f} activities/s, ETA {eta}",
+            flush=True
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill activity history in checkpointed time windows")
+    parser.add_argument("--after", default=DEFAULT_AFTER, help="first day to backfill, YYYY-MM-DD")
+    parser.add_argument("--before", default=INITIAL_SYNC_AFTER, help="day to stop before, YYYY-MM-DD, defaults to where the regular sync starts")
+    parser.add_argument("--window-days", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=4, help="windows processed concurrently")
+    parser.add_argument("--max-requests-per-minute", type=float, default=6, help="Strava allows 100 requests per 15 minutes by default, 0 disables the limit")
+    parser.add_argument("--athlete-id", type=int, help="athlete whose stored token to use, the most recent one by default")
+    parser.add_argument("--streams", action="store_true", default=INGEST_STREAMS, help="also ingest activity streams")
+    args = parser.parse_args(argv)
+
+    init_db()
+    qdrant_service.ensure_collection()
+    access_token = token_service.get_token(args.athlete_id)
+    if access_token is None:
+        parser.error("no Strava token is stored, authenticate through the listener first")
+
+    BackfillJob(
+        access_token,
+        after=_epoch(args.after),
+        before=_epoch(args.before),
+        window_days=args.window_days,
+        workers=args.workers,
+        max_requests_per_minute=args.max_requests_per_minute or None,
+        ingest_streams=args.streams
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Migrate the snapshot tables to the keyed, indexed and partitioned schema.
+
+    compact-metrics
+
+Syncs used to add a new snapshot for every activity they saw, so the same run
+can be stored many times. This keeps the newest snapshot of each run, keys the
+snapshots on their Strava activity, adds the indexes the range queries need
+and, on postgres, moves snapshot_metrics into monthly partitions. It is safe
+to run again, a database that is already migrated is left as it is.
+"""
+import argparse
+from datetime import datetime, timezone
+from sqlalchemy import bindparam, inspect, select, text
+from server.database.db import init_db, get_db
+from server.database.partitions import is_partitioned, ensure_metric_partitions, forget_metric_partitions
+from server.models.rolling_average_snapshots import RollingAverageSnapshots
+from server.models.snapshot_metrics import SnapshotMetrics
+from server.services.qdrant_tool import qdrant_service
+from server.services.cache_service import tool_cache
+from server.services.training_load_service import training_load_service
+
+LEGACY_METRICS_TABLE = "snapshot_metrics_legacy"
+
+
+def _run_start(run: dict) -> datetime:
+    date_str = str(run["date"]).replace("Z", "+00:00")
+    return datetime.fromisoformat(date_str).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class CompactMetricsJob:
+    def __init__(self, link_activities: bool = True):
+        self.link_activities = link_activities
+        self.db = get_db()
+        self.dialect = self.db.get_bind().dialect.name
+
+    def run(self):
+        try:
+            self._add_activity_column()
+            # the date index speeds up finding duplicates, the unique one can only be built after they are gone
+            self._create_indexes(RollingAverageSnapshots, unique=False)
+            linked = self._link_activities() if self.link_activities else 0
+            removed = self._remove_duplicates()
+            self._create_indexes(RollingAverageSnapshots, unique=True)
+            rebuilt = self._rebuild_metrics()
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        # the duplicates are gone, rebuild the training load series from the remaining runs
+        training_load_service.update()
+        tool_cache.bump_data_version()
+        print(
+            f"Compaction done, {linked} snapshots linked to their activity, {removed} duplicates removed"
+            + (", snapshot_metrics rebuilt" if rebuilt else "")
+        )
+
+    def _columns(self, table: str):
+        return {c["name"] for c in inspect(self.db.connection()).get_columns(table)}
+
+    def _add_activity_column(self):
+        if "activity_id" not in self._columns("rolling_average_snapshots"):
+            self.db.execute(text("ALTER TABLE rolling_average_snapshots ADD COLUMN activity_id BIGINT"))
+
+    def _link_activities(self):
+        """Fill in the activity of snapshots from before the key, matched on start time through the stored runs."""
+        activity_ids = {}
+        offset = None
+        while True:
+            records, offset = qdrant_service.client.scroll(
+                collection_name=qdrant_service.collection_name,
+                limit=256,
+                offset=offset,
+                with_payload=["run"]
+            )
+            for r in records:
+                run = r.payload["run"]
+                # points from before activity ids were stored cannot link anything, their
+                # snapshots stay unlinked and are deduplicated on start time instead
+                if run.get("activity_id") is None:
+                    continue
+                activity_ids[_run_start(run)] = run["activity_id"]
+            if offset is None:
+                break
+
+        # typed columns, sqlite hands raw datetimes back as strings that would never match
+        unlinked = self.db.execute(
+            select(RollingAverageSnapshots.id, RollingAverageSnapshots.date_of_run)
+            .where(RollingAverageSnapshots.activity_id.is_(None))
+            .order_by(RollingAverageSnapshots.id.desc())
+        ).all()
+        linked = set(self.db.execute(
+            select(RollingAverageSnapshots.activity_id).where(RollingAverageSnapshots.activity_id.is_not(None))
+        ).scalars())
+        updates = []
+        for snapshot_id, date_of_run in unlinked:
+            activity_id = activity_ids.get(date_of_run)
+            # only the newest copy of a run gets its activity, the unique index may already exist.
+            # Older copies stay unlinked and are removed as duplicates of the same start time
+            if activity_id is None or activity_id in linked:
+                continue
+            linked.add(activity_id)
+            updates.append({"id": snapshot_id, "activity_id": activity_id})
+        if updates:
+            self.db.execute(text("UPDATE rolling_average_snapshots SET activity_id = :activity_id WHERE id = :id"), updates)
+        return len(updates)
+
+    def _remove_duplicates(self):
+        """Keep the newest snapshot of every run, a run being one activity or, for unlinked snapshots, one start time."""
+        duplicates = text("""
+            SELECT s.id FROM rolling_average_snapshots s
+            WHERE EXISTS (
+                SELECT 1 FROM rolling_average_snapshots newer
+                WHERE newer.id > s.id AND (
+                    newer.activity_id = s.activity_id
+                    OR (newer.date_of_run = s.date_of_run AND (newer.activity_id IS NULL OR s.activity_id IS NULL))
+                )
+            )
+        """)
+        ids = [row.id for row in self.db.execute(duplicates)]
+        # keep the statements small, sqlite caps the number of bound parameters
+        for i in range(0, len(ids), 500):
+            batch = {"ids": ids[i:i + 500]}
+            self.db.execute(text("DELETE FROM snapshot_metrics WHERE snapshot_id IN :ids").bindparams(bindparam("ids", expanding=True)), batch)
+            self.db.execute(text("DELETE FROM rolling_average_snapshots WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)), batch)
+        return len(ids)
+
+    def _create_indexes(self, model, unique: bool = None):
+        bind = self.db.connection()
+        for index in model.__table__.indexes:
+            if unique is None or index.unique == unique:
+                index.create(bind, checkfirst=True)
+
+    def _metrics_migrated(self):
+        if "id" in self._columns("snapshot_metrics"):
+            return False
+        return self.dialect != "postgresql" or is_partitioned(self.db, "snapshot_metrics")
+
+    def _rebuild_metrics(self):
+        """Copy snapshot_metrics into a table with the current schema, denormalizing the run date and activity."""
+        if self._metrics_migrated():
+            self.db.execute(text("""
+                UPDATE snapshot_metrics SET activity_id = (
+                    SELECT s.activity_id FROM rolling_average_snapshots s WHERE s.id = snapshot_metrics.snapshot_id
+                ) WHERE activity_id IS NULL
+            """))
+            self._create_indexes(SnapshotMetrics)
+            return False
+
+        self.db.execute(text(f"ALTER TABLE snapshot_metrics RENAME TO {LEGACY_METRICS_TABLE}"))
+        if self.dialect == "postgresql":
+            # constraint names are schema wide on postgres, the new table needs the old ones
+            for constraint in self.db.execute(text(
+                "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass)"
+            ), {"table": LEGACY_METRICS_TABLE}).scalars().all():
+                self.db.execute(text(
+                    f'ALTER TABLE {LEGACY_METRICS_TABLE} RENAME CONSTRAINT "{constraint}" TO "{constraint}_legacy"'
+                ))
+
+        bind = self.db.connection()
+        SnapshotMetrics.__table__.create(bind)
+        # partitions remembered for the old table are not partitions of this one
+        forget_metric_partitions(self.db)
+        dates = self.db.execute(text("SELECT DISTINCT date_of_run FROM rolling_average_snapshots")).scalars().all()
+        # the partitions are part of this transaction, a failed migration leaves none behind
+        ensure_metric_partitions(self.db, dates)
+
+        self.db.execute(text(f"""
+            INSERT INTO snapshot_metrics (snapshot_id, metric_name, date_of_run, activity_id, metric_value, metric_unit)
+            SELECT m.snapshot_id, m.metric_name, s.date_of_run, s.activity_id, m.metric_value, m.metric_unit
+            FROM {LEGACY_METRICS_TABLE} m JOIN rolling_average_snapshots s ON s.id = m.snapshot_id
+        """))
+        self.db.execute(text(f"DROP TABLE {LEGACY_METRICS_TABLE}"))
+        return True
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remove duplicate snapshots and migrate the snapshot tables to the current schema")
+    parser.add_argument("--no-link", action="store_true", help="do not match old snapshots to their activity through the stored runs")
+    args = parser.parse_args(argv)
+
+    # this job is the migration the schema check asks for
+    init_db(check_schema=False)
+    qdrant_service.ensure_collection()
+    CompactMetricsJob(link_activities=not args.no_link).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Rebuild the Qdrant collection behind the alias, re-embedding only stale points.
+
+    reindex --batch-size 64 --max-embeds-per-second 20
+
+Points whose embedding metadata no longer matches the current model, text
+template or activity text are re-embedded, every other point is copied with
+its existing text vector. Points from before the activity store still carry
+the full activity in their payload, it is moved into the store on the way.
+Points from the first releases have no activity id to store the activity
+under, they keep their id and the full activity in their payload.
+Searches keep using the old collection until the alias is swapped at the end.
+Ingest keeps writing to the old collection until then, points it added or
+changed during the copy are copied again after the swap.
+"""
+import json
+import hashlib
+import argparse
+from server.database.db import init_db
+from server.services.qdrant_tool import qdrant_service, TEXT_VECTOR, HOT_RUN_FIELDS
+from server.services.activity_store import activity_store
+from server.services.metrics_service import metrics_service
+from server.services.cache_service import tool_cache
+from server.utils.activity_text import activity_to_paragraph
+from server.utils.activity_record import ActivityRecord
+from server.utils.rate_limiter import RateLimiter
+
+
+class ReindexJob:
+    def __init__(self, batch_size: int = 64, max_embeds_per_second: float = None, force: bool = False, keep_old: bool = False):
+        self.batch_size = batch_size
+        self.rate_limiter = RateLimiter(max_embeds_per_second) if max_embeds_per_second else None
+        self.force = force
+        self.keep_old = keep_old
+        self.embedded = 0
+        self.copied = 0
+        # fingerprint of every source point as it was copied
+        self.copied_payloads = {}
+
+    def run(self):
+        source = qdrant_service.resolve_collection()
+        target = qdrant_service.create_collection_version()
+        print(f"Reindexing {source} into {target}")
+
+        self._copy(source, target)
+        qdrant_service.swap_alias(target)
+
+        # ingest keeps writing to the old collection until the swap, pick up what it added or changed meanwhile
+        self._copy(source, target, changed_only=True)
+        tool_cache.bump_data_version()
+
+        if not self.keep_old:
+            qdrant_service.client.delete_collection(source)
+        print(f"Reindex done, {self.embedded} points re-embedded and {self.copied} copied")
+        return target
+
+    def _copy(self, source: str, target: str, changed_only: bool = False):
+        offset = None
+        while True:
+            records, offset = qdrant_service.client.scroll(
+                collection_name=source,
+                limit=self.batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if changed_only:
+                records = [r for r in records if self.copied_payloads.get(r.id) != self._fingerprint(r)]
+            if records:
+                self._copy_batch(records, target)
+            if offset is None:
+                return
+
+    def _fingerprint(self, record) -> str:
+        # the embedding metadata in the payload covers the text vector, the payload covers the rest
+        return hashlib.sha256(json.dumps(record.payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    @metrics_service.timed("reindex.batch")
+    def _copy_batch(self, records, target: str):
+        for r in records:
+            self.copied_payloads[r.id] = self._fingerprint(r)
+        runs = self._full_runs(records)
+        texts = [activity_to_paragraph(run) for run in runs]
+        stale = [i for i, (r, run) in enumerate(zip(records, runs)) if self.force or qdrant_service.is_stale(r.payload, run)]
+
+        vectors = [self._text_vector(r) for r in records]
+        if stale:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(len(stale))
+            embedded = qdrant_service.batch_embed([texts[i] for i in stale])
+            for i, vector in zip(stale, embedded):
+                vectors[i] = vector
+            self.embedded += len(stale)
+        self.copied += len(records) - len(stale)
+
+        points = [
+            qdrant_service.build_point(run, text, vector, point_id=r.id)
+            for r, run, text, vector in zip(records, runs, texts, vectors)
+        ]
+        qdrant_service.client.upsert(collection_name=target, points=points)
+
+    def _full_runs(self, records):
+        """Full record of each point, moving the ones still kept in the payload into the activity store."""
+        activity_ids = [r.payload["run"].get("activity_id") for r in records]
+        stored = activity_store.load_many(activity_ids)
+        runs = [stored.get(activity_id, r.payload["run"]) for r, activity_id in zip(records, activity_ids)]
+        # runs from the first releases have no activity id to store them under, they stay in the payload
+        legacy = [
+            run for run, activity_id in zip(runs, activity_ids)
+            if activity_id is not None and activity_id not in stored and not set(run) <= set(HOT_RUN_FIELDS)
+        ]
+        if legacy:
+            activity_store.save([ActivityRecord.from_dict(run) for run in legacy])
+        return [ActivityRecord.from_dict(run) for run in runs]
+
+    def _text_vector(self, record):
+        # collections from before named vectors store the text vector unnamed
+        if isinstance(record.vector, dict):
+            return record.vector[TEXT_VECTOR]
+        return record.vector
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-embed stale points into a new collection and swap the alias")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-embeds-per-second", type=float, help="rate limit for embedding calls, unlimited by default")
+    parser.add_argument("--force", action="store_true", help="re-embed every point, not only stale ones")
+    parser.add_argument("--keep-old", action="store_true", help="keep the previous collection after the swap")
+    args = parser.parse_args(argv)
+
+    init_db()
+    qdrant_service.ensure_collection()
+    ReindexJob(
+        batch_size=args.batch_size,
+        max_embeds_per_second=args.max_embeds_per_second,
+        force=args.force,
+        keep_old=args.keep_old
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
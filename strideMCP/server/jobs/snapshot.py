@@ -0,0 +1,324 @@
+"""Export the search index, metric tables and sync cursors to one file, or bring a node up from it.
+
+    snapshot export stride-snapshot.npz --vectors float16
+    snapshot import stride-snapshot.npz
+
+The export holds the sync lease of every athlete it covers, so no sync or
+backfill writes while it reads. The file is a NumPy .npz archive with one array
+per table column. Text vectors are stored as float16, int8 with one scale per
+vector, or float32. An import loads the points into a new Qdrant collection
+and replaces the tables in one transaction, then swaps the alias. The next sync
+continues from the restored cursors and only fetches newer activities.
+"""
+import os
+import json
+import argparse
+import contextlib
+import numpy as np
+from datetime import date, datetime, timezone
+from sqlalchemy import delete, insert, select, text
+from qdrant_client.models import PointStruct
+from server.database.db import init_db, get_db
+from server.database.partitions import ensure_metric_partitions
+from server.models.rolling_average_snapshots import RollingAverageSnapshots
+from server.models.snapshot_metrics import SnapshotMetrics
+from server.models.activity_detail import ActivityDetail
+from server.models.rolling_metric_series import RollingMetricSeries
+from server.models.sync_state import SyncState
+from server.models.backfill_window import BackfillWindow
+from server.services.qdrant_tool import qdrant_service, TEXT_VECTOR, FEATURES_VECTOR
+from server.services.sync_job_service import sync_job_service
+from server.services.metrics_service import metrics_service
+from server.services.cache_service import tool_cache
+from server.utils.activity_text import TEMPLATE_VERSION
+from server.utils.activity_record import ActivityRecord
+from server.utils.run_features import raw_features, feature_vector, FEATURE_DIMENSIONS
+
+FORMAT_VERSION = 1
+# what a new node needs to answer tools and continue syncing, in foreign key order.
+# Strava tokens and sync leases belong to the node that holds them and are left out
+TABLES = (RollingAverageSnapshots, SnapshotMetrics, ActivityDetail, RollingMetricSeries, SyncState, BackfillWindow)
+VECTOR_ENCODINGS = ("float16", "int8", "float32")
+SCROLL_BATCH = 256
+INSERT_BATCH = 5000
+
+
+def _json_array(values) -> np.ndarray:
+    return np.frombuffer(json.dumps(values, separators=(",", ":")).encode(), dtype=np.uint8)
+
+
+def _from_json_array(array: np.ndarray):
+    return json.loads(array.tobytes())
+
+
+def _group(arrays: dict, prefix: str) -> dict:
+    """The arrays stored under prefix, keyed by what follows it."""
+    return {name[len(prefix):]: array for name, array in arrays.items() if name.startswith(prefix)}
+
+
+def encode_column(column, values) -> dict:
+    """Arrays holding one table column, keyed by suffix, None is kept through NaT or a null mask."""
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return {"": np.array(values, dtype="datetime64[us]")}
+    if python_type is date:
+        return {"": np.array(values, dtype="datetime64[D]")}
+    if python_type is bytes:
+        lengths = [len(v) for v in values]
+        return {"": np.frombuffer(b"".join(values), dtype=np.uint8), "offsets": np.cumsum([0, *lengths], dtype=np.int64)}
+    if python_type in (int, float):
+        nulls = np.array([v is None for v in values], dtype=bool)
+        arrays = {"": np.array([0 if v is None else v for v in values], dtype=np.int64 if python_type is int else np.float64)}
+        if nulls.any():
+            arrays["nulls"] = nulls
+        return arrays
+    return {"": _json_array(values)}
+
+
+def decode_column(column, arrays: dict) -> list:
+    python_type = column.type.python_type
+    data = arrays[""]
+    if python_type is bytes:
+        offsets = arrays["offsets"]
+        blob = data.tobytes()
+        return [blob[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+    if python_type in (int, float, datetime, date):
+        values = data.tolist()
+        if "nulls" in arrays:
+            values = [None if null else value for value, null in zip(values, arrays["nulls"])]
+        return values
+    return _from_json_array(data)
+
+
+def encode_vectors(vectors: np.ndarray, encoding: str) -> dict:
+    if encoding == "int8":
+        # symmetric per vector scaling, cosine similarity does not depend on the scale
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        return {"": np.round(vectors / scales[:, None]).astype(np.int8), "scales": scales.astype(np.float32)}
+    return {"": vectors.astype(encoding)}
+
+
+def decode_vectors(arrays: dict) -> np.ndarray:
+    vectors = arrays[""].astype(np.float32)
+    if "scales" in arrays:
+        vectors *= arrays["scales"][:, None]
+    return vectors
+
+
+@contextlib.contextmanager
+def _sync_leases(athlete_ids):
+    """Hold the sync lease of every athlete, so nothing is ingested meanwhile."""
+    held = []
+    try:
+        for athlete_id in athlete_ids:
+            if not sync_job_service.acquire(athlete_id):
+                raise RuntimeError(f"A sync for athlete {athlete_id} is running, try again once it finishes")
+            held.append(athlete_id)
+        yield
+    finally:
+        for athlete_id in held:
+            sync_job_service.release(athlete_id)
+
+
+class SnapshotExport:
+    def __init__(self, path: str, vectors: str = "float16"):
+        if vectors not in VECTOR_ENCODINGS:
+            raise ValueError(f"vectors must be one of {', '.join(VECTOR_ENCODINGS)}")
+        self.path = path
+        self.vectors = vectors
+        self.db = get_db()
+
+    @metrics_service.timed("snapshot.export")
+    def run(self):
+        athlete_ids = self.db.execute(select(SyncState.athlete_id)).scalars().all()
+        self.db.commit()
+        arrays = {}
+        with _sync_leases(athlete_ids):
+            # one transaction, and on postgres one snapshot of every table
+            if self.db.get_bind().dialect.name == "postgresql":
+                self.db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            try:
+                tables = {model.__tablename__: self._export_table(model, arrays) for model in TABLES}
+            finally:
+                self.db.rollback()
+            collection, points, named_vectors, dimensions = self._export_points(arrays)
+
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "collection": collection,
+            "embedding_model": qdrant_service.embedding_model,
+            "template_version": TEMPLATE_VERSION,
+            "named_vectors": named_vectors,
+            "text_dimensions": dimensions,
+            "vector_encoding": self.vectors,
+            "points": points,
+            "tables": tables,
+        }
+        arrays["manifest"] = _json_array(manifest)
+
+        # written next to the destination and renamed, readers never see a half written snapshot
+        partial = f"{self.path}.partial"
+        with open(partial, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(partial, self.path)
+        print(f"Exported {points} points and {sum(tables.values())} rows from {len(tables)} tables to {self.path} ({os.path.getsize(self.path) / 1e6:.1f} MB)")
+        return manifest
+
+    def _export_table(self, model, arrays: dict) -> int:
+        table = model.__table__
+        rows = self.db.execute(select(table)).all()
+        for i, column in enumerate(table.columns):
+            for suffix, array in encode_column(column, [row[i] for row in rows]).items():
+                arrays[f"table/{table.name}/{column.name}/{suffix}"] = array
+        return len(rows)
+
+    def _export_points(self, arrays: dict):
+        collection = qdrant_service.resolve_collection()
+        named_vectors = qdrant_service.has_named_vectors()
+        ids, payloads, text_vectors, feature_vectors = [], [], [], []
+        offset = None
+        while True:
+            records, offset = qdrant_service.client.scroll(
+                collection_name=collection,
+                limit=SCROLL_BATCH,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            for record in records:
+                ids.append(record.id)
+                payloads.append(record.payload)
+                if named_vectors:
+                    text_vectors.append(record.vector[TEXT_VECTOR])
+                    feature_vectors.append(record.vector[FEATURES_VECTOR])
+                else:
+                    text_vectors.append(record.vector)
+            if offset is None:
+                break
+
+        dimensions = len(text_vectors[0]) if text_vectors else qdrant_service.embedder.dimensions
+        text_vectors = np.array(text_vectors, dtype=np.float32).reshape(len(ids), dimensions)
+        arrays["points/ids/"] = _json_array(ids)
+        arrays["points/payloads/"] = _json_array(payloads)
+        for suffix, array in encode_vectors(text_vectors, self.vectors).items():
+            arrays[f"points/text/{suffix}"] = array
+        if named_vectors:
+            arrays["points/features/"] = np.array(feature_vectors, dtype=np.float32).reshape(len(ids), FEATURE_DIMENSIONS)
+        return collection, len(ids), named_vectors, dimensions
+
+
+class SnapshotRestore:
+    def __init__(self, path: str, keep_old: bool = False):
+        self.path = path
+        self.keep_old = keep_old
+        self.db = get_db()
+
+    @metrics_service.timed("snapshot.import")
+    def run(self):
+        with np.load(self.path, allow_pickle=False) as snapshot:
+            arrays = {name: snapshot[name] for name in snapshot.files}
+        manifest = _from_json_array(arrays["manifest"])
+        if manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"{self.path} has snapshot format {manifest['format_version']}, this version reads {FORMAT_VERSION}")
+        if manifest["text_dimensions"] != qdrant_service.embedder.dimensions:
+            raise ValueError(f"{self.path} holds {manifest['text_dimensions']} dimensional vectors, the embedder makes {qdrant_service.embedder.dimensions}")
+        if manifest["embedding_model"] != qdrant_service.embedding_model:
+            print(f"The snapshot was embedded with {manifest['embedding_model']}, not {qdrant_service.embedding_model}. Run reindex to re-embed it")
+
+        athlete_ids = decode_column(SyncState.__table__.c.athlete_id, _group(arrays, "table/sync_state/athlete_id/"))
+        with _sync_leases(athlete_ids):
+            # searches keep using the current collection until the tables are in place
+            source = qdrant_service.resolve_collection()
+            target = qdrant_service.create_collection_version()
+            try:
+                self._import_points(arrays, target)
+                self._import_tables(arrays)
+            except Exception:
+                qdrant_service.client.delete_collection(target)
+                raise
+            qdrant_service.swap_alias(target)
+
+        tool_cache.bump_data_version()
+        if source is not None and not self.keep_old:
+            qdrant_service.client.delete_collection(source)
+        print(f"Imported {manifest['points']} points and {sum(manifest['tables'].values())} rows from {self.path} into {target}")
+        return target
+
+    def _import_points(self, arrays: dict, target: str):
+        ids = _from_json_array(arrays["points/ids/"])
+        payloads = _from_json_array(arrays["points/payloads/"])
+        text_vectors = decode_vectors(_group(arrays, "points/text/"))
+        feature_vectors = arrays.get("points/features/")
+
+        for start in range(0, len(ids), SCROLL_BATCH):
+            points = []
+            for i in range(start, min(start + SCROLL_BATCH, len(ids))):
+                # snapshots of collections from before named vectors get their features computed here
+                features = feature_vectors[i].tolist() if feature_vectors is not None else self._features(payloads[i])
+                points.append(PointStruct(
+                    id=ids[i],
+                    vector={TEXT_VECTOR: text_vectors[i].tolist(), FEATURES_VECTOR: features},
+                    payload=payloads[i]
+                ))
+            qdrant_service.client.upsert(collection_name=target, points=points)
+
+    def _features(self, payload: dict) -> list:
+        if "features" in payload:
+            return feature_vector(payload["features"])
+        return feature_vector(raw_features(ActivityRecord.from_dict(payload["run"])))
+
+    def _import_tables(self, arrays: dict):
+        db = self.db
+        try:
+            for model in reversed(TABLES):
+                db.execute(delete(model.__table__))
+            for model in TABLES:
+                table = model.__table__
+                columns = {column.name: decode_column(column, _group(arrays, f"table/{table.name}/{column.name}/")) for column in table.columns}
+                rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+                if model is SnapshotMetrics:
+                    ensure_metric_partitions(db, {row["date_of_run"] for row in rows})
+                for start in range(0, len(rows), INSERT_BATCH):
+                    db.execute(insert(table), rows[start:start + INSERT_BATCH])
+                self._reset_sequence(table)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    def _reset_sequence(self, table):
+        # ids were inserted explicitly, move postgres sequences past them so new rows do not collide
+        if self.db.get_bind().dialect.name != "postgresql":
+            return
+        for column in table.primary_key.columns:
+            if column.autoincrement is True:
+                self.db.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', '{column.name}'), COALESCE(MAX({column.name}), 1), MAX({column.name}) IS NOT NULL) FROM {table.name}"
+                ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import the search index, metric tables and sync cursors")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="write a snapshot of this node")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--vectors", choices=VECTOR_ENCODINGS, default="float16", help="how text vectors are stored")
+
+    import_parser = commands.add_parser("import", help="replace this node's index and tables with a snapshot")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--keep-old", action="store_true", help="keep the previous collection after the swap")
+    args = parser.parse_args(argv)
+
+    init_db()
+    qdrant_service.ensure_collection()
+    if args.command == "export":
+        SnapshotExport(args.path, vectors=args.vectors).run()
+    else:
+        SnapshotRestore(args.path, keep_old=args.keep_old).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 from mcp.server.fastmcp import FastMCP
 from fastapi import FastAPI
 from fastapi import Request
-from fastapi.responses import StreamingResponse, HTMLResponse
+from fastapi.responses import StreamingResponse, HTMLResponse, PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from stravalib import Client
 from server.database.db import init_db
@@ -18,12 +18,38 @@ from server.tools.strava_tools import *
 from dotenv import load_dotenv
 from server.services.token_service import token_service
 from server.services.strava_service import StravaService
+from server.services.metrics_service import metrics_service
+from server.services.cache_service import tool_cache
+from server.services.qdrant_tool import qdrant_service
+from server.config.config import (
+    PORT,
+    LISTENER_HOST,
+    LISTENER_PORT,
+    LISTENER_WORKERS,
+    MCP_TRANSPORT,
+    MCP_HOST,
+    MCP_WORKERS
+)
+from contextlib import asynccontextmanager
 
 load_dotenv()
 
 
+def init_stores():
+    init_db()
+    qdrant_service.ensure_collection()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # runs once in every uvicorn worker process
+    init_stores()
+    yield
+
+
 mcp_listener = FastAPI(
-    title="MCP Listener"
+    title="MCP Listener",
+    lifespan=lifespan
 )
 
 mcp_listener.add_middleware(
@@ -35,6 +61,37 @@ mcp_listener.add_middleware(
     allow_headers=["*"],
 )
 
+@mcp_listener.middleware("http")
+async def record_route_metrics(request: Request, call_next):
+    # unknown paths share one label so scanners cannot blow up the series count
+    known_paths = {route.path for route in mcp_listener.routes}
+    path = request.url.path if request.url.path in known_paths else "other"
+    stage = f"http.{request.method} {path}"
+
+    with metrics_service.track(stage):
+        response = await call_next(request)
+
+    content_length = response.headers.get("content-length")
+    if content_length:
+        metrics_service.observe_size(stage, int(content_length))
+    return response
+
+
+def metrics_response():
+    return PlainTextResponse(metrics_service.render(), media_type="text/plain; version=0.0.4")
+
+
+# metrics live in each process, every listener and MCP worker serves its own
+@mcp_listener.get("/metrics")
+def export_metrics():
+    return metrics_response()
+
+
+@mcp_listener.get("/cache/stats")
+def export_cache_stats():
+    return tool_cache.stats()
+
+
 def format_pace(decimal_minutes):
     """Convert 7.5 minutes to '7:30' format"""
     minutes = int(decimal_minutes)
@@ -54,19 +111,20 @@ async def plot_run_data(request: Request):
     for i in range(1, len(raw_mile_splits) + 1):
         x_labels.append(f"{i}")
     
-    bars = plt.bar(x_labels, raw_mile_splits)
-    for bar, value in zip(bars, raw_mile_splits):
-        plt.text(bar.get_x() + bar.get_width()/2, bar.get_height(), 
-            format_pace(value), ha='center', va='bottom', fontsize=9)
-    plt.xlabel("Miles")
-    plt.ylabel("Mins Per Mile")
-    plt.ylim(bottom=min_pace - 1.0) 
-    plt.title("Mile Splits")
-
-    buf = BytesIO()
-    plt.savefig(buf, format="png")
-    buf.seek(0)
-    plt.close()
+    with metrics_service.track("chart.render_mile_splits"):
+        bars = plt.bar(x_labels, raw_mile_splits)
+        for bar, value in zip(bars, raw_mile_splits):
+            plt.text(bar.get_x() + bar.get_width()/2, bar.get_height(), 
+                format_pace(value), ha='center', va='bottom', fontsize=9)
+        plt.xlabel("Miles")
+        plt.ylabel("Mins Per Mile")
+        plt.ylim(bottom=min_pace - 1.0) 
+        plt.title("Mile Splits")
+
+        buf = BytesIO()
+        plt.savefig(buf, format="png")
+        buf.seek(0)
+        plt.close()
 
     return StreamingResponse(buf, media_type="image/png")
 
@@ -77,24 +135,25 @@ async def plot_run_data(request: Request):
     values = [point["value"] for point in data_points]
     dates = [datetime.strptime(point["date"], "%Y-%m-%d %H:%M:%S") for point in data_points]
     
-    plt.figure(figsize=(10, 6))
-    plt.plot(dates, values, 'o-', linewidth=2, markersize=8)
-    
-    # Format the date axis
-    plt.gcf().autofmt_xdate()
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-    
-    # Add labels and title
-    plt.xlabel("Date")
-    plt.ylabel("Value")
-    plt.title("Metric Progress Over Time")
-    plt.grid(True, linestyle='--', alpha=0.7)
-    
-    # Create the plot buffer
-    buf = BytesIO()
-    plt.savefig(buf, format="png", dpi=100, bbox_inches='tight')
-    buf.seek(0)
-    plt.close()
+    with metrics_service.track("chart.render_metrics_over_time"):
+        plt.figure(figsize=(10, 6))
+        plt.plot(dates, values, 'o-', linewidth=2, markersize=8)
+        
+        # Format the date axis
+        plt.gcf().autofmt_xdate()
+        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+        
+        # Add labels and title
+        plt.xlabel("Date")
+        plt.ylabel("Value")
+        plt.title("Metric Progress Over Time")
+        plt.grid(True, linestyle='--', alpha=0.7)
+        
+        # Create the plot buffer
+        buf = BytesIO()
+        plt.savefig(buf, format="png", dpi=100, bbox_inches='tight')
+        buf.seek(0)
+        plt.close()
 
     img_str = base64.b64encode(buf.getvalue()).decode()
     html_content = f"""
@@ -159,7 +218,8 @@ def grab_auth_code_and_exchange_for_token(request: Request):
         access_token = token_response["access_token"]
         refresh_token = token_response["refresh_token"]
         expires_at = token_response["expires_at"]
-        token_service.store_token_details(access_token, expires_at, refresh_token)
+        athlete = Client(access_token=access_token).get_athlete()
+        token_service.store_token_details(access_token, expires_at, refresh_token, athlete.id)
 
         strava_service = StravaService(access_token)
         strava_service.run()
@@ -176,26 +236,64 @@ def grab_auth_code_and_exchange_for_token(request: Request):
 
 
 
-mcp = FastMCP("Stride")
+# tools keep no per session state, so any worker can answer any request
+mcp = FastMCP("Stride", host=MCP_HOST, port=PORT, stateless_http=True)
+
+
+# tool, embedder, qdrant and sql stages are recorded in the MCP processes, the HTTP transports export them
+@mcp.custom_route("/metrics", methods=["GET"])
+async def export_mcp_metrics(request: Request):
+    return metrics_response()
+
+
+@mcp.custom_route("/cache/stats", methods=["GET"])
+async def export_mcp_cache_stats(request: Request):
+    return JSONResponse(tool_cache.stats())
 
 
 def run_listener():
-    init_db()
-    uvicorn.run(mcp_listener, host="127.0.0.1", port=5000)
+    uvicorn.run(mcp_listener, host=LISTENER_HOST, port=LISTENER_PORT)
+
+
+MCP_TOOLS = [
+    authenticate_with_strava,
+    lookup_specific_run_by_date,
+    lookup_by_retrieval_query,
+    look_up_last_N_runs,
+    compute_metric_historic_avg,
+    compute_metric_by_date_range,
+    get_data_points_for_metric_between_dates,
+    find_best_effort_in_run,
+    get_precise_splits_for_run,
+    compute_heart_rate_drift_for_run,
+    get_training_load_trend,
+    get_training_overview,
+    find_similar_runs,
+]
+
+
+def register_tools():
+    for tool in MCP_TOOLS:
+        mcp.add_tool(tool)
 
 
 def run_mcp():
-    mcp.add_tool(authenticate_with_strava)
-    mcp.add_tool(lookup_specific_run_by_date)
-    mcp.add_tool(lookup_by_retrieval_query)
-    mcp.add_tool(look_up_last_N_runs)
-    mcp.add_tool(compute_metric_historic_avg)
-    mcp.add_tool(compute_metric_by_date_range)
-    mcp.add_tool(get_data_points_for_metric_between_dates)
-    mcp.run(transport='stdio')
+    init_stores()
+    register_tools()
+    mcp.run(transport=MCP_TRANSPORT)
+
+
+def create_mcp_http_app():
+    """App factory for one MCP worker process when the HTTP transport runs multi-worker."""
+    init_stores()
+    register_tools()
+    if MCP_TRANSPORT == "sse":
+        return mcp.sse_app()
+    return mcp.streamable_http_app()
 
 
 def main():
+    """Run the MCP server and a single worker listener as two threads of one process."""
     mcp_thread = threading.Thread(target=run_mcp)
     listener_thread = threading.Thread(target=run_listener)
     mcp_thread.start()
@@ -204,5 +302,18 @@ def main():
     listener_thread.join()
 
 
+def listener_main():
+    """Run only the HTTP listener, with LISTENER_WORKERS worker processes."""
+    uvicorn.run("server.main:mcp_listener", host=LISTENER_HOST, port=LISTENER_PORT, workers=LISTENER_WORKERS)
+
+
+def mcp_main():
+    """Run only the MCP server over MCP_TRANSPORT, with MCP_WORKERS processes for the HTTP transports."""
+    if MCP_TRANSPORT != "stdio" and MCP_WORKERS > 1:
+        uvicorn.run("server.main:create_mcp_http_app", factory=True, host=MCP_HOST, port=PORT, workers=MCP_WORKERS)
+    else:
+        run_mcp()
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,11 @@
+from server.models.base import Base
+from sqlalchemy import Column, BigInteger, LargeBinary, DateTime
+
+class ActivityDetail(Base):
+    """Full parsed activity, the Qdrant payload only keeps the fields searches filter on or display."""
+    __tablename__ = "activity_details"
+
+    activity_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    # zstd compressed JSON of the parsed activity
+    record = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
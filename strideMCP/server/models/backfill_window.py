@@ -0,0 +1,13 @@
+from server.models.base import Base
+from sqlalchemy import Column, Integer, BigInteger, DateTime
+
+class BackfillWindow(Base):
+    """Checkpoint of one committed backfill window, a resumed backfill skips these ranges."""
+    __tablename__ = "backfill_windows"
+
+    athlete_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    # window bounds in epoch seconds, start inclusive and end exclusive
+    window_start = Column(BigInteger, primary_key=True, autoincrement=False)
+    window_end = Column(BigInteger, nullable=False)
+    activities = Column(Integer, nullable=False)
+    completed_at = Column(DateTime, nullable=False)
@@ -0,0 +1,9 @@
+from server.models.base import Base
+from sqlalchemy import Column, Integer, String
+
+class DataVersion(Base):
+    """Counter bumped after every ingest, shared by all processes to invalidate their caches."""
+    __tablename__ = "data_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
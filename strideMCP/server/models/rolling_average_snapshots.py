@@ -1,13 +1,20 @@
 from server.models.base import Base
-from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy import Column, Integer, BigInteger, DateTime, Index
 from sqlalchemy.orm import relationship
 
 class RollingAverageSnapshots(Base):
     __tablename__ = "rolling_average_snapshots"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
+    # one snapshot per Strava activity, rows from before the key was added have none
+    activity_id = Column(BigInteger, nullable=True)
     date_of_run = Column(DateTime, nullable=False)
     # snapshot date is the date our service runs and computes the rolling averages
     snapshot_date = Column(DateTime, nullable=False) 
 
     metrics = relationship("SnapshotMetrics", back_populates="snapshot")
+
+    __table_args__ = (
+        Index("ix_rolling_average_snapshots_date_of_run", "date_of_run"),
+        Index("ix_rolling_average_snapshots_activity_id", "activity_id", unique=True),
+    )
@@ -0,0 +1,24 @@
+from server.models.base import Base
+from sqlalchemy import Column, Integer, String, Date, DateTime, Double, UniqueConstraint
+
+class RollingMetricSeries(Base):
+    """Daily rolling aggregates of one metric, derived from the per run snapshot metrics."""
+    __tablename__ = "rolling_metric_series"
+    __table_args__ = (UniqueConstraint("metric_name", "day"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    metric_name = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    day_total = Column(Double, nullable=False)
+    sum_7d = Column(Double, nullable=False)
+    sum_28d = Column(Double, nullable=False)
+    sum_42d = Column(Double, nullable=False)
+    mean_7d = Column(Double, nullable=False)
+    mean_28d = Column(Double, nullable=False)
+    mean_42d = Column(Double, nullable=False)
+    ewma_7d = Column(Double, nullable=False)
+    ewma_28d = Column(Double, nullable=False)
+    ewma_42d = Column(Double, nullable=False)
+    # acute (7 day) over chronic (28 day) mean, None while there is no chronic load
+    acute_chronic_ratio = Column(Double, nullable=True)
+    computed_at = Column(DateTime, nullable=False)
@@ -1,14 +1,25 @@
 from server.models.base import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, Double
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Double, Index
 from sqlalchemy.orm import relationship
 
 class SnapshotMetrics(Base):
     __tablename__ = "snapshot_metrics"
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    snapshot_id = Column(Integer, ForeignKey("rolling_average_snapshots.id"), nullable=False)
-    metric_name = Column(String, nullable=False)
+    snapshot_id = Column(Integer, ForeignKey("rolling_average_snapshots.id"), primary_key=True)
+    metric_name = Column(String, primary_key=True)
+    # copied from the snapshot so range queries read one table, and the
+    # partition key on postgres, which has to be part of the primary key
+    date_of_run = Column(DateTime, primary_key=True)
+    activity_id = Column(BigInteger, nullable=True)
     metric_value = Column(Double, nullable=False)
     metric_unit = Column(String, nullable=False)
 
-    snapshot = relationship("RollingAverageSnapshots", back_populates="metrics")
\ No newline at end of file
+    snapshot = relationship("RollingAverageSnapshots", back_populates="metrics")
+
+    __table_args__ = (
+        # matches every range query, the included value makes averages index only scans
+        Index("ix_snapshot_metrics_metric_date", "metric_name", "date_of_run", postgresql_include=["metric_value"]),
+        Index("ix_snapshot_metrics_activity_id", "activity_id"),
+        # one partition per month of date_of_run, created on demand by ensure_metric_partitions
+        {"postgresql_partition_by": "RANGE (date_of_run)"},
+    )
@@ -0,0 +1,11 @@
+from server.models.base import Base
+from sqlalchemy import Column, BigInteger, String, DateTime
+
+class StravaToken(Base):
+    __tablename__ = "strava_tokens"
+
+    athlete_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    access_token = Column(String, nullable=False)
+    refresh_token = Column(String, nullable=True)
+    expires_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
@@ -0,0 +1,14 @@
+from server.models.base import Base
+from sqlalchemy import Column, BigInteger, String, DateTime
+
+class SyncJob(Base):
+    """Lease making sure only one worker syncs an athlete at a time."""
+    __tablename__ = "sync_jobs"
+
+    athlete_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    # running, finished or failed
+    status = Column(String, nullable=False)
+    worker = Column(String, nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    error = Column(String, nullable=True)
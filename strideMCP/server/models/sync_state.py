@@ -0,0 +1,12 @@
+from server.models.base import Base
+from sqlalchemy import Column, Integer, BigInteger, DateTime
+
+class SyncState(Base):
+    __tablename__ = "sync_state"
+
+    athlete_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    # cursor of the newest ingested activity, start time is stored as epoch seconds
+    last_start_time = Column(BigInteger, nullable=False, default=0)
+    last_activity_id = Column(BigInteger, nullable=False, default=0)
+    total_embedded = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
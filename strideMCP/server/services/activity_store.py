@@ -0,0 +1,72 @@
+import json
+import zstandard
+from datetime import datetime, timezone
+from sqlalchemy import delete, select
+from server.database.db import get_db, run_db
+from server.models.activity_detail import ActivityDetail
+from server.services.metrics_service import metrics_service
+from server.utils.activity_record import ActivityRecord
+
+# zstd level 3 compresses a parsed activity to roughly a third at a few microseconds per record
+COMPRESSION_LEVEL = 3
+
+
+class ActivityStore:
+    """Cold store for full parsed activities, zstd compressed JSON rows in activity_details.
+
+    Qdrant points only carry a small run summary. Tools read the full record
+    here, in one query, for the handful of runs they actually return.
+    """
+
+    def encode(self, run: ActivityRecord) -> bytes:
+        blob = zstandard.compress(json.dumps(run.to_dict(), separators=(",", ":")).encode(), COMPRESSION_LEVEL)
+        metrics_service.observe_size("activity_details.record", len(blob))
+        return blob
+
+    def decode(self, blob: bytes) -> dict:
+        return json.loads(zstandard.decompress(blob))
+
+    def replace(self, db, runs):
+        """Stage the records of runs, an ActivityBatch or ActivityRecords, in db's transaction, replacing older versions."""
+        if not len(runs):
+            return
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        db.execute(delete(ActivityDetail).where(ActivityDetail.activity_id.in_([run.activity_id for run in runs])))
+        db.add_all([
+            ActivityDetail(activity_id=run.activity_id, record=self.encode(run), updated_at=now)
+            for run in runs
+        ])
+
+    def save(self, runs):
+        db = get_db()
+        try:
+            self.replace(db, runs)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    @metrics_service.timed("sql.activity_details")
+    def load_many(self, activity_ids):
+        """Full records by activity id, ids with nothing stored are left out."""
+        ids = list({i for i in activity_ids if i is not None})
+        if not ids:
+            return {}
+        rows = get_db().execute(
+            select(ActivityDetail.activity_id, ActivityDetail.record).where(ActivityDetail.activity_id.in_(ids))
+        ).all()
+        return {activity_id: self.decode(record) for activity_id, record in rows}
+
+    async def hydrate(self, points):
+        """Swap the run summary in each point's payload for the full stored record."""
+        points = [p for p in points if p is not None and p.payload and "run" in p.payload]
+        stored = await run_db(self.load_many, [p.payload["run"].get("activity_id") for p in points])
+        for point in points:
+            run = stored.get(point.payload["run"].get("activity_id"))
+            # points from before the split still carry the full run themselves
+            if run is not None:
+                point.payload["run"] = run
+        return points
+
+
+activity_store = ActivityStore()
@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from server.services.metrics_service import metrics_service
+from server.services.resilience_service import resilience_service, DependencyUnavailable
+from server.database.db import get_db, run_db
+from server.models.data_version import DataVersion
+from server.config.config import CACHE_VERSION_CHECK_SECONDS
+
+load_dotenv()
+
+
+class ToolResultCache:
+    """TTL + LRU cache for read-only tool results.
+
+    Entries are keyed on the tool name, its normalized arguments and the data
+    version they were computed against. Ingest bumps the version after each
+    commit, which makes every older entry unreachable at once. The version is
+    kept in the database so a sync in one worker invalidates every worker.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300, version_check_seconds: float = 1):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        self.version_checked_at = float("-inf")
+        self.data_version = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.requests = metrics_service.counter("tool_cache_requests_total", "Tool cache lookups by tool and result")
+
+    def _query_shared_version(self):
+        db = get_db()
+        try:
+            return db.execute(select(DataVersion.version).where(DataVersion.name == "ingest")).scalar() or 0
+        finally:
+            # end the read's transaction so the connection goes back to the pool idle
+            db.rollback()
+
+    def _read_shared_version(self):
+        """The shared version, None without a database, a database failure is raised."""
+        try:
+            get_db()
+        except ValueError:
+            return None
+        return self._query_shared_version()
+
+    async def _read_shared_version_async(self):
+        """`_read_shared_version` off the event loop, under the database timeout, breaker and tool deadline."""
+        try:
+            get_db()
+        except ValueError:
+            return None
+        # the tool itself may not need the database, a failed check only skips the cache
+        with resilience_service.unrecorded():
+            return await run_db(self._query_shared_version)
+
+    def _increment_shared_version(self):
+        try:
+            db = get_db()
+        except ValueError:
+            return None
+        try:
+            result = db.execute(
+                update(DataVersion).where(DataVersion.name == "ingest").values(version=DataVersion.version + 1)
+            )
+            if result.rowcount == 0:
+                db.add(DataVersion(name="ingest", version=1))
+            db.commit()
+            return self._read_shared_version()
+        except IntegrityError:
+            # another process created the row first, increment that one instead
+            db.rollback()
+            return self._increment_shared_version()
+        except SQLAlchemyError:
+            db.rollback()
+            return None
+
+    def _version_check_due(self) -> bool:
+        now = time.monotonic()
+        if now - self.version_checked_at < self.version_check_seconds:
+            return False
+        self.version_checked_at = now
+        return True
+
+    def _apply_version(self, version):
+        if version is not None and version != self.data_version:
+            with self.lock:
+                self.data_version = version
+                self.entries.clear()
+
+    def _version_check_failed(self) -> bool:
+        # the local version may be behind another process, check again on the next call
+        self.version_checked_at = float("-inf")
+        return False
+
+    def _refresh_version(self) -> bool:
+        """Pick up a version bumped by another process, False when the shared version could not be read."""
+        if not self._version_check_due():
+            return True
+        try:
+            self._apply_version(self._read_shared_version())
+        except SQLAlchemyError:
+            return self._version_check_failed()
+        return True
+
+    async def _refresh_version_async(self) -> bool:
+        if not self._version_check_due():
+            return True
+        try:
+            self._apply_version(await self._read_shared_version_async())
+        except (DependencyUnavailable, SQLAlchemyError):
+            return self._version_check_failed()
+        return True
+
+    def bump_data_version(self):
+        version = self._increment_shared_version()
+        with self.lock:
+            self.data_version = version if version is not None else self.data_version + 1
+            self.entries.clear()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def _normalize(self, value):
+        if isinstance(value, str):
+            return " ".join(value.split())
+        return value
+
+    def _key(self, func, args, kwargs):
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = {name: self._normalize(value) for name, value in bound.arguments.items()}
+        return (func.__name__, json.dumps(arguments, sort_keys=True, default=repr))
+
+    def _lookup(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            version, expires_at, value = entry
+            if version != self.data_version or expires_at < time.monotonic():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+            return True, value
+
+    def _put(self, key, version, value):
+        # a partial result missing an unavailable dependency is not worth repeating, nor is an error
+        if resilience_service.degraded() or (isinstance(value, dict) and "error" in value):
+            return
+        with self.lock:
+            # the data changed while this result was computed, do not keep it
+            if version != self.data_version:
+                return
+            self.entries[key] = (version, time.monotonic() + self.ttl_seconds, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def _record_bypass(self, tool_name: str):
+        # without a current version a cached answer may be stale and a new one may go stale unnoticed
+        self.requests.inc(tool=tool_name, result="bypass")
+
+    def _record(self, tool_name: str, hit: bool):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self.requests.inc(tool=tool_name, result="hit" if hit else "miss")
+
+    def cached(self, func):
+        """Cache the results of a read-only tool, keeping its signature intact."""
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not await self._refresh_version_async():
+                    self._record_bypass(func.__name__)
+                    return await func(*args, **kwargs)
+                key = self._key(func, args, kwargs)
+                hit, value = self._lookup(key)
+                self._record(func.__name__, hit)
+                if hit:
+                    return value
+                version = self.data_version
+                value = await func(*args, **kwargs)
+                self._put(key, version, value)
+                return value
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self._refresh_version():
+                self._record_bypass(func.__name__)
+                return func(*args, **kwargs)
+            key = self._key(func, args, kwargs)
+            hit, value = self._lookup(key)
+            self._record(func.__name__, hit)
+            if hit:
+                return value
+            version = self.data_version
+            value = func(*args, **kwargs)
+            self._put(key, version, value)
+            return value
+        return wrapper
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "data_version": self.data_version,
+            }
+
+
+tool_cache = ToolResultCache(
+    max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", 256)),
+    ttl_seconds=float(os.getenv("TOOL_CACHE_TTL_SECONDS", 300)),
+    version_check_seconds=CACHE_VERSION_CHECK_SECONDS,
+)
@@ -0,0 +1,55 @@
+from google import genai
+from google.genai import types
+from dotenv import load_dotenv
+from server.config.config import EMBEDDER_TIMEOUT_SECONDS
+import os
+
+load_dotenv()
+
+
+class GeminiEmbedder:
+    def __init__(self, model: str = "text-embedding-004"):
+        self.model = model
+        # text-embedding-004 returns 768 dimensional vectors
+        self.dimensions = 768
+
+    def _client(self):
+        return genai.Client(
+            api_key=os.getenv("GEMINI_API_KEY"),
+            # milliseconds
+            http_options=types.HttpOptions(timeout=int(EMBEDDER_TIMEOUT_SECONDS * 1000))
+        )
+
+    def _embed(self, contents, task_type: str):
+        client = self._client()
+
+        embedding = client.models.embed_content(
+            model=self.model,
+            contents=contents,
+            config=types.EmbedContentConfig(task_type=task_type)
+        )
+
+        return [e.values for e in embedding.embeddings]
+
+    async def _aembed(self, contents, task_type: str):
+        client = self._client()
+
+        embedding = await client.aio.models.embed_content(
+            model=self.model,
+            contents=contents,
+            config=types.EmbedContentConfig(task_type=task_type)
+        )
+
+        return [e.values for e in embedding.embeddings]
+
+    def embed_documents(self, texts):
+        return self._embed(texts, "RETRIEVAL_DOCUMENT")
+
+    def embed_query(self, query: str):
+        return self._embed(query, "RETRIEVAL_QUERY")[0]
+
+    async def aembed_documents(self, texts):
+        return await self._aembed(texts, "RETRIEVAL_DOCUMENT")
+
+    async def aembed_query(self, query: str):
+        return (await self._aembed(query, "RETRIEVAL_QUERY"))[0]
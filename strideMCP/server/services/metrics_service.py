@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import logging
+import inspect
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# latency buckets in seconds, wide enough for both SQL lookups and full syncs
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# spans recorded while a traced tool call is running
+_current_trace: ContextVar = ContextVar("current_trace", default=None)
+
+trace_logger = logging.getLogger("stride.trace")
+
+
+def _label_key(labels: dict):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_key, extra=None):
+    pairs = list(label_key) + (extra or [])
+    if not pairs:
+        return ""
+    rendered = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + rendered + "}"
+
+
+class Counter:
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self.values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, value) for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[_label_key(labels)] = value
+
+
+class Histogram:
+    type_name = "histogram"
+
+    def __init__(self, name: str, description: str, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, series in self.values.items():
+                for bound, count in zip(self.buckets, series["counts"]):
+                    samples.append((f"{self.name}_bucket", key, count, [("le", repr(float(bound)))]))
+                samples.append((f"{self.name}_bucket", key, series["count"], [("le", "+Inf")]))
+                samples.append((f"{self.name}_sum", key, series["sum"]))
+                samples.append((f"{self.name}_count", key, series["count"]))
+        return samples
+
+
+class MetricsService:
+    def __init__(self, namespace: str = "stride"):
+        self.namespace = namespace
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.trace_enabled = os.getenv("TRACE_TOOL_CALLS", "").lower() in ("1", "true", "yes")
+
+        self.stage_duration = self.histogram("stage_duration_seconds", "Latency of each instrumented stage", LATENCY_BUCKETS)
+        self.stage_calls = self.counter("stage_calls_total", "Calls of each instrumented stage by outcome")
+        self.stage_in_flight = self.gauge("stage_in_flight", "Calls of each instrumented stage currently running")
+        self.payload_bytes = self.histogram("payload_bytes", "Size of payloads moved between stages", SIZE_BUCKETS)
+
+    def _register(self, cls, name, *args):
+        full_name = f"{self.namespace}_{name}"
+        with self.lock:
+            if full_name not in self.metrics:
+                self.metrics[full_name] = cls(full_name, *args)
+            return self.metrics[full_name]
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._register(Counter, name, description)
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._register(Gauge, name, description)
+
+    def histogram(self, name: str, description: str, buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, description, buckets)
+
+    def observe_size(self, kind: str, size: int):
+        self.payload_bytes.observe(size, kind=kind)
+
+    @contextmanager
+    def track(self, stage: str):
+        """Time a block of code as `stage`, counting it as in flight while it runs."""
+        self.stage_in_flight.inc(stage=stage)
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stage_in_flight.dec(stage=stage)
+            self.stage_duration.observe(elapsed, stage=stage)
+            self.stage_calls.inc(stage=stage, outcome=outcome)
+
+            spans = _current_trace.get()
+            if spans is not None:
+                spans.append({"stage": stage, "ms": round(elapsed * 1000, 3), "outcome": outcome})
+
+    def timed(self, stage: str):
+        """Decorator form of `track` for both plain and async functions."""
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.track(stage):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.track(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def _trace(self, tool_name: str, kwargs: dict):
+        if not self.trace_enabled:
+            yield
+            return
+
+        spans = []
+        token = _current_trace.set(spans)
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException as e:
+            outcome = f"error: {e}"
+            raise
+        finally:
+            _current_trace.reset(token)
+            trace_logger.info(json.dumps({
+                "tool": tool_name,
+                "arguments": {name: repr(value)[:200] for name, value in kwargs.items()},
+                "ms": round((time.perf_counter() - start) * 1000, 3),
+                "outcome": outcome,
+                "spans": spans,
+            }))
+
+    def tool(self, func):
+        """Instrument an MCP tool function, keeping its signature for schema generation."""
+        stage = f"tool.{func.__name__}"
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with self._trace(func.__name__, kwargs), self.track(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self._trace(func.__name__, kwargs), self.track(stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            registered = list(self.metrics.values())
+        for metric in registered:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for sample in metric.samples():
+                name, key, value = sample[0], sample[1], sample[2]
+                extra = sample[3] if len(sample) > 3 else None
+                lines.append(f"{name}{_format_labels(key, extra)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+if os.getenv("TRACE_LOG_PATH"):
+    _handler = logging.FileHandler(os.getenv("TRACE_LOG_PATH"))
+else:
+    # stdout belongs to the stdio MCP transport, so traces go to stderr
+    _handler = logging.StreamHandler()
+_handler.setFormatter(logging.Formatter("%(message)s"))
+trace_logger.addHandler(_handler)
+trace_logger.setLevel(logging.INFO)
+trace_logger.propagate = False
+
+metrics_service = MetricsService()
@@ -1,85 +1,179 @@
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue, FilterSelector, OrderBy
-from qdrant_client.models import PayloadSchemaType, PointStruct
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http.models import Filter, FieldCondition, MatchValue, FilterSelector, OrderBy, HasIdCondition
+from qdrant_client.models import PayloadSchemaType, PointStruct, VectorParams, Distance
+from qdrant_client.models import CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
 from datetime import datetime, timezone
-from google import genai
 import uuid
-from google.genai import types
+import math
+import time
+import threading
+import hashlib
 import asyncio
 from dotenv import load_dotenv
+from server.services.metrics_service import metrics_service
+from server.services.resilience_service import resilience_service
+from server.config.config import QDRANT_TIMEOUT_SECONDS
+from server.services.embedder import GeminiEmbedder
+from server.utils.run_features import raw_features, feature_vector, FEATURE_DIMENSIONS
+from server.utils.activity_text import activity_to_paragraph, TEMPLATE_VERSION
+from server.utils.activity_record import ActivityRecord
 import os
 
 load_dotenv()
 
+# named vectors on every point, embedded text and locally computed run features
+TEXT_VECTOR = "text"
+FEATURES_VECTOR = "features"
+# physical collections are named <prefix>_<created at>, searches go through an alias
+COLLECTION_PREFIX = "running_mcp"
+# a reindex in another process can swap the alias to a collection with a different layout
+LAYOUT_CHECK_SECONDS = 30
+# run fields kept in the payload, the full record lives in the activity store
+HOT_RUN_FIELDS = (
+    "activity_id", "name", "date", "distance_miles", "moving_time_sec",
+    "average_speed", "pace_min_per_mile", "total_elevation_gain",
+)
+
 class QdrantService():
-    def __init__(self):
-        self.client: QdrantClient = QdrantClient(url=os.getenv("QDRANT_URL"), api_key= os.getenv("QDRANT_API_KEY"))
-        self.collection_name: str = "running_mcp"
+    def __init__(self, embedder=None):
+        self.client: QdrantClient = self._create_client()
+        self.async_client: AsyncQdrantClient = self._create_async_client()
+        # local mode is not thread safe, calls made from worker threads take turns
+        self.local_lock = threading.Lock()
+        self.collection_name: str = f"{COLLECTION_PREFIX}_live"
         self.score_threshold: float = 0.35
-        self.embedding_model: str = "text-embedding-004"
-        self._create_payloads()
+        self.embedder = embedder or GeminiEmbedder()
+        self.embedding_model: str = self.embedder.model
+        self._named_vectors: bool = True
+        self._layout_checked_at: float = float("-inf")
+
+    def _create_client(self):
+        # QDRANT_PATH runs Qdrant in local mode, useful for development and benchmarks
+        if os.getenv("QDRANT_PATH"):
+            return QdrantClient(path=os.getenv("QDRANT_PATH"))
+        # the client takes whole seconds, round up so a fractional timeout is never cut short
+        return QdrantClient(url=os.getenv("QDRANT_URL"), api_key= os.getenv("QDRANT_API_KEY"), timeout=math.ceil(QDRANT_TIMEOUT_SECONDS))
+
+    def _create_async_client(self):
+        # local mode storage can only be opened once per process, the async methods
+        # fall back to running the sync client in a worker thread there
+        if os.getenv("QDRANT_PATH"):
+            return None
+        return AsyncQdrantClient(url=os.getenv("QDRANT_URL"), api_key= os.getenv("QDRANT_API_KEY"), timeout=math.ceil(QDRANT_TIMEOUT_SECONDS))
+
+    def _call_locked(self, method: str, **kwargs):
+        with self.local_lock:
+            return getattr(self.client, method)(**kwargs)
+
+    async def _call_async(self, method: str, **kwargs):
+        # every async call is a read, safe to hedge
+        if self.async_client is None:
+            return await resilience_service.call("qdrant", asyncio.to_thread, self._call_locked, method, hedge=True, **kwargs)
+        return await resilience_service.call("qdrant", getattr(self.async_client, method), hedge=True, **kwargs)
+
+    def ensure_collection(self):
+        """Point the collection alias at a collection, creating the first one when there is none, run at startup."""
+        if self.resolve_collection() is None:
+            # deployments from before aliases have a plain running_mcp collection, adopt it as is
+            if self.client.collection_exists(COLLECTION_PREFIX):
+                self.swap_alias(COLLECTION_PREFIX)
+            else:
+                self.swap_alias(self.create_collection_version())
+
+        if not self.has_named_vectors():
+            print(f"Collection {self.resolve_collection()} has no {FEATURES_VECTOR} vector, similar run search is disabled until it is reindexed")
+
+    def create_collection_version(self):
+        """Create an empty collection with the current layout, returning its name."""
+        name = f"{COLLECTION_PREFIX}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S%f')}"
+        self.client.create_collection(
+            collection_name=name,
+            vectors_config={
+                TEXT_VECTOR: VectorParams(size=self.embedder.dimensions, distance=Distance.COSINE),
+                # features are scaled to comparable units, so plain euclidean distance ranks them
+                FEATURES_VECTOR: VectorParams(size=FEATURE_DIMENSIONS, distance=Distance.EUCLID)
+            }
+        )
 
-    def _create_payloads(self):
         self.client.create_payload_index(
-            collection_name=self.collection_name,
+            collection_name=name,
             field_name="date",
             field_schema= PayloadSchemaType.KEYWORD
         )
 
         self.client.create_payload_index(
-            collection_name=self.collection_name,
+            collection_name=name,
             field_name="time_stamp",
             field_schema= PayloadSchemaType.FLOAT
         )
-    
-    async def _embed_all_activities(self, activities):
-        """Embed multiple activities in parallel"""
-        tasks = []
-        for activity in activities:
-            tasks.append(self._embed_activity(activity[1]))
-        return await asyncio.gather(*tasks)
-    
-    def batch_embed(self, activities):
-        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        return name
 
-        embedding = client.models.embed_content(
-            model="text-embedding-004",
-            contents= activities,
-            config=types.EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT")
-        )
+    def resolve_collection(self):
+        """Name of the collection the alias currently points at."""
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == self.collection_name:
+                return alias.collection_name
+        return None
 
-        return [e.values for e in embedding.embeddings]
+    def swap_alias(self, target: str):
+        operations = []
+        if self.resolve_collection() is not None:
+            operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=self.collection_name)))
+        operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=target, alias_name=self.collection_name)))
 
-    
-    async def _embed_activity(self, activity_text: str):
-        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        # both operations are applied atomically, searches see either the old or the new collection
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        self._set_layout(self.client.get_collection(target).config.params.vectors)
 
-        embedding = client.models.embed_content(
-            model="text-embedding-004",
-            contents= activity_text,
-            config=types.EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT")
-        )
+    def _set_layout(self, vectors):
+        # collections created before named vectors hold a single unnamed text vector
+        self._named_vectors = isinstance(vectors, dict)
+        self._layout_checked_at = time.monotonic()
 
-        return embedding.embeddings[0].values
+    def _layout_stale(self) -> bool:
+        return time.monotonic() - self._layout_checked_at > LAYOUT_CHECK_SECONDS
 
-    
-    def embed_query(self, query: str):
-        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    def has_named_vectors(self) -> bool:
+        """Whether the collection behind the alias has named vectors, blocking, for startup, jobs and ingest."""
+        if self._layout_stale():
+            self._set_layout(self.client.get_collection(self.collection_name).config.params.vectors)
+        return self._named_vectors
 
-        embedding = client.models.embed_content(
-            model="text-embedding-004",
-            contents= query,
-            config=types.EmbedContentConfig(task_type="RETRIEVAL_QUERY")
-        )
+    async def ahas_named_vectors(self) -> bool:
+        """`has_named_vectors` for tools, re-read through the async client under the qdrant timeout and breaker."""
+        if self._layout_stale():
+            collection = await self._call_async("get_collection", collection_name=self.collection_name)
+            self._set_layout(collection.config.params.vectors)
+        return self._named_vectors
+
+    def embedding_metadata(self, text: str):
+        return {
+            "model": self.embedding_model,
+            "template_version": TEMPLATE_VERSION,
+            "content_hash": hashlib.sha256(text.encode()).hexdigest()
+        }
 
-        return embedding.embeddings[0].values
+    def is_stale(self, payload, run: ActivityRecord) -> bool:
+        """True when a point was embedded with another model, template or activity text."""
+        return payload.get("embedding") != self.embedding_metadata(activity_to_paragraph(run))
+
+    @metrics_service.timed("embedder.embed_documents")
+    def batch_embed(self, activities):
+        return resilience_service.call_sync("embedder", self.embedder.embed_documents, activities)
+
+    @metrics_service.timed("embedder.embed_query")
+    async def embed_query(self, query: str):
+        return await resilience_service.call("embedder", self.embedder.aembed_query, query, hedge=True)
     
-    def search_for_runs_by_embedding(self, vectorized_query):
-        search_results = self.client.query_points(
+    @metrics_service.timed("qdrant.search_by_embedding")
+    async def search_for_runs_by_embedding(self, vectorized_query):
+        search_results = await self._call_async(
+            "query_points",
             collection_name=self.collection_name,
             query=vectorized_query,
             # search filter allows us to filter by fields on the payload
             # query_filter=search_filter,
+            using=TEXT_VECTOR if await self.ahas_named_vectors() else None,
             limit=3,
             score_threshold=self.score_threshold,
         )
@@ -87,22 +181,26 @@ class QdrantService():
         return search_results
 
     
-    def search_runs_by_date(self, date: str):
+    @metrics_service.timed("qdrant.search_by_date")
+    async def search_runs_by_date(self, date: str):
         search_filter = Filter(
             must=[
                 FieldCondition(key="date", match=MatchValue(value=date))
             ]
         )
 
-        search_result = self.client.scroll(
+        search_result = await self._call_async(
+            "scroll",
             collection_name=self.collection_name,
             scroll_filter= search_filter
         )
 
         return search_result
 
-    def search_for_runs_by_n(self, n: int):
-        search_result = self.client.scroll(
+    @metrics_service.timed("qdrant.search_last_n")
+    async def search_for_runs_by_n(self, n: int):
+        search_result = await self._call_async(
+            "scroll",
             collection_name=self.collection_name,
             limit=n,
             order_by=OrderBy(
@@ -112,46 +210,89 @@ class QdrantService():
         )
 
         return search_result
-    
-    def insert_points(self, points):
-        points_to_be_inserted = []
-
-        activites =[]
-        for p in points:
-            activites.append(p[1])
-
-        vectors = self.batch_embed(activites)
-        
-        for point_data, vector in zip(points, vectors):
-            run_json = point_data[0]
-            
-            date_str = str(run_json["date"])
-            date_str = date_str.replace("Z", "+00:00")
-            todays_date = datetime.fromisoformat(date_str)
-            todays_date = todays_date.strftime("%Y-%m-%d")
-
-            todays_date_obj = datetime.fromisoformat(date_str)
-            time_stamp = int(todays_date_obj.timestamp())
-
-            point = PointStruct(
-                id=str(uuid.uuid4()),
-                vector=vector,
-                payload={
-                    "run": run_json,
-                    "date": todays_date,
-                    "time_stamp": time_stamp,
-                    "strava_id": "1"
-                }
+
+    def point_id(self, activity_id):
+        # deterministic ids make re-ingesting an activity an overwrite
+        return str(uuid.uuid5(uuid.NAMESPACE_OID, str(activity_id)))
+
+    @metrics_service.timed("qdrant.run_features")
+    async def get_run_with_features(self, activity_id: int = None, date: str = None):
+        if activity_id is not None:
+            records = await self._call_async(
+                "retrieve",
+                collection_name=self.collection_name,
+                ids=[self.point_id(activity_id)],
+                with_vectors=[FEATURES_VECTOR]
+            )
+        else:
+            records, _ = await self._call_async(
+                "scroll",
+                collection_name=self.collection_name,
+                scroll_filter=Filter(must=[FieldCondition(key="date", match=MatchValue(value=date))]),
+                limit=1,
+                with_vectors=[FEATURES_VECTOR]
             )
-            points_to_be_inserted.append(point)
 
-        self.client.upsert(
+        return records[0] if records else None
+
+    @metrics_service.timed("qdrant.search_similar_runs")
+    async def search_similar_runs(self, record, limit: int):
+        search_results = await self._call_async(
+            "query_points",
             collection_name=self.collection_name,
-            points=points_to_be_inserted
+            query=record.vector[FEATURES_VECTOR],
+            using=FEATURES_VECTOR,
+            query_filter=Filter(must_not=[HasIdCondition(has_id=[record.id])]),
+            limit=limit
         )
 
-qdrant_service = QdrantService()
+        return search_results
+    
+    def build_point(self, run: ActivityRecord, text: str, vector, named_vectors: bool = True, point_id=None):
+        """Point for run, keyed on its activity. A run without an activity id keeps point_id, the id it already has."""
+        date_str = str(run.date)
+        date_str = date_str.replace("Z", "+00:00")
+        todays_date = datetime.fromisoformat(date_str)
+        todays_date = todays_date.strftime("%Y-%m-%d")
 
+        todays_date_obj = datetime.fromisoformat(date_str)
+        time_stamp = int(todays_date_obj.timestamp())
 
-    
+        features = raw_features(run)
+        if named_vectors:
+            vector = {TEXT_VECTOR: vector, FEATURES_VECTOR: feature_vector(features)}
+
+        return PointStruct(
+            id=self.point_id(run.activity_id) if run.activity_id is not None else point_id,
+            vector=vector,
+            payload={
+                # nothing in the activity store belongs to a run without an activity id, it keeps its whole record here
+                "run": {field: getattr(run, field) for field in HOT_RUN_FIELDS} if run.activity_id is not None else run.to_dict(),
+                "date": todays_date,
+                "time_stamp": time_stamp,
+                "features": features,
+                "embedding": self.embedding_metadata(text),
+                "strava_id": "1"
+            }
+        )
+
+    def insert_points(self, activities, texts):
+        """Embed texts and upsert one point per activity, activities is an ActivityBatch or list of ActivityRecords."""
+        vectors = self.batch_embed(texts)
+        named_vectors = self.has_named_vectors()
 
+        points_to_be_inserted = [
+            self.build_point(run, text, vector, named_vectors)
+            for run, text, vector in zip(activities, texts, vectors)
+        ]
+
+        with metrics_service.track("qdrant.upsert"):
+            resilience_service.call_sync(
+                "qdrant",
+                self._call_locked,
+                "upsert",
+                collection_name=self.collection_name,
+                points=points_to_be_inserted
+            )
+
+qdrant_service = QdrantService()
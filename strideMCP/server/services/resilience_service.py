@@ -0,0 +1,314 @@
+import time
+import asyncio
+import functools
+import threading
+import httpx
+from contextlib import contextmanager
+from contextvars import ContextVar
+from google.genai import errors as genai_errors
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from sqlalchemy import exc as sqlalchemy_exc
+from server.services.metrics_service import metrics_service
+from server.config.config import (
+    TOOL_DEADLINE_SECONDS,
+    STRAVA_TIMEOUT_SECONDS,
+    EMBEDDER_TIMEOUT_SECONDS,
+    QDRANT_TIMEOUT_SECONDS,
+    LISTENER_TIMEOUT_SECONDS,
+    CIRCUIT_BREAKER_FAILURES,
+    CIRCUIT_BREAKER_RESET_SECONDS,
+    QDRANT_HEDGE_AFTER_SECONDS,
+    EMBEDDER_HEDGE_AFTER_SECONDS
+)
+
+# monotonic time the running tool call has to answer by
+_deadline: ContextVar = ContextVar("deadline", default=None)
+# dependencies the running tool call had to do without, shared with the tasks it spawns
+_unavailable: ContextVar = ContextVar("unavailable", default=None)
+
+
+class DependencyUnavailable(Exception):
+    """A downstream call timed out, ran out of tool deadline, failed or was refused by an open circuit."""
+
+    def __init__(self, dependency: str, reason: str):
+        super().__init__(f"{dependency} is unavailable ({reason})")
+        self.dependency = dependency
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures, then lets a single trial call through every `reset_seconds`."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.probing and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_inconclusive(self):
+        """A call ended without telling whether the dependency is healthy, let the next one probe instead."""
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# errors raised when a dependency could not be reached or did not answer in time
+_TRANSPORT_ERRORS = (
+    httpx.TransportError,
+    TimeoutError,
+    ConnectionError,
+    ResponseHandlingException,
+    sqlalchemy_exc.OperationalError,
+    sqlalchemy_exc.TimeoutError,
+)
+
+
+def _is_dependency_failure(error: Exception) -> bool:
+    """True for transport errors, timeouts and 5xx answers, the errors that say a dependency is unhealthy."""
+    # a 4xx answer means the dependency is up and rejected this request, it says nothing about its health,
+    # and neither does a bad argument or a bug on this side
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code is not None and error.status_code >= 500
+    if isinstance(error, genai_errors.APIError):
+        return error.code is not None and error.code >= 500
+    if isinstance(error, sqlalchemy_exc.DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, _TRANSPORT_ERRORS)
+
+
+def _is_timeout(error: Exception) -> bool:
+    return isinstance(error, (TimeoutError, httpx.TimeoutException))
+
+
+class ResilienceService:
+    """Deadlines, timeouts, circuit breakers and hedged reads for every outbound call.
+
+    A tool decorated with `deadline` gets TOOL_DEADLINE_SECONDS for all of its
+    downstream calls. Each call made through `call` is cut off at the dependency's
+    own timeout or the remaining deadline, whichever comes first, and is refused
+    right away while the dependency's circuit is open.
+    """
+
+    def __init__(self, tool_deadline_seconds: float, timeouts: dict, hedge_after: dict,
+                 failure_threshold: int, reset_seconds: float):
+        self.tool_deadline_seconds = tool_deadline_seconds
+        # None leaves a dependency bounded by the tool deadline alone
+        self.timeouts = timeouts
+        self.hedge_after = hedge_after
+        self.breakers = {name: CircuitBreaker(failure_threshold, reset_seconds) for name in timeouts}
+
+        self.failures = metrics_service.counter("dependency_failures_total", "Failed downstream calls by dependency and reason")
+        self.timeouts_total = metrics_service.counter("dependency_timeouts_total", "Downstream calls cut off by a timeout or the tool deadline")
+        self.circuit_open = metrics_service.gauge("dependency_circuit_open", "1 while a dependency's circuit breaker is open")
+        self.hedges = metrics_service.counter("hedged_requests_total", "Duplicate reads sent after the hedge delay, by which copy answered")
+        self.degraded_tools = metrics_service.counter("degraded_tool_calls_total", "Tool calls answered without one or more dependencies")
+
+    def remaining(self):
+        """Seconds left in the running tool's deadline, None outside of a tool call."""
+        deadline = _deadline.get()
+        return None if deadline is None else deadline - time.monotonic()
+
+    def degraded(self) -> bool:
+        """True when the running tool call had to leave out a failed dependency."""
+        return bool(_unavailable.get())
+
+    @contextmanager
+    def unrecorded(self):
+        """Calls made inside still count against the breakers, but do not mark the running tool call degraded."""
+        token = _unavailable.set(None)
+        try:
+            yield
+        finally:
+            _unavailable.reset(token)
+
+    def _timeout_for(self, dependency: str):
+        timeout = self.timeouts[dependency]
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout, "timeout"
+        if remaining <= 0:
+            raise self._unavailable_error(dependency, "deadline")
+        if timeout is None or remaining < timeout:
+            return remaining, "deadline"
+        return timeout, "timeout"
+
+    def _unavailable_error(self, dependency: str, reason: str):
+        unavailable = _unavailable.get()
+        if unavailable is not None:
+            unavailable.add(dependency)
+        self.failures.inc(dependency=dependency, reason=reason)
+        if reason in ("timeout", "deadline"):
+            self.timeouts_total.inc(dependency=dependency, reason=reason)
+        return DependencyUnavailable(dependency, reason)
+
+    def _check_circuit(self, dependency: str):
+        if not self.breakers[dependency].allow():
+            raise self._unavailable_error(dependency, "circuit_open")
+
+    def _record_failure(self, dependency: str, reason: str):
+        breaker = self.breakers[dependency]
+        # running out of the caller's deadline is not the dependency's fault
+        if reason == "deadline":
+            breaker.record_inconclusive()
+            return
+        breaker.record_failure()
+        self.circuit_open.set(1 if breaker.is_open else 0, dependency=dependency)
+
+    def _record_success(self, dependency: str):
+        breaker = self.breakers[dependency]
+        if breaker.failures or breaker.is_open:
+            breaker.record_success()
+            self.circuit_open.set(0, dependency=dependency)
+
+    async def call(self, dependency: str, func, *args, hedge: bool = False, **kwargs):
+        """Await func(*args, **kwargs) under the dependency's timeout, circuit breaker and, for idempotent reads, hedging."""
+        timeout, timeout_reason = self._timeout_for(dependency)
+        self._check_circuit(dependency)
+
+        try:
+            if hedge and self.hedge_after.get(dependency):
+                call = self._hedged(dependency, func, args, kwargs)
+            else:
+                call = func(*args, **kwargs)
+            result = await asyncio.wait_for(call, timeout)
+        except asyncio.CancelledError:
+            self.breakers[dependency].record_inconclusive()
+            raise
+        except asyncio.TimeoutError:
+            self._record_failure(dependency, timeout_reason)
+            raise self._unavailable_error(dependency, timeout_reason) from None
+        except Exception as e:
+            if not _is_dependency_failure(e):
+                self._record_success(dependency)
+                raise
+            reason = "timeout" if _is_timeout(e) else "error"
+            self._record_failure(dependency, reason)
+            raise self._unavailable_error(dependency, reason) from e
+
+        self._record_success(dependency)
+        return result
+
+    def call_sync(self, dependency: str, func, *args, **kwargs):
+        """Blocking form of `call` for the ingest path, timeouts there come from the clients themselves."""
+        self._check_circuit(dependency)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if not _is_dependency_failure(e):
+                self._record_success(dependency)
+                raise
+            reason = "timeout" if _is_timeout(e) else "error"
+            self._record_failure(dependency, reason)
+            raise self._unavailable_error(dependency, reason) from e
+
+        self._record_success(dependency)
+        return result
+
+    async def _hedged(self, dependency: str, func, args, kwargs):
+        primary = asyncio.ensure_future(func(*args, **kwargs))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after[dependency])
+            if done:
+                return primary.result()
+
+            hedge = asyncio.ensure_future(func(*args, **kwargs))
+            tasks.append(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedges.inc(dependency=dependency, winner="hedge" if task is hedge else "primary")
+                        return task.result()
+            # both copies failed, report the original's error
+            return primary.result()
+        finally:
+            # the loser, or both copies when the deadline cancels this call
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def partial(self, awaitable, default=None):
+        """Await an optional part of a tool result, leaving `default` in its place when a dependency is unavailable."""
+        try:
+            return await awaitable
+        except DependencyUnavailable:
+            return default
+
+    def deadline(self, func):
+        """Run a tool under TOOL_DEADLINE_SECONDS, answering with an error instead of raising when a dependency is unavailable."""
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            deadline = time.monotonic() + self.tool_deadline_seconds
+            # a tool called from another tool keeps the caller's tighter deadline
+            outer = _deadline.get()
+            deadline_token = _deadline.set(deadline if outer is None else min(outer, deadline))
+            unavailable = set()
+            unavailable_token = _unavailable.set(unavailable)
+            try:
+                result = await func(*args, **kwargs)
+            except DependencyUnavailable as e:
+                self.degraded_tools.inc(tool=func.__name__)
+                return {
+                    "error": f"{e}, try again shortly",
+                    "unavailable": sorted(unavailable | {e.dependency})
+                }
+            finally:
+                _deadline.reset(deadline_token)
+                _unavailable.reset(unavailable_token)
+
+            if unavailable:
+                self.degraded_tools.inc(tool=func.__name__)
+                if isinstance(result, dict):
+                    result = {**result, "unavailable": sorted(unavailable)}
+            return result
+        return wrapper
+
+
+resilience_service = ResilienceService(
+    tool_deadline_seconds=TOOL_DEADLINE_SECONDS,
+    timeouts={
+        "strava": STRAVA_TIMEOUT_SECONDS,
+        "embedder": EMBEDDER_TIMEOUT_SECONDS,
+        "qdrant": QDRANT_TIMEOUT_SECONDS,
+        "listener": LISTENER_TIMEOUT_SECONDS,
+        # postgres enforces DATABASE_STATEMENT_TIMEOUT_SECONDS per statement
+        "database": None,
+    },
+    hedge_after={
+        "qdrant": QDRANT_HEDGE_AFTER_SECONDS,
+        "embedder": EMBEDDER_HEDGE_AFTER_SECONDS,
+    },
+    failure_threshold=CIRCUIT_BREAKER_FAILURES,
+    reset_seconds=CIRCUIT_BREAKER_RESET_SECONDS,
+)
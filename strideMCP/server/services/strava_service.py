@@ -1,49 +1,78 @@
-import os
-import json
 import asyncio
 import httpx
-from datetime import datetime
-from stravalib import Client
-from google import genai
-from google.genai import types
+from datetime import datetime, timezone
+from sqlalchemy import delete, select
 from server.services.qdrant_tool import qdrant_service
+from server.services.activity_store import activity_store
+from server.services.metrics_service import metrics_service
+from server.services.resilience_service import resilience_service
+from server.services.cache_service import tool_cache
+from server.services.stream_store import stream_store, STREAM_KEYS
+from server.services.training_load_service import training_load_service
+from server.services.sync_job_service import sync_job_service
 from server.models.rolling_average_snapshots import RollingAverageSnapshots
 from server.models.snapshot_metrics import SnapshotMetrics
+from server.models.sync_state import SyncState
 from server.database.db import get_db
+from server.database.partitions import ensure_metric_partitions
+from server.database.queries import get_sync_state
+from server.config.config import STRAVA_API_URL, INITIAL_SYNC_AFTER, INGEST_STREAMS, STRAVA_TIMEOUT_SECONDS, STRAVA_MAX_CONCURRENT_REQUESTS
+from server.utils.activity_text import activity_to_paragraph
+from server.utils.activity_record import ActivityBatch, start_epoch
 
 class StravaService:
-    def __init__(self, access_token: str):
+    def __init__(self, access_token: str, ingest_streams: bool = INGEST_STREAMS, rate_limiter=None):
         self.access_token = access_token
-        self.embedding_state_file_path = os.path.join(os.path.dirname(__file__), "embedding_state.json")
-        self.embedding_state = self._load_embedding_state()
-        self.client = Client(access_token=access_token)
+        self.ingest_streams = ingest_streams
+        # optional AsyncRateLimiter every Strava request waits on
+        self.rate_limiter = rate_limiter
         self.db = get_db()
+        self.athlete_id = None
+        self.sync_state = None
+
+    def _load_sync_state(self):
+        sync_state = get_sync_state(self.athlete_id)
+        if sync_state:
+            return sync_state
+
+        initial_after = datetime.strptime(INITIAL_SYNC_AFTER, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        return SyncState(
+            athlete_id=self.athlete_id,
+            last_start_time=int(initial_after.timestamp()),
+            last_activity_id=0,
+            total_embedded=0,
+        )
 
-    def _load_embedding_state(self):
-        if os.path.exists(self.embedding_state_file_path):
-            with open(self.embedding_state_file_path, "r") as f:
-                return json.load(f)
-        return {
-            "total_embedded": 0,
-            "last_sync_timestamp": ""
-        }
+    @metrics_service.timed("strava.sync")
+    def run(self):
+        self.athlete_id = self._get_athlete_id()
+        if not sync_job_service.acquire(self.athlete_id):
+            print(f"A sync for athlete {self.athlete_id} is already running")
+            return
+
+        try:
+            self._sync()
+        except Exception as e:
+            sync_job_service.release(self.athlete_id, error=str(e))
+            raise
+        sync_job_service.release(self.athlete_id)
 
-    def _save_embedding_state(self):
-        with open(self.embedding_state_file_path, "w") as f:
-            json.dump(self.embedding_state, f, indent=4)
+    def _sync(self):
+        self.sync_state = self._load_sync_state()
 
-    def run(self):
-        user_activites = self._retrieve_activities()
-        if len(user_activites) < 1:
+        activities = self._retrieve_activities()
+        if len(activities) < 1:
             return
-        points = []
-        for a in user_activites:
-            meaningful_text = self._convert_activity_to_paragraph(a)
-            points.append((a, meaningful_text))
+        texts = [activity_to_paragraph(a) for a in activities]
 
-        self._store_snapshots_and_metrics(points)
+        if self.ingest_streams:
+            self._store_activity_streams(activities.activity_ids)
 
-        qdrant_service.insert_points(points)
+        # points are upserted under ids derived from the activity id, so if the
+        # commit below fails the next sync simply overwrites them
+        qdrant_service.insert_points(activities, texts)
+
+        self._store_snapshots_and_metrics(activities)
 
     def _get_units_from_metric_name(self, metric_name: str) -> str:
         units = {
@@ -55,15 +84,17 @@ class StravaService:
         }
         return units.get(metric_name, None)
 
-    def _store_snapshots_and_metrics(self, points):
+    def _build_snapshots(self, activities):
         snap_shots = []
         metrics = []
         metrics_to_gather = ["distance_miles", "moving_time_sec", "average_speed", "pace_min_per_mile", "total_elevation_gain"]
-        for p in points:
-            run_data = p[0]
-            run_date = run_data.get("date", "")
+        run_dates = activities.start_datetimes()
+        values = {metric_name: activities.values(metric_name) for metric_name in metrics_to_gather}
+        for i, activity_id in enumerate(activities.activity_ids):
+            run_date = run_dates[i]
 
             snapshot = RollingAverageSnapshots(
+                activity_id=activity_id,
                 date_of_run=run_date,
                 snapshot_date=datetime.now(),
             )
@@ -72,8 +103,10 @@ class StravaService:
             for metric_name in metrics_to_gather:
                 metric  = SnapshotMetrics(
                     snapshot = snapshot,
+                    activity_id = activity_id,
+                    date_of_run = run_date,
                     metric_name = metric_name,
-                    metric_value = run_data.get(metric_name, ""),
+                    metric_value = values[metric_name][i],
                     metric_unit= self._get_units_from_metric_name(metric_name)
                 )
 
@@ -83,104 +116,168 @@ class StravaService:
 
             snap_shots.append(snapshot)
 
+        return snap_shots
+
+    def _replace_snapshots(self, db, activities):
+        """Add the snapshots and full records of activities, replacing any an earlier ingest stored for the same activities."""
+        activity_ids = list(activities.activity_ids)
+        stale = select(RollingAverageSnapshots.id).where(RollingAverageSnapshots.activity_id.in_(activity_ids))
+        db.execute(delete(SnapshotMetrics).where(SnapshotMetrics.snapshot_id.in_(stale)))
+        db.execute(delete(RollingAverageSnapshots).where(RollingAverageSnapshots.activity_id.in_(activity_ids)))
+        db.add_all(self._build_snapshots(activities))
+        activity_store.replace(db, activities)
+
+    @metrics_service.timed("db.store_snapshots")
+    def _store_snapshots_and_metrics(self, activities):
+        run_dates = activities.start_datetimes()
+        self._advance_sync_state(activities)
+
+        # the cursor is committed together with the rows it describes, so a
+        # failed commit leaves the next sync fetching the same activities again
         try:
-            self.db.add_all(snap_shots)
+            ensure_metric_partitions(self.db, run_dates)
+            self._replace_snapshots(self.db, activities)
+            self.db.merge(self.sync_state)
             self.db.commit()
+        except Exception:
+            self.db.rollback()
+            # the points were upserted before the commit, answers cached from the old ones are stale now
+            tool_cache.bump_data_version()
+            raise
+
+        # only the rolling windows from the oldest new run onwards can change
+        earliest_run = min(run_dates)
+        try:
+            training_load_service.update(earliest_run.date())
         except Exception as e:
-            print(f"Error: {e}")
-       
-
-
-
-
-    def _convert_activity_to_paragraph(self, activity):
-        name = activity.get("name", "Unnamed Activity")
-        description = activity.get("description", "No description provided.")
-        distance = activity.get("distance_miles", 0)
-        moving_time = activity.get("moving_time_sec", 0)
-        avg_speed = activity.get("average_speed", 0)
-        pace = activity.get("pace_min_per_mile", 0)
-        paces_list = activity.get("paces_per_mile", [])
-        gear = activity.get("gear_name", "Unknown gear")
-        elevation = activity.get("total_elevation_gain", 0)
-        location = activity.get("time_zone_location", "Unknown location")
-        pr_count = activity.get("pr_count", 0)
-
-        paces_str = ", ".join(f"{p:.2f} min/mi" for p in paces_list) if paces_list else "N/A"
-
-        minutes = moving_time // 60
-        seconds = moving_time % 60
-        time_str = f"{minutes} minutes {seconds} seconds"
-
-        paragraph = (
-            f"Activity titled '{name}' took place in {location}. "
-            f"It was described as: {description}. "
-            f"The run covered a distance of {distance:.2f} miles "
-            f"with a total moving time of {time_str}. "
-            f"The average speed was {avg_speed:.2f} miles per hour, "
-            f"corresponding to a pace of {pace:.2f} minutes per mile. "
-            f"Paces for each mile were: {paces_str}. "
-            f"The run was completed using {gear}. "
-            f"Total elevation gain was {elevation} feet. "
-            f"This activity recorded {pr_count} personal records."
+            print(f"Updating training load failed: {e}")
+
+        tool_cache.bump_data_version()
+
+    def _advance_sync_state(self, activities):
+        for cursor in zip(activities.start_epochs, activities.activity_ids):
+            if cursor > (self.sync_state.last_start_time, self.sync_state.last_activity_id):
+                self.sync_state.last_start_time, self.sync_state.last_activity_id = cursor
+
+        self.sync_state.total_embedded = (self.sync_state.total_embedded or 0) + len(activities)
+        self.sync_state.updated_at = datetime.now(timezone.utc)
+
+    @metrics_service.timed("strava.get_athlete")
+    def _get_athlete_id(self):
+        response = resilience_service.call_sync(
+            "strava",
+            httpx.get,
+            f"{STRAVA_API_URL}/athlete",
+            headers={"Authorization": f"Bearer {self.access_token}"},
+            timeout=STRAVA_TIMEOUT_SECONDS
         )
+        response.raise_for_status()
+        return response.json()["id"]
+
+    async def _get(self, client: httpx.AsyncClient, url: str, params: dict = None):
+        async def get():
+            response = await client.get(url, params=params, headers={"Authorization": f"Bearer {self.access_token}"})
+            # inside the call, so 5xx answers count against the circuit breaker
+            response.raise_for_status()
+            return response
+        return await resilience_service.call("strava", get)
+
+    async def _throttle(self):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+
+    @metrics_service.timed("strava.list_activities")
+    async def _list_activities_after(self, after: int, before: int = None):
+        """Page through the summary activity list, materializing it exactly once."""
+        activities = []
+        page = 1
+        per_page = 200
+        params = {"after": after}
+        if before is not None:
+            params["before"] = before
+        async with httpx.AsyncClient(timeout=STRAVA_TIMEOUT_SECONDS) as client:
+            while True:
+                await self._throttle()
+                response = await self._get(
+                    client,
+                    f"{STRAVA_API_URL}/athlete/activities",
+                    params={**params, "page": page, "per_page": per_page}
+                )
+                metrics_service.observe_size("strava.activity_page", len(response.content))
+                batch = response.json()
+                activities.extend(batch)
+                if len(batch) < per_page:
+                    return activities
+                page += 1
+
+    @metrics_service.timed("strava.activity_detail")
+    async def _get_activity_details(self, activity_id: int):
+        await self._throttle()
+        async with httpx.AsyncClient(timeout=STRAVA_TIMEOUT_SECONDS) as client:
+            response = await self._get(client, f"{STRAVA_API_URL}/activities/{activity_id}")
+            metrics_service.observe_size("strava.activity_detail", len(response.content))
+            return response.json()
 
-        return paragraph
-    
+    async def _fetch_all(self, fetch, activity_ids, return_exceptions: bool = False):
+        """Run fetch for every activity, at most STRAVA_MAX_CONCURRENT_REQUESTS at a time."""
+        semaphore = asyncio.Semaphore(STRAVA_MAX_CONCURRENT_REQUESTS)
 
-    async def _get_activity_details(self, activity_id: int):
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://www.strava.com/api/v3/activities/{activity_id}",
-                headers={"Authorization": f"Bearer {self.access_token}"}
+        async def bounded(activity_id):
+            async with semaphore:
+                return await fetch(activity_id)
+
+        return await asyncio.gather(*(bounded(activity_id) for activity_id in activity_ids), return_exceptions=return_exceptions)
+
+    async def _get_all_activity_details(self, activities):
+        return await self._fetch_all(self._get_activity_details, [a["id"] for a in activities])
+
+    async def _get_new_activity_details(self):
+        last_start_time = self.sync_state.last_start_time
+        last_activity_id = self.sync_state.last_activity_id
+
+        # ask for one second of overlap so activities sharing the cursor's start
+        # second are not lost, then drop everything at or before the cursor
+        summaries = await self._list_activities_after(last_start_time - 1)
+        new_activities = [
+            a for a in summaries
+            if (start_epoch(a["start_date"]), a["id"]) > (last_start_time, last_activity_id)
+        ]
+        return await self._get_all_activity_details(new_activities)
+
+    @metrics_service.timed("strava.activity_streams")
+    async def _get_activity_streams(self, activity_id: int):
+        await self._throttle()
+        async with httpx.AsyncClient(timeout=STRAVA_TIMEOUT_SECONDS) as client:
+            response = await self._get(
+                client,
+                f"{STRAVA_API_URL}/activities/{activity_id}/streams",
+                params={"keys": ",".join(STREAM_KEYS), "key_by_type": "true"}
             )
+            metrics_service.observe_size("strava.activity_streams", len(response.content))
             return response.json()
-    
-            
-    async def _get_all_activity_details(self, activities):
-        details = []
-        for a in activities:
-            details.append(self._get_activity_details(a.id))
-        return await asyncio.gather(*details)
 
+    async def _get_all_activity_streams(self, activity_ids):
+        return await self._fetch_all(self._get_activity_streams, activity_ids, return_exceptions=True)
 
+    def _store_activity_streams(self, activity_ids):
+        self._save_activity_streams(activity_ids, asyncio.run(self._get_all_activity_streams(activity_ids)))
 
-    def _retrieve_activities(self):
-        timestamp_str = datetime.now().strftime("%Y-%m-%d")
-        if self.embedding_state['total_embedded'] == 0:
-            try:
-                user_activities = self.client.get_activities(after="2025-06-01")
+    def _save_activity_streams(self, activity_ids, all_streams):
+        # streams are an optional extra, a failed fetch only loses that activity's streams
+        for activity_id, streams in zip(activity_ids, all_streams):
+            if isinstance(streams, Exception):
+                print(f"Retrieving streams for activity {activity_id} failed: {streams}")
+                continue
+            stream_store.save_streams(activity_id, streams)
 
-                descriptive_activities = []
+    def _retrieve_activities(self):
+        try:
+            descriptive_activities = asyncio.run(self._get_new_activity_details())
+        except Exception as e:
+            print(f"Retrieving activities after last sync failed: {e}")
+            return ActivityBatch()
 
-                descriptive_activities = asyncio.run(
-                    self._get_all_activity_details(user_activities)
-                )
-                
-                parsed_activities = self._parse_activities(descriptive_activities)
-
-            except Exception as e:
-                return f"Retrieving activities failed: {e}"
-            self.embedding_state["last_sync_timestamp"] = timestamp_str
-            self.embedding_state["total_embedded"] += len(list(user_activities))
-            self._save_embedding_state()
-        else:
-            last_sync = self.embedding_state["last_sync_timestamp"]
-            try:
-                user_activities = self.client.get_activities(after=last_sync)
-                descriptive_activities = []
-
-                descriptive_activities = asyncio.run(
-                    self._get_all_activity_details(user_activities)
-                )
-                
-                parsed_activities = self._parse_activities(descriptive_activities)
-            except Exception as e:
-                return f"Retrieving activities after last sync failed: {e}"
-            self.embedding_state["last_sync_timestamp"] = timestamp_str
-            self.embedding_state["total_embedded"] += len(list(user_activities))
-            self._save_embedding_state()
-        return parsed_activities
+        return self._parse_activities(descriptive_activities)
     
     def _convert_km_splits_to_mile_paces(self, activity):
         """
@@ -252,51 +349,29 @@ class StravaService:
         
         return km_data[-1][1] if km_data else 0
     
-    def _format_pace(self, pace_decimal_minutes):
-        """Convert decimal minutes to MM:SS format"""
-        if pace_decimal_minutes is None:
-            return None
-    
-        minutes = int(pace_decimal_minutes)
-        seconds = int((pace_decimal_minutes - minutes) * 60)
-        return f"{minutes:02d}:{seconds:02d}"
-    
+    @metrics_service.timed("strava.parse_activities")
     def _parse_activities(self,activities):
-        parsed = []
+        """Parse activity details into one columnar batch, splits are formatted only when a record is written out."""
+        parsed = ActivityBatch()
         for a in activities:
-            name = a.get("name", "Unnamed Activity")
             distance_miles = a.get("distance", 0) / 1609.34
             moving_time_sec = a.get("moving_time", 0)
-            avg_speed = a.get("average_speed", 0)
-            description = a.get("description", "No Description")
-
-            pace_min_per_mile= (moving_time_sec / 60) / distance_miles if distance_miles else None
-
-            paces_per_mile_raw= self._convert_km_splits_to_mile_paces(a)
-            paces_per_mile_min = [self._format_pace(pace) for pace in paces_per_mile_raw]
-            gear_name = a.get("gear", {}).get("name", "Unknown gear")
-            total_elevation_gain = a.get("total_elevation_gain", 0)
-            time_zone_location = a.get("timezone", "Unknown location")
-            pr_count = a.get("pr_count", 0)
-            date = a.get("start_date", None)
-
-
-            activity_json = {
-                "name": name,
-                "description": description,
-                "distance_miles": distance_miles,
-                "moving_time_sec": moving_time_sec,
-                "average_speed": avg_speed,
-                "pace_min_per_mile": pace_min_per_mile,
-                "paces_per_mile_raw": paces_per_mile_raw,
-                "paces_per_mile_mins": paces_per_mile_min,
-                "gear_name" : gear_name,
-                "total_elevation_gain" : total_elevation_gain,
-                "time_zone_location" : time_zone_location,
-                "pr_count": pr_count,
-                "date" : date
-            }
-            parsed.append(activity_json)
+
+            parsed.append(
+                activity_id=a.get("id"),
+                date=a.get("start_date", None),
+                name=a.get("name", "Unnamed Activity"),
+                description=a.get("description", "No Description"),
+                distance_miles=distance_miles,
+                moving_time_sec=moving_time_sec,
+                average_speed=a.get("average_speed", 0),
+                pace_min_per_mile=(moving_time_sec / 60) / distance_miles if distance_miles else None,
+                paces_per_mile_raw=self._convert_km_splits_to_mile_paces(a),
+                gear_name=a.get("gear", {}).get("name", "Unknown gear"),
+                total_elevation_gain=a.get("total_elevation_gain", 0),
+                time_zone_location=a.get("timezone", "Unknown location"),
+                pr_count=a.get("pr_count", 0)
+            )
 
         return parsed
 
@@ -0,0 +1,58 @@
+import os
+import numpy as np
+from server.config.config import STREAMS_DIR
+from server.services.metrics_service import metrics_service
+
+# row order of the columns inside every stream file
+STREAM_KEYS = ("time", "distance", "heartrate", "altitude", "cadence")
+
+
+class StreamStore:
+    """One float32 .npy file per activity, a row per stream, read back memory-mapped.
+
+    Each row is a contiguous column, so reading one stream only touches its own
+    pages. Streams an activity did not record are stored as NaN.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, activity_id: int):
+        return os.path.join(self.root, f"{activity_id}.npy")
+
+    def has_streams(self, activity_id: int) -> bool:
+        return os.path.exists(self._path(activity_id))
+
+    @metrics_service.timed("streams.save")
+    def save_streams(self, activity_id: int, streams: dict):
+        """Store the key_by_type response of /activities/{id}/streams."""
+        time_data = streams.get("time", {}).get("data")
+        if not time_data:
+            return False
+
+        columns = np.full((len(STREAM_KEYS), len(time_data)), np.nan, dtype=np.float32)
+        for row, key in enumerate(STREAM_KEYS):
+            data = streams.get(key, {}).get("data")
+            if data and len(data) == len(time_data):
+                columns[row] = data
+
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(activity_id)
+        # write then rename, readers never see a half written file
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, columns)
+        os.replace(path + ".tmp", path)
+        metrics_service.observe_size("streams.file", columns.nbytes)
+        return True
+
+    def load_streams(self, activity_id: int):
+        """Return a dict of read-only memory-mapped columns, or None when nothing is stored."""
+        path = self._path(activity_id)
+        if not os.path.exists(path):
+            return None
+
+        columns = np.load(path, mmap_mode="r")
+        return {key: columns[row] for row, key in enumerate(STREAM_KEYS)}
+
+
+stream_store = StreamStore(STREAMS_DIR)
@@ -0,0 +1,67 @@
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import update, or_
+from sqlalchemy.exc import IntegrityError
+from server.database.db import get_db
+from server.models.sync_job import SyncJob
+from server.config.config import SYNC_LEASE_SECONDS
+
+
+class SyncJobService:
+    """Database lease so several workers never sync the same athlete concurrently."""
+
+    def __init__(self, lease_seconds: int):
+        self.lease = timedelta(seconds=lease_seconds)
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+
+    def _utcnow(self):
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def acquire(self, athlete_id: int) -> bool:
+        db = get_db()
+        now = self._utcnow()
+        try:
+            # a conditional update is atomic on every backend, only one worker gets rowcount 1
+            result = db.execute(
+                update(SyncJob).where(
+                    SyncJob.athlete_id == athlete_id,
+                    or_(SyncJob.status != "running", SyncJob.started_at < now - self.lease)
+                ).values(status="running", worker=self.worker, started_at=now, finished_at=None, error=None)
+            )
+            if result.rowcount == 0:
+                if db.get(SyncJob, athlete_id) is not None:
+                    db.rollback()
+                    return False
+                db.add(SyncJob(athlete_id=athlete_id, status="running", worker=self.worker, started_at=now))
+            db.commit()
+            return True
+        except IntegrityError:
+            # another worker inserted the first lease for this athlete
+            db.rollback()
+            return False
+
+    def renew(self, athlete_id: int):
+        """Extend a lease this worker holds, for jobs that run longer than one lease."""
+        db = get_db()
+        db.execute(
+            update(SyncJob).where(
+                SyncJob.athlete_id == athlete_id,
+                SyncJob.worker == self.worker,
+                SyncJob.status == "running"
+            ).values(started_at=self._utcnow())
+        )
+        db.commit()
+
+    def release(self, athlete_id: int, error: str = None):
+        db = get_db()
+        db.execute(
+            update(SyncJob).where(
+                SyncJob.athlete_id == athlete_id,
+                SyncJob.worker == self.worker
+            ).values(status="failed" if error else "finished", finished_at=self._utcnow(), error=error)
+        )
+        db.commit()
+
+
+sync_job_service = SyncJobService(SYNC_LEASE_SECONDS)
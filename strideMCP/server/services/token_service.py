@@ -1,34 +1,60 @@
 import jwt
 from typing import Dict, Any
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+from stravalib import Client
+from server.database.db import get_db
+from server.models.strava_token import StravaToken
 
 load_dotenv()
 
 
 
 class TokenService:
+    """Strava tokens live in the database so every worker process sees the same ones."""
+
     def __init__(self, secret: str, algorithm: str = "HS256"):
         self.secret = secret
         self.algorithm = algorithm
-        self.access_token = None
-        self.refresh_token = None
-        self.expires_at = None
-
-    def store_token_details(self, access_token: str, expires_at: int, refresh_token: str):
-        self.access_token = access_token
-        self.expires_at = datetime.fromtimestamp(expires_at)
-        self.refresh_token = refresh_token
-
-    def get_token(self):
-        if(self.access_token and datetime.now() < self.expires_at - timedelta(minutes=5)):
-            return self.access_token
+
+    def _utcnow(self):
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def store_token_details(self, access_token: str, expires_at: int, refresh_token: str, athlete_id: int):
+        db = get_db()
+        db.merge(StravaToken(
+            athlete_id=athlete_id,
+            access_token=access_token,
+            refresh_token=refresh_token,
+            expires_at=datetime.fromtimestamp(expires_at, timezone.utc).replace(tzinfo=None),
+            updated_at=self._utcnow(),
+        ))
+        db.commit()
+
+    def get_token(self, athlete_id: int = None):
+        db = get_db()
+        query = db.query(StravaToken)
+        if athlete_id is not None:
+            query = query.filter(StravaToken.athlete_id == athlete_id)
+        token = query.order_by(StravaToken.updated_at.desc()).first()
+        if token is None:
+            return None
+
+        if self._utcnow() < token.expires_at - timedelta(minutes=5):
+            return token.access_token
         
-        if self.refresh_token:
-            # call method exchange refresh for another access token
-            print("We need to exchange the refresh for another access")
+        if token.refresh_token:
+            refreshed = Client().refresh_access_token(
+                client_id=os.getenv('CLIENT_ID'),
+                client_secret=os.getenv('CLIENT_SECRET'),
+                refresh_token=token.refresh_token
+            )
+            self.store_token_details(
+                refreshed["access_token"], refreshed["expires_at"], refreshed["refresh_token"], token.athlete_id
+            )
+            return refreshed["access_token"]
         
-        return self.access_token
+        return token.access_token
     
-token_service = TokenService(os.getenv("TOKEN_SCRET"))
\ No newline at end of file
+token_service = TokenService(os.getenv("TOKEN_SCRET"))
@@ -0,0 +1,125 @@
+import numpy as np
+from datetime import datetime, time, timedelta, timezone
+from sqlalchemy import delete, insert
+from server.database.db import get_db
+from server.database.queries import (
+    query_get_data_points_for_metric_between_dates,
+    get_first_run_date,
+    get_latest_rolling_series_row,
+)
+from server.models.rolling_metric_series import RollingMetricSeries
+from server.services.metrics_service import metrics_service
+
+# metrics whose daily totals make sense as a training load
+LOAD_METRICS = ("distance_miles", "moving_time_sec", "total_elevation_gain")
+WINDOWS = (7, 28, 42)
+LOOKBACK_DAYS = max(WINDOWS) - 1
+# the closed form EWMA divides by (1 - alpha) ** k, chunking keeps that well inside float64
+EWMA_CHUNK_DAYS = 64
+
+
+def rolling_sums(daily_totals: np.ndarray, window: int) -> np.ndarray:
+    """Trailing window sums for every day, via one cumulative sum."""
+    cumulative = np.concatenate(([0.0], np.cumsum(daily_totals)))
+    ends = np.arange(1, daily_totals.size + 1)
+    return cumulative[ends] - cumulative[np.maximum(ends - window, 0)]
+
+
+def ewma(daily_totals: np.ndarray, window: int, initial: float = 0.0) -> np.ndarray:
+    """Exponentially weighted moving average with alpha = 2 / (window + 1), continuing from initial."""
+    alpha = 2 / (window + 1)
+    decay = 1 - alpha
+    result = np.empty_like(daily_totals)
+    previous = initial
+    for start in range(0, daily_totals.size, EWMA_CHUNK_DAYS):
+        chunk = daily_totals[start:start + EWMA_CHUNK_DAYS]
+        powers = decay ** np.arange(chunk.size)
+        # e_k = decay^k * (decay * e_-1 + alpha * sum_j<=k x_j / decay^j)
+        result[start:start + chunk.size] = powers * (decay * previous + alpha * np.cumsum(chunk / powers))
+        previous = result[start + chunk.size - 1]
+    return result
+
+
+class TrainingLoadService:
+    """Maintains rolling_metric_series, recomputing only the tail a sync can have changed."""
+
+    def update(self, changed_from=None):
+        """Recompute every load metric from the changed_from date (a full rebuild when None)."""
+        db = get_db()
+        today = datetime.now(timezone.utc).date()
+        first_run = get_first_run_date()
+        if first_run is None:
+            return
+
+        try:
+            for metric_name in LOAD_METRICS:
+                self._update_metric(db, metric_name, first_run.date(), changed_from, today)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    @metrics_service.timed("training_load.update_metric")
+    def _update_metric(self, db, metric_name: str, first_day, changed_from, end_day):
+        start_day = max(changed_from or first_day, first_day)
+        previous = get_latest_rolling_series_row(metric_name, start_day)
+        if previous is None:
+            start_day = first_day
+            initial = {window: 0.0 for window in WINDOWS}
+        else:
+            # also fill the gap since the last stored day, so the EWMAs decay over rest days
+            start_day = min(start_day, previous.day + timedelta(days=1))
+            initial = {7: previous.ewma_7d, 28: previous.ewma_28d, 42: previous.ewma_42d}
+
+        if start_day > end_day:
+            return
+
+        lookback_start = start_day - timedelta(days=LOOKBACK_DAYS)
+        data_points = query_get_data_points_for_metric_between_dates(
+            metric_name,
+            datetime.combine(lookback_start, time.min),
+            datetime.combine(end_day, time.max)
+        )
+
+        day_count = (end_day - lookback_start).days + 1
+        values = np.fromiter((value for value, _ in data_points), dtype=np.float64, count=len(data_points))
+        offsets = np.fromiter(((run_date.date() - lookback_start).days for _, run_date in data_points), dtype=np.int64, count=len(data_points))
+        daily_totals = np.bincount(offsets, weights=values, minlength=day_count)
+
+        # windows see the lookback days, the stored output starts at start_day
+        sums = {window: rolling_sums(daily_totals, window)[LOOKBACK_DAYS:] for window in WINDOWS}
+        output_totals = daily_totals[LOOKBACK_DAYS:]
+        ewmas = {window: ewma(output_totals, window, initial[window]) for window in WINDOWS}
+        mean_7d = sums[7] / 7
+        mean_28d = sums[28] / 28
+        ratio = np.divide(mean_7d, mean_28d, out=np.full_like(mean_7d, np.nan), where=mean_28d > 0)
+
+        computed_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        rows = [
+            {
+                "metric_name": metric_name,
+                "day": start_day + timedelta(days=i),
+                "day_total": float(output_totals[i]),
+                "sum_7d": float(sums[7][i]),
+                "sum_28d": float(sums[28][i]),
+                "sum_42d": float(sums[42][i]),
+                "mean_7d": float(mean_7d[i]),
+                "mean_28d": float(mean_28d[i]),
+                "mean_42d": float(sums[42][i] / 42),
+                "ewma_7d": float(ewmas[7][i]),
+                "ewma_28d": float(ewmas[28][i]),
+                "ewma_42d": float(ewmas[42][i]),
+                "acute_chronic_ratio": None if np.isnan(ratio[i]) else float(ratio[i]),
+                "computed_at": computed_at,
+            }
+            for i in range(output_totals.size)
+        ]
+
+        db.execute(delete(RollingMetricSeries).where(
+            RollingMetricSeries.metric_name == metric_name,
+            RollingMetricSeries.day >= start_day
+        ))
+        db.execute(insert(RollingMetricSeries), rows)
+
+
+training_load_service = TrainingLoadService()
@@ -2,22 +2,33 @@ import os
 from stravalib import Client
 from server.services.token_service import token_service
 from server.services.qdrant_tool import qdrant_service
+from server.services.activity_store import activity_store
+from server.services.resilience_service import resilience_service, DependencyUnavailable
 from server.utils.stravaUtility import *
 from pydantic import Field
 import httpx
 import json
+import asyncio
 import urllib.parse
-from datetime import datetime, time, timezone
+from datetime import datetime, time, timezone, timedelta
 from server.database.queries import *
+from server.services.metrics_service import metrics_service
+from server.services.cache_service import tool_cache
+from server.services.stream_store import stream_store
+from server.utils.stream_analysis import best_effort, precise_splits, heart_rate_drift, METERS_PER_MILE
+from server.config.config import LISTENER_URL, LISTENER_TIMEOUT_SECONDS
+from server.database.db import run_db
 
 
 
-def authenticate_with_strava() -> str:
+@metrics_service.tool
+@resilience_service.deadline
+async def authenticate_with_strava() -> str:
     try:
         client = Client()
         url = client.authorization_url(
             client_id= os.getenv('CLIENT_ID'),
-            redirect_uri='http://127.0.0.1:5000/authorization',
+            redirect_uri=f'{LISTENER_URL}/authorization',
             scope='activity:read_all'
         )
 
@@ -45,14 +56,18 @@ def find_best_time_to_run(location: str) -> dict:
     return {"coordinates" : mapbox_response}
 
 
-def lookup_specific_run_by_date(
+@metrics_service.tool
+@resilience_service.deadline
+@tool_cache.cached
+async def lookup_specific_run_by_date(
         date: str = Field(description="Date in format YYYY-MM-DD inferred from query")
     ) -> dict:
 
-    runs = qdrant_service.search_runs_by_date(date)
+    runs = await qdrant_service.search_runs_by_date(date)
 
     run = runs[0]
     run_info = run[0]
+    await resilience_service.partial(activity_store.hydrate([run_info]))
     run_payload = getattr(run_info, "payload", False)
 
     if run_payload:
@@ -73,16 +88,20 @@ def lookup_specific_run_by_date(
 
 # RETRIEVAL_QUERY
 
-def lookup_by_retrieval_query(
+@metrics_service.tool
+@resilience_service.deadline
+@tool_cache.cached
+async def lookup_by_retrieval_query(
         retrieval_query: str = Field(description= "A general user query that will allow you to create a vector embedding and search for answer")
     ) -> dict:
     
-    vector = qdrant_service.embed_query(retrieval_query)
+    vector = await qdrant_service.embed_query(retrieval_query)
 
-    response = qdrant_service.search_for_runs_by_embedding(vector)
+    response = await qdrant_service.search_for_runs_by_embedding(vector)
 
 
     points = response.points
+    await resilience_service.partial(activity_store.hydrate(points))
     sorted_points = sorted(points, key=lambda point: point.score, reverse=True)
     higest_score_point = sorted_points[0]
     payload = getattr(higest_score_point, "payload", False)
@@ -100,16 +119,23 @@ def lookup_by_retrieval_query(
     return {"runs" : "Get attr failed"}
 
 
-def look_up_last_N_runs(
+@metrics_service.tool
+@resilience_service.deadline
+@tool_cache.cached
+async def look_up_last_N_runs(
         N: int = Field(description="An integer inferred from the user query")    
     ) -> dict:
 
-    last_n_runs = qdrant_service.search_for_runs_by_n(N)
+    last_n_runs = await qdrant_service.search_for_runs_by_n(N)
+    await resilience_service.partial(activity_store.hydrate(last_n_runs[0]))
 
     return {"last_n_runs" : last_n_runs}
 
 
-def compute_metric_historic_avg(
+@metrics_service.tool
+@resilience_service.deadline
+@tool_cache.cached
+async def compute_metric_historic_avg(
         metric_name = Field(
             description="""
                 The name of a running metric. Map the user input to one of the metrics.
@@ -122,7 +148,7 @@ def compute_metric_historic_avg(
         )   
     ) -> dict:
 
-    historic_avg = get_historic_average_by_metric(metric_name)
+    historic_avg = await run_db(get_historic_average_by_metric, metric_name)
 
     key = metric_name + " historic average"
 
@@ -130,7 +156,10 @@ def compute_metric_historic_avg(
         key : historic_avg
     }
 
-def compute_metric_by_date_range(
+@metrics_service.tool
+@resilience_service.deadline
+@tool_cache.cached
+async def compute_metric_by_date_range(
         metric_name: str = Field(description="""
                 The name of a running metric. Map the user input to one of the metrics.
                 1. distance_miles
@@ -148,13 +177,16 @@ def compute_metric_by_date_range(
     # I might have to convert these to UTC, verify accuracy of this approach
     start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
     end_date_obj = datetime.strptime(end_date, "%Y-%m-%d").replace(hour=23, minute=59, second=59, microsecond=999999)
-    avg_between_dates = get_average_by_metric_between_dates(metric_name, start_date_obj, end_date_obj)
+    avg_between_dates = await run_db(get_average_by_metric_between_dates, metric_name, start_date_obj, end_date_obj)
     key = metric_name + " average for " + time_range
     return {
         key : avg_between_dates
     }
 
-def get_data_points_for_metric_between_dates(
+@metrics_service.tool
+@resilience_service.deadline
+@tool_cache.cached
+async def get_data_points_for_metric_between_dates(
         metric_name: str = Field(description="""
                 The name of a running metric. Map the user input to one of the metrics.
                 1. distance_miles
@@ -171,7 +203,7 @@ def get_data_points_for_metric_between_dates(
 
     start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
     end_date_obj = datetime.strptime(end_date, "%Y-%m-%d").replace(hour=23, minute=59, second=59, microsecond=999999)
-    data_points = query_get_data_points_for_metric_between_dates(metric_name, start_date_obj, end_date_obj)
+    data_points = await run_db(query_get_data_points_for_metric_between_dates, metric_name, start_date_obj, end_date_obj)
 
     formatted_points = [
         {
@@ -182,21 +214,32 @@ def get_data_points_for_metric_between_dates(
     ]
 
     try:
-        response = httpx.post(
-            "http://localhost:5000/plotMetricsOverTime",
-            json={"data_points": formatted_points}
-        )
+        async with httpx.AsyncClient(timeout=LISTENER_TIMEOUT_SECONDS) as client:
+            response = await resilience_service.call(
+                "listener",
+                client.post,
+                f"{LISTENER_URL}/plotMetricsOverTime",
+                json={"data_points": formatted_points}
+            )
+        metrics_service.observe_size("listener.chart_html", len(response.content))
+    except DependencyUnavailable:
+        # the data points are still worth returning without their chart
+        return {"data points": formatted_points}
     except Exception as e:
         return {
-            "error" : e
+            "error" : str(e)
         }
 
     if response.status_code == 200:
         return {
-            "data points" : data_points,
+            "data points" : formatted_points,
             "INSTRUCTIONS_IMPORTANT" : "RENDER THIS CHART HTML",
             "chart_html" : response.text
         }
+    return {
+        "data points": formatted_points,
+        "error": f"The chart could not be rendered, the listener answered {response.status_code}"
+    }
     # data = {
     #     "data_points" : formatted_points
     # }
@@ -205,5 +248,224 @@ def get_data_points_for_metric_between_dates(
     # encoded = urllib.parse.quote(json_str)
 
     # chart_url = f"http://localhost:5000/plotMetricsOverTime?payload={encoded}"
-    
 
+
+
+async def _load_streams_for_date(date: str):
+    records, _ = await qdrant_service.search_runs_by_date(date)
+    for record in records:
+        activity_id = record.payload["run"].get("activity_id")
+        if activity_id and stream_store.has_streams(activity_id):
+            return activity_id, stream_store.load_streams(activity_id)
+    return None, None
+
+
+NO_STREAMS_MESSAGE = "No stream data is stored for a run on this date. Streams are only ingested when INGEST_STREAMS is enabled."
+
+
+@metrics_service.tool
+@resilience_service.deadline
+@tool_cache.cached
+async def find_best_effort_in_run(
+        date: str = Field(description="Date in format YYYY-MM-DD inferred from query"),
+        distance_meters: float = Field(description="Effort distance in meters, e.g. 400, 1000, 1609.34 for a mile or 5000")
+    ) -> dict:
+
+    if distance_meters <= 0:
+        raise ValueError(f"distance_meters must be greater than 0, got {distance_meters}")
+
+    activity_id, streams = await _load_streams_for_date(date)
+    if streams is None:
+        return {"error": NO_STREAMS_MESSAGE}
+
+    effort = best_effort(streams["time"], streams["distance"], distance_meters)
+    if effort is None:
+        return {"error": f"The run on {date} is shorter than {distance_meters} meters"}
+
+    return {
+        "activity_id": activity_id,
+        "best_effort": effort
+    }
+
+
+@metrics_service.tool
+@resilience_service.deadline
+@tool_cache.cached
+async def get_precise_splits_for_run(
+        date: str = Field(description="Date in format YYYY-MM-DD inferred from query"),
+        split_meters: float = Field(default=METERS_PER_MILE, description="Split length in meters, 1609.34 for miles or 1000 for kilometers")
+    ) -> dict:
+
+    if split_meters <= 0:
+        raise ValueError(f"split_meters must be greater than 0, got {split_meters}")
+
+    activity_id, streams = await _load_streams_for_date(date)
+    if streams is None:
+        return {"error": NO_STREAMS_MESSAGE}
+
+    return {
+        "activity_id": activity_id,
+        "splits": precise_splits(streams["time"], streams["distance"], split_meters)
+    }
+
+
+@metrics_service.tool
+@resilience_service.deadline
+@tool_cache.cached
+async def compute_heart_rate_drift_for_run(
+        date: str = Field(description="Date in format YYYY-MM-DD inferred from query")
+    ) -> dict:
+
+    activity_id, streams = await _load_streams_for_date(date)
+    if streams is None:
+        return {"error": NO_STREAMS_MESSAGE}
+
+    drift = heart_rate_drift(streams["time"], streams["distance"], streams["heartrate"])
+    if drift is None:
+        return {"error": f"The run on {date} has no heart rate data"}
+
+    return {
+        "activity_id": activity_id,
+        "heart_rate_drift": drift
+    }
+
+
+@metrics_service.tool
+@resilience_service.deadline
+@tool_cache.cached
+async def get_training_load_trend(
+        metric_name: str = Field(description="""
+                The name of a running metric to compute training load from. Map the user input to one of the metrics.
+                1. distance_miles
+                2. moving_time_sec
+                3. total_elevation_gain
+            """
+        ),
+        start_date: str = Field(description="From the user query infer the start date in YYYY-MM-DD format."),
+        end_date: str = Field(description="From the user query infer the end date in YYYY-MM-DD format.")
+    ) -> dict:
+
+    start_day = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end_day = datetime.strptime(end_date, "%Y-%m-%d").date()
+
+    rows = await run_db(get_rolling_series_between_dates, metric_name, start_day, end_day)
+    if not rows and await run_db(get_latest_rolling_series_row, metric_name, end_day + timedelta(days=1)) is None:
+        # the series is built by syncs, backfills and compact-metrics, a read never writes it
+        return {
+            "metric_name": metric_name,
+            "series": [],
+            "INSTRUCTIONS": "The training load series has not been built yet. It is built by the next sync, or right away by running compact-metrics."
+        }
+
+    series = [
+        {
+            "date": row.day.strftime("%Y-%m-%d"),
+            "day_total": row.day_total,
+            "sum_7d": row.sum_7d,
+            "sum_28d": row.sum_28d,
+            "ewma_7d": row.ewma_7d,
+            "ewma_28d": row.ewma_28d,
+            "ewma_42d": row.ewma_42d,
+            "acute_chronic_ratio": row.acute_chronic_ratio,
+        }
+        for row in rows
+    ]
+
+    return {
+        "metric_name": metric_name,
+        "series": series,
+        "INSTRUCTIONS": "sum_7d is the acute load and sum_28d the chronic load. An acute_chronic_ratio between 0.8 and 1.3 is usually considered a safe progression."
+    }
+
+
+@metrics_service.tool
+@resilience_service.deadline
+@tool_cache.cached
+async def get_training_overview(
+        retrieval_query: str = Field(description= "A general user query that will allow you to create a vector embedding and search for answer"),
+        metric_name: str = Field(description="""
+                The name of a running metric. Map the user input to one of the metrics.
+                1. distance_miles
+                2. moving_time_sec
+                3. average_speed
+                4. pace_min_per_mile
+                5. total_elevation_gain
+            """
+        ),
+        start_date: str = Field(description="From the user query infer the start date in YYYY-MM-DD format."),
+        end_date: str = Field(description="From the user query infer the end date in YYYY-MM-DD format.")
+    ) -> dict:
+
+    start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
+    end_date_obj = datetime.strptime(end_date, "%Y-%m-%d").replace(hour=23, minute=59, second=59, microsecond=999999)
+
+    async def closest_runs():
+        vector = await qdrant_service.embed_query(retrieval_query)
+        response = await qdrant_service.search_for_runs_by_embedding(vector)
+        await resilience_service.partial(activity_store.hydrate(response.points))
+        return sorted(response.points, key=lambda point: point.score, reverse=True)
+
+    # the embedding round trip and the SQL aggregates are independent, run them all at once,
+    # a part whose dependency is unavailable is left empty and the rest is still returned
+    matches, avg_between_dates, historic_avg, data_points = await asyncio.gather(
+        resilience_service.partial(closest_runs(), []),
+        resilience_service.partial(run_db(get_average_by_metric_between_dates, metric_name, start_date_obj, end_date_obj)),
+        resilience_service.partial(run_db(get_historic_average_by_metric, metric_name)),
+        resilience_service.partial(run_db(query_get_data_points_for_metric_between_dates, metric_name, start_date_obj, end_date_obj), [])
+    )
+
+    return {
+        "best_match": matches[0] if matches else None,
+        "matches": matches,
+        "best_match_chart_url": encode_run_for_charts(matches[0].payload) if matches else None,
+        metric_name + " average between dates": avg_between_dates,
+        metric_name + " historic average": historic_avg,
+        "runs between dates": len(data_points)
+    }
+
+
+
+def _summarize_run(payload):
+    run = payload["run"]
+    return {
+        "activity_id": run.get("activity_id"),
+        "date": payload.get("date"),
+        "name": run.get("name"),
+        "distance_miles": run.get("distance_miles"),
+        "pace_min_per_mile": run.get("pace_min_per_mile"),
+        "total_elevation_gain": run.get("total_elevation_gain"),
+        "paces_per_mile_mins": run.get("paces_per_mile_mins"),
+        "features": payload.get("features"),
+    }
+
+
+@metrics_service.tool
+@resilience_service.deadline
+@tool_cache.cached
+async def find_similar_runs(
+        date: str = Field(default=None, description="Date in format YYYY-MM-DD of the run to compare against, inferred from query"),
+        activity_id: int = Field(default=None, description="Strava activity id of the run to compare against, use it instead of date when known"),
+        limit: int = Field(default=5, description="How many similar runs to return")
+    ) -> dict:
+
+    if not await qdrant_service.ahas_named_vectors():
+        return {"error": "Similar run search needs the run feature vectors, run the reindex job to add them"}
+    if activity_id is None and date is None:
+        return {"error": "Pass the date or the activity id of the run to compare against"}
+
+    seed = await qdrant_service.get_run_with_features(activity_id=activity_id, date=date)
+    if seed is None:
+        return {"error": "No run found to compare against"}
+
+    response = await qdrant_service.search_similar_runs(seed, limit)
+    # the splits in each summary are only in the full records
+    await resilience_service.partial(activity_store.hydrate([seed, *response.points]))
+
+    return {
+        "run": _summarize_run(seed.payload),
+        "similar_runs": [
+            {**_summarize_run(point.payload), "feature_distance": point.score}
+            for point in response.points
+        ],
+        "INSTRUCTIONS": "Runs are compared on distance, pace, elevation gain per mile and how even and how negative their mile splits were. A lower feature_distance means a more similar run."
+    }
@@ -0,0 +1,176 @@
+import math
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+
+def format_pace(pace_decimal_minutes):
+    """Convert decimal minutes to MM:SS format"""
+    if pace_decimal_minutes is None:
+        return None
+
+    minutes = int(pace_decimal_minutes)
+    seconds = int((pace_decimal_minutes - minutes) * 60)
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def parse_start(date) -> datetime:
+    """Start time as a naive UTC datetime, matching the UTC database session."""
+    date_str = str(date).replace("Z", "+00:00")
+    return datetime.fromisoformat(date_str).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def start_epoch(date) -> int:
+    date_str = str(date).replace("Z", "+00:00")
+    return int(datetime.fromisoformat(date_str).timestamp())
+
+
+@dataclass(slots=True)
+class ActivityRecord:
+    """One parsed activity, mile splits in a float array and formatted only when a record is written out.
+
+    Defaults are the ones the activity text falls back to, so a record built
+    from a partial payload reads the same as the payload did. Runs stored by
+    the first releases have no activity id, theirs is None.
+    """
+    activity_id: int
+    date: str
+    name: str = "Unnamed Activity"
+    description: str = "No description provided."
+    distance_miles: float = 0
+    moving_time_sec: int = 0
+    average_speed: float = 0
+    pace_min_per_mile: float = 0
+    paces_per_mile_raw: array = field(default_factory=lambda: array("d"))
+    gear_name: str = "Unknown gear"
+    total_elevation_gain: float = 0
+    time_zone_location: str = "Unknown location"
+    pr_count: int = 0
+
+    @property
+    def paces_per_mile_mins(self) -> list:
+        return [format_pace(pace) for pace in self.paces_per_mile_raw]
+
+    @property
+    def start_datetime(self) -> datetime:
+        return parse_start(self.date)
+
+    @property
+    def start_epoch(self) -> int:
+        return start_epoch(self.date)
+
+    def to_dict(self) -> dict:
+        """The record as stored and returned by the tools."""
+        return {
+            "activity_id": self.activity_id,
+            "name": self.name,
+            "description": self.description,
+            "distance_miles": self.distance_miles,
+            "moving_time_sec": self.moving_time_sec,
+            "average_speed": self.average_speed,
+            "pace_min_per_mile": self.pace_min_per_mile,
+            "paces_per_mile_raw": self.paces_per_mile_raw.tolist(),
+            "paces_per_mile_mins": self.paces_per_mile_mins,
+            "gear_name": self.gear_name,
+            "total_elevation_gain": self.total_elevation_gain,
+            "time_zone_location": self.time_zone_location,
+            "pr_count": self.pr_count,
+            "date": self.date
+        }
+
+    @classmethod
+    def from_dict(cls, run: dict) -> "ActivityRecord":
+        """Build a record from a stored or payload run, formatted paces are dropped and rebuilt on output."""
+        values = {name: run[name] for name in cls.__dataclass_fields__ if name in run}
+        values.setdefault("activity_id", None)
+        values["paces_per_mile_raw"] = array("d", run.get("paces_per_mile_raw") or [])
+        return cls(**values)
+
+
+class ActivityBatch:
+    """Activities parsed in one sync, kept column by column.
+
+    Numeric fields live in typed arrays and every activity's mile splits in one
+    shared float array with offsets, so a large sync allocates a handful of
+    buffers instead of a dict and two lists per activity. Indexing or iterating
+    builds an ActivityRecord copy for code that works on one activity at a time,
+    changing it leaves the batch as it was.
+    """
+
+    # missing paces are stored as NaN and handed back as None
+    FLOAT_COLUMNS = ("distance_miles", "average_speed", "pace_min_per_mile")
+    INT_COLUMNS = ("activity_id", "start_epoch", "moving_time_sec", "pr_count")
+    # total_elevation_gain is kept as given, the activity text prints it verbatim
+    OBJECT_COLUMNS = ("date", "name", "description", "gear_name", "total_elevation_gain", "time_zone_location")
+
+    def __init__(self):
+        self.columns = {}
+        for name in self.FLOAT_COLUMNS:
+            self.columns[name] = array("d")
+        for name in self.INT_COLUMNS:
+            self.columns[name] = array("q")
+        for name in self.OBJECT_COLUMNS:
+            self.columns[name] = []
+        self.splits = array("d")
+        self.split_offsets = array("q", [0])
+
+    def append(self, activity_id: int, date: str, paces_per_mile_raw, **values):
+        columns = self.columns
+        columns["activity_id"].append(activity_id)
+        columns["date"].append(date)
+        columns["start_epoch"].append(start_epoch(date))
+        for name in self.FLOAT_COLUMNS:
+            value = values[name]
+            columns[name].append(math.nan if value is None else value)
+        for name in ("moving_time_sec", "pr_count"):
+            columns[name].append(values[name])
+        for name in self.OBJECT_COLUMNS[1:]:
+            columns[name].append(values[name])
+        self.splits.extend(paces_per_mile_raw)
+        self.split_offsets.append(len(self.splits))
+
+    def __len__(self):
+        return len(self.columns["activity_id"])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i: int) -> ActivityRecord:
+        # split offsets are read at i and i + 1, so negative indexes are resolved first
+        i = range(len(self))[i]
+        columns = self.columns
+        pace = columns["pace_min_per_mile"][i]
+        return ActivityRecord(
+            activity_id=columns["activity_id"][i],
+            date=columns["date"][i],
+            name=columns["name"][i],
+            description=columns["description"][i],
+            distance_miles=columns["distance_miles"][i],
+            moving_time_sec=columns["moving_time_sec"][i],
+            average_speed=columns["average_speed"][i],
+            pace_min_per_mile=None if math.isnan(pace) else pace,
+            paces_per_mile_raw=self.splits[self.split_offsets[i]:self.split_offsets[i + 1]],
+            gear_name=columns["gear_name"][i],
+            total_elevation_gain=columns["total_elevation_gain"][i],
+            time_zone_location=columns["time_zone_location"][i],
+            pr_count=columns["pr_count"][i],
+        )
+
+    @property
+    def activity_ids(self) -> array:
+        return self.columns["activity_id"]
+
+    @property
+    def start_epochs(self) -> array:
+        return self.columns["start_epoch"]
+
+    def start_datetimes(self) -> list:
+        return [parse_start(date) for date in self.columns["date"]]
+
+    def values(self, name: str) -> list:
+        """A column as python values, with missing paces back to None."""
+        column = self.columns[name]
+        if name in self.FLOAT_COLUMNS:
+            return [None if math.isnan(value) else value for value in column]
+        return list(column)
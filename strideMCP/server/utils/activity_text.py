@@ -0,0 +1,40 @@
+from server.utils.activity_record import ActivityRecord
+
+# bump whenever activity_to_paragraph changes, the reindex job re-embeds every point
+# embedded with an older version
+TEMPLATE_VERSION = 1
+
+
+def activity_to_paragraph(activity: ActivityRecord):
+    name = activity.name
+    description = activity.description
+    distance = activity.distance_miles
+    moving_time = activity.moving_time_sec
+    avg_speed = activity.average_speed
+    pace = activity.pace_min_per_mile
+    gear = activity.gear_name
+    elevation = activity.total_elevation_gain
+    location = activity.time_zone_location
+    pr_count = activity.pr_count
+
+    # the text has never listed the mile splits, adding them would re-embed every point
+    paces_str = "N/A"
+
+    minutes = moving_time // 60
+    seconds = moving_time % 60
+    time_str = f"{minutes} minutes {seconds} seconds"
+
+    paragraph = (
+        f"Activity titled '{name}' took place in {location}. "
+        f"It was described as: {description}. "
+        f"The run covered a distance of {distance:.2f} miles "
+        f"with a total moving time of {time_str}. "
+        f"The average speed was {avg_speed:.2f} miles per hour, "
+        f"corresponding to a pace of {pace:.2f} minutes per mile. "
+        f"Paces for each mile were: {paces_str}. "
+        f"The run was completed using {gear}. "
+        f"Total elevation gain was {elevation} feet. "
+        f"This activity recorded {pr_count} personal records."
+    )
+
+    return paragraph
@@ -0,0 +1,54 @@
+import time
+import asyncio
+import threading
+
+
+class TokenBucket:
+    """`rate` tokens per second in bursts of up to `burst`, a caller taking more than are left waits for the rest."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def _reserve(self, count: int) -> float:
+        """Take count tokens, going into debt when short, and return the seconds until the debt is paid off."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= count
+        return max(0.0, -self.tokens / self.rate)
+
+
+class AsyncRateLimiter(TokenBucket):
+    """Token bucket shared by concurrent coroutines, `rate` acquisitions per second in bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        super().__init__(rate, burst)
+        # created on first use, inside the event loop that uses it
+        self.lock = None
+
+    async def acquire(self, count: int = 1):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+
+        # waiting while holding the lock serves the callers in the order they arrived
+        async with self.lock:
+            delay = self._reserve(count)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+
+class RateLimiter(TokenBucket):
+    """Blocking form of AsyncRateLimiter, for jobs that run without an event loop."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        super().__init__(rate, burst)
+        self.lock = threading.Lock()
+
+    def acquire(self, count: int = 1):
+        with self.lock:
+            delay = self._reserve(count)
+            if delay > 0:
+                time.sleep(delay)
@@ -0,0 +1,43 @@
+import numpy as np
+from server.utils.activity_record import ActivityRecord
+
+# each feature is divided by the spread it typically has between two runs, so a unit
+# step in any dimension is roughly as meaningful as in any other under euclidean distance
+FEATURE_SCALES = {
+    "distance_miles": 3.0,
+    "pace_min_per_mile": 1.0,
+    "elevation_per_mile": 30.0,
+    # coefficient of variation of the mile splits, how even the effort was
+    "split_variation": 0.03,
+    # second half mean pace over first half minus one, negative for a negative split
+    "split_trend": 0.03,
+}
+FEATURE_NAMES = tuple(FEATURE_SCALES)
+FEATURE_DIMENSIONS = len(FEATURE_NAMES)
+
+
+def raw_features(run: ActivityRecord) -> dict:
+    """Human readable feature values for a run, computed from the parsed activity."""
+    distance = run.distance_miles or 0.0
+    # the split array's buffer is read in place
+    splits = np.frombuffer(run.paces_per_mile_raw, dtype=np.float64)
+
+    split_variation = 0.0
+    split_trend = 0.0
+    if splits.size >= 2 and splits.mean() > 0:
+        split_variation = float(splits.std() / splits.mean())
+        half = splits.size // 2
+        split_trend = float(splits[-half:].mean() / splits[:half].mean() - 1)
+
+    return {
+        "distance_miles": float(distance),
+        "pace_min_per_mile": float(run.pace_min_per_mile or 0.0),
+        "elevation_per_mile": float(run.total_elevation_gain or 0.0) / distance if distance else 0.0,
+        "split_variation": split_variation,
+        "split_trend": split_trend,
+    }
+
+
+def feature_vector(features: dict) -> list:
+    """Scale raw feature values into the vector stored on each point."""
+    return [features[name] / FEATURE_SCALES[name] for name in FEATURE_NAMES]
@@ -1,8 +1,12 @@
 import json
 import urllib.parse
+from server.config.config import LISTENER_URL
 
 def encode_run_for_charts(payload):
-    raw_mile_splits = payload["run"]["paces_per_mile_raw"]
+    raw_mile_splits = payload["run"].get("paces_per_mile_raw")
+    # a run summary whose full record could not be loaded has no splits to chart
+    if raw_mile_splits is None:
+        return None
 
     data = {
         "raw_mile_splits" : raw_mile_splits
@@ -11,6 +15,6 @@ def encode_run_for_charts(payload):
     json_str = json.dumps(data)
     encoded = urllib.parse.quote(json_str)
 
-    return f"http://localhost:5000/plotRunData?payload={encoded}"
+    return f"{LISTENER_URL}/plotRunData?payload={encoded}"
 
 # def plot_metrics_from_db():
\ No newline at end of file
@@ -0,0 +1,105 @@
+import numpy as np
+
+METERS_PER_MILE = 1609.34
+
+
+def _clean_distance(distance):
+    """GPS distance streams can dip slightly, searches below need it non-decreasing."""
+    distance = np.nan_to_num(np.asarray(distance, dtype=np.float64), nan=0.0)
+    return np.maximum.accumulate(distance)
+
+
+def best_effort(time, distance, target_meters: float):
+    """Fastest time over target_meters anywhere in the activity.
+
+    For every sample the end of the effort is found with one searchsorted over
+    the cumulative distance and interpolated between the bracketing samples, so
+    the whole scan is O(n log n) with no Python loop.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    distance = _clean_distance(distance)
+    if distance.size < 2 or distance[-1] - distance[0] < target_meters:
+        return None
+
+    targets = distance + target_meters
+    ends = np.searchsorted(distance, targets, side="left")
+    starts = np.nonzero(ends < distance.size)[0]
+    ends = ends[starts]
+
+    previous = ends - 1
+    span = distance[ends] - distance[previous]
+    fraction = np.divide(targets[starts] - distance[previous], span, out=np.ones_like(span), where=span > 0)
+    end_times = time[previous] + fraction * (time[ends] - time[previous])
+    durations = end_times - time[starts]
+
+    best = int(np.argmin(durations))
+    start = starts[best]
+    return {
+        "distance_meters": float(target_meters),
+        "elapsed_seconds": float(durations[best]),
+        "pace_min_per_mile": float(durations[best] / 60 / (target_meters / METERS_PER_MILE)),
+        "start_offset_seconds": float(time[start] - time[0]),
+        "start_distance_meters": float(distance[start]),
+    }
+
+
+def precise_splits(time, distance, split_meters: float = METERS_PER_MILE):
+    """Splits of split_meters each, timed by interpolating the stream at every boundary."""
+    time = np.asarray(time, dtype=np.float64)
+    distance = _clean_distance(distance)
+    if distance.size < 2 or distance[-1] <= distance[0]:
+        return []
+
+    marks = np.arange(distance[0] + split_meters, distance[-1], split_meters)
+    boundaries = np.concatenate(([distance[0]], marks, [distance[-1]]))
+    boundary_times = np.interp(boundaries, distance, time)
+
+    split_distances = np.diff(boundaries)
+    split_seconds = np.diff(boundary_times)
+    paces = split_seconds / 60 / (split_distances / METERS_PER_MILE)
+
+    return [
+        {
+            "split": i + 1,
+            "distance_meters": round(float(d), 1),
+            "elapsed_seconds": round(float(s), 1),
+            "pace_min_per_mile": round(float(p), 3),
+        }
+        for i, (d, s, p) in enumerate(zip(split_distances, split_seconds, paces))
+    ]
+
+
+def heart_rate_drift(time, distance, heartrate):
+    """Aerobic decoupling: how much speed per heart beat falls from the first half to the second."""
+    time = np.asarray(time, dtype=np.float64)
+    distance = _clean_distance(distance)
+    heartrate = np.asarray(heartrate, dtype=np.float64)
+
+    recorded = ~np.isnan(heartrate) & (heartrate > 0)
+    if recorded.sum() < 4:
+        return None
+    time, distance, heartrate = time[recorded], distance[recorded], heartrate[recorded]
+
+    middle = int(np.searchsorted(time, time[0] + (time[-1] - time[0]) / 2))
+    halves = []
+    for lo, hi in ((0, middle), (middle, time.size - 1)):
+        elapsed = time[hi] - time[lo]
+        if elapsed <= 0:
+            return None
+        speed = (distance[hi] - distance[lo]) / elapsed
+        average_heartrate = float(heartrate[lo:hi + 1].mean())
+        halves.append({
+            "average_heartrate": round(average_heartrate, 1),
+            "pace_min_per_mile": round(float(METERS_PER_MILE / speed / 60), 3) if speed > 0 else None,
+            "efficiency": speed / average_heartrate,
+        })
+
+    first, second = halves
+    decoupling = (first["efficiency"] - second["efficiency"]) / first["efficiency"] * 100
+    for half in halves:
+        del half["efficiency"]
+    return {
+        "first_half": first,
+        "second_half": second,
+        "decoupling_percent": round(float(decoupling), 2),
+    }
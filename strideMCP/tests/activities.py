@@ -0,0 +1,13 @@
+from server.utils.activity_record import ActivityBatch
+
+
+def activity_batch(*activity_ids) -> ActivityBatch:
+    """A batch with one short run per activity id, activity n starting on June n, 2025."""
+    batch = ActivityBatch()
+    for activity_id in activity_ids:
+        batch.append(
+            activity_id, f"2025-06-{activity_id:02d}T07:00:00Z", [8.0],
+            distance_miles=1.0, average_speed=3.0, pace_min_per_mile=8.0, moving_time_sec=480, pr_count=0,
+            name="Run", description="", gear_name="Shoes", total_elevation_gain=0, time_zone_location="UTC",
+        )
+    return batch
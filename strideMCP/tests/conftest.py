@@ -0,0 +1,20 @@
+import tempfile
+import pytest
+from benchmarks.stand_ins import HashEmbedder, configure_environment, reset_stores
+
+WORKDIR = tempfile.mkdtemp(prefix="stride-tests-")
+# server modules read their configuration when they are first imported
+configure_environment(WORKDIR, "http://127.0.0.1:9")
+
+
+@pytest.fixture
+def stores(request):
+    """An empty Qdrant collection and a fresh sqlite database for one test."""
+    from server.services.qdrant_tool import qdrant_service
+    from server.database.db import get_db
+
+    qdrant_service.embedder = HashEmbedder()
+    qdrant_service.embedding_model = qdrant_service.embedder.model
+    reset_stores(WORKDIR, request.node.name)
+    yield get_db()
+    get_db().remove()
@@ -0,0 +1,36 @@
+import uuid
+from qdrant_client.models import PointStruct
+from server.services.qdrant_tool import qdrant_service, TEXT_VECTOR, FEATURES_VECTOR
+from server.utils.run_features import FEATURE_DIMENSIONS
+
+
+def baseline_run(date: str) -> dict:
+    """A run as the first releases parsed it, without an activity id."""
+    return {
+        "name": "Morning Run",
+        "description": "easy",
+        "distance_miles": 5.0,
+        "moving_time_sec": 2700,
+        "average_speed": 3.0,
+        "pace_min_per_mile": 9.0,
+        "paces_per_mile_raw": [9.1, 9.0, 8.9, 9.0, 9.0],
+        "paces_per_mile_mins": ["09:06", "09:00", "08:54", "09:00", "09:00"],
+        "gear_name": "Unknown gear",
+        "total_elevation_gain": 12.0,
+        "time_zone_location": "(GMT+00:00) Europe/London",
+        "pr_count": 0,
+        "date": date
+    }
+
+
+def add_baseline_point(run: dict):
+    """Store run the way the first releases did, under a random id with the whole run in the payload."""
+    vector = qdrant_service.embedder.embed_query(run["name"])
+    qdrant_service.client.upsert(
+        collection_name=qdrant_service.collection_name,
+        points=[PointStruct(
+            id=str(uuid.uuid4()),
+            vector={TEXT_VECTOR: vector, FEATURES_VECTOR: [0.0] * FEATURE_DIMENSIONS},
+            payload={"run": run, "date": run["date"][:10], "time_stamp": 0, "strava_id": "1"}
+        )]
+    )
@@ -0,0 +1,27 @@
+import pytest
+from server.utils.activity_record import ActivityBatch
+
+
+def _batch():
+    batch = ActivityBatch()
+    for activity_id, splits in ((1, [8.0, 8.5]), (2, [7.5]), (3, [9.0, 9.1, 9.2])):
+        batch.append(
+            activity_id, f"2024-03-0{activity_id}T07:00:00Z", splits,
+            distance_miles=len(splits), average_speed=3.0, pace_min_per_mile=8.0,
+            moving_time_sec=600, pr_count=0, name="Run", description="", gear_name="Shoes",
+            total_elevation_gain=10, time_zone_location="UTC",
+        )
+    return batch
+
+
+def test_negative_indexes_read_from_the_end():
+    batch = _batch()
+    assert batch[-1].activity_id == 3
+    assert batch[-1].paces_per_mile_raw.tolist() == [9.0, 9.1, 9.2]
+    assert batch[-3].paces_per_mile_raw.tolist() == [8.0, 8.5]
+
+
+@pytest.mark.parametrize("i", [3, -4])
+def test_out_of_range_indexes_raise_index_error(i):
+    with pytest.raises(IndexError):
+        _batch()[i]
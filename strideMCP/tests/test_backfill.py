@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+from server.database.queries import get_sync_state
+from server.jobs.backfill import BackfillJob, _epoch
+from server.models.sync_state import SyncState
+from activities import activity_batch
+
+ATHLETE_ID = 7
+
+
+def _job(after: str, before: str = "2025-12-01") -> BackfillJob:
+    job = BackfillJob("token", after=_epoch(after), before=_epoch(before))
+    job.strava.athlete_id = ATHLETE_ID
+    return job
+
+
+def _store_cursor(db, day: str):
+    db.add(SyncState(
+        athlete_id=ATHLETE_ID, last_start_time=_epoch(day), last_activity_id=1, total_embedded=10,
+        updated_at=datetime.now(timezone.utc)
+    ))
+    db.commit()
+
+
+def test_backfill_after_the_cursor_leaves_it_in_place(stores):
+    _store_cursor(stores, "2025-03-01")
+    job = _job(after="2025-06-01")
+    job.newest = (_epoch("2025-06-10"), 99)
+
+    job._update_sync_state()
+
+    assert get_sync_state(ATHLETE_ID).last_start_time == _epoch("2025-03-01")
+
+
+def test_backfill_reaching_back_to_the_cursor_advances_it(stores):
+    _store_cursor(stores, "2025-03-01")
+    job = _job(after="2025-02-01")
+    job.newest = (_epoch("2025-06-10"), 99)
+
+    job._update_sync_state()
+
+    assert (get_sync_state(ATHLETE_ID).last_start_time, get_sync_state(ATHLETE_ID).last_activity_id) == job.newest
+
+
+def test_rerun_does_not_count_activities_again(stores):
+    _store_cursor(stores, "2025-03-01")
+    first = _job(after="2025-06-01")
+    first.embedded += first._commit_window(_epoch("2025-06-01"), _epoch("2025-07-01"), activity_batch(2, 3))
+    first.newest = (_epoch("2025-06-03"), 3)
+    first._update_sync_state()
+
+    # a run with its checkpoints gone, or other windows, fetches the same activities again
+    rerun = _job(after="2025-05-15")
+    rerun.embedded += rerun._commit_window(_epoch("2025-05-15"), _epoch("2025-07-01"), activity_batch(2, 3, 4))
+    rerun.newest = (_epoch("2025-06-04"), 4)
+    rerun._update_sync_state()
+
+    assert (first.embedded, rerun.embedded) == (2, 1)
+    assert get_sync_state(ATHLETE_ID).total_embedded == 13
@@ -0,0 +1,28 @@
+import asyncio
+from sqlalchemy import text
+from server.services.cache_service import ToolResultCache
+from server.services.resilience_service import resilience_service
+
+
+def test_version_read_ends_its_transaction(stores):
+    cache = ToolResultCache()
+    assert cache._read_shared_version() == 0
+    assert not stores().in_transaction()
+
+
+def test_failed_version_check_bypasses_the_cache_without_degrading_the_answer(stores):
+    stores.execute(text("DROP TABLE data_versions"))
+    stores.commit()
+    cache = ToolResultCache(version_check_seconds=0)
+    calls = []
+
+    @resilience_service.deadline
+    @cache.cached
+    async def tool(n: int):
+        calls.append(n)
+        return {"n": n}
+
+    assert asyncio.run(tool(1)) == {"n": 1}
+    assert asyncio.run(tool(1)) == {"n": 1}
+    assert calls == [1, 1]
+    assert cache.stats()["entries"] == 0
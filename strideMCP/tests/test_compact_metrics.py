@@ -0,0 +1,43 @@
+from datetime import datetime
+from sqlalchemy import select
+from server.jobs.compact_metrics import CompactMetricsJob
+from server.models.rolling_average_snapshots import RollingAverageSnapshots
+from server.models.snapshot_metrics import SnapshotMetrics
+from server.services.qdrant_tool import qdrant_service
+from server.utils.activity_record import ActivityRecord
+from legacy_points import baseline_run, add_baseline_point
+
+
+def _add_snapshot(db, date_of_run, snapshot_date, activity_id=None):
+    snapshot = RollingAverageSnapshots(activity_id=activity_id, date_of_run=date_of_run, snapshot_date=snapshot_date)
+    snapshot.metrics.append(SnapshotMetrics(
+        activity_id=activity_id,
+        date_of_run=date_of_run,
+        metric_name="distance_miles",
+        metric_value=5.0,
+        metric_unit=""
+    ))
+    db.add(snapshot)
+
+
+def test_baseline_points_leave_their_snapshots_unlinked(stores):
+    db = stores
+    legacy_start = datetime(2024, 3, 2, 7, 0)
+    keyed_start = datetime(2024, 3, 4, 7, 0)
+    add_baseline_point(baseline_run("2024-03-02T07:00:00Z"))
+    keyed = ActivityRecord.from_dict({**baseline_run("2024-03-04T07:00:00Z"), "activity_id": 42})
+    qdrant_service.insert_points([keyed], ["keyed run"])
+
+    # every sync used to store its own copy of each run
+    for synced_at in (datetime(2024, 3, 5), datetime(2024, 3, 6)):
+        _add_snapshot(db, legacy_start, synced_at)
+        _add_snapshot(db, keyed_start, synced_at)
+    db.commit()
+
+    CompactMetricsJob().run()
+
+    snapshots = db.execute(
+        select(RollingAverageSnapshots.date_of_run, RollingAverageSnapshots.activity_id).order_by(RollingAverageSnapshots.date_of_run)
+    ).all()
+    assert snapshots == [(legacy_start, None), (keyed_start, 42)]
+    assert len(db.execute(select(SnapshotMetrics)).all()) == 2
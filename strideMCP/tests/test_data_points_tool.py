@@ -0,0 +1,54 @@
+import json
+import asyncio
+import httpx
+from datetime import datetime
+from server.tools import strava_tools
+from server.tools.strava_tools import get_data_points_for_metric_between_dates
+from server.services.cache_service import tool_cache
+from server.services.resilience_service import DependencyUnavailable
+from server.models.rolling_average_snapshots import RollingAverageSnapshots
+from server.models.snapshot_metrics import SnapshotMetrics
+
+
+def _call():
+    return asyncio.run(get_data_points_for_metric_between_dates(
+        metric_name="distance_miles", start_date="2025-09-01", end_date="2025-09-30", time_range="September"
+    ))
+
+
+def _fail_listener(monkeypatch, error):
+    calls = []
+    database_call = strava_tools.resilience_service.call
+
+    async def call(dependency, func, *args, **kwargs):
+        if dependency != "listener":
+            return await database_call(dependency, func, *args, **kwargs)
+        calls.append(dependency)
+        raise error
+    monkeypatch.setattr(strava_tools.resilience_service, "call", call)
+    return calls
+
+
+def test_points_without_their_chart_serialize(stores, monkeypatch):
+    run_date = datetime(2025, 9, 11, 7, 30)
+    snapshot = RollingAverageSnapshots(activity_id=1, date_of_run=run_date, snapshot_date=run_date)
+    snapshot.metrics.append(SnapshotMetrics(activity_id=1, date_of_run=run_date, metric_name="distance_miles", metric_value=5.0, metric_unit=""))
+    stores.add(snapshot)
+    stores.commit()
+    tool_cache.clear()
+    _fail_listener(monkeypatch, DependencyUnavailable("listener", "timeout"))
+
+    result = _call()
+
+    assert result["data points"] == [{"value": 5.0, "date": "2025-09-11 07:30:00"}]
+    json.dumps(result)
+
+
+def test_errors_are_strings_and_not_cached(stores, monkeypatch):
+    tool_cache.clear()
+    calls = _fail_listener(monkeypatch, httpx.InvalidURL("bad listener url"))
+
+    assert _call() == {"error": "bad listener url"}
+    _call()
+
+    assert calls == ["listener", "listener"]
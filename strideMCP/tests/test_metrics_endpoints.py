@@ -0,0 +1,16 @@
+from starlette.testclient import TestClient
+from server.main import mcp
+from server.services.metrics_service import metrics_service
+
+
+def test_mcp_http_app_exports_its_process_metrics():
+    metrics_service.stage_calls.inc(stage="tool.look_up_last_N_runs", outcome="ok")
+    client = TestClient(mcp.streamable_http_app())
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert 'stage="tool.look_up_last_N_runs"' in metrics.text
+
+    stats = client.get("/cache/stats")
+    assert stats.status_code == 200
+    assert "hit_rate" in stats.json()
@@ -0,0 +1,62 @@
+import asyncio
+from qdrant_client.models import DeleteAlias, DeleteAliasOperation, VectorParams, Distance
+from server.services.qdrant_tool import qdrant_service, COLLECTION_PREFIX
+
+
+def _refuse_blocking_reads(monkeypatch):
+    def get_collection(*args, **kwargs):
+        raise AssertionError("the layout was read with a blocking call")
+    monkeypatch.setattr(qdrant_service.client, "get_collection", get_collection)
+
+
+def test_alias_swap_caches_the_layout(stores, monkeypatch):
+    qdrant_service.swap_alias(qdrant_service.create_collection_version())
+    _refuse_blocking_reads(monkeypatch)
+
+    assert qdrant_service.has_named_vectors()
+    assert asyncio.run(qdrant_service.ahas_named_vectors())
+
+
+def test_async_layout_check_goes_through_the_async_call(stores, monkeypatch):
+    calls = []
+
+    async def call_async(method, **kwargs):
+        calls.append(method)
+        return qdrant_service.client.get_collection(**kwargs)
+
+    qdrant_service._layout_checked_at = float("-inf")
+    monkeypatch.setattr(qdrant_service, "_call_async", call_async)
+
+    assert asyncio.run(qdrant_service.ahas_named_vectors())
+    assert calls == ["get_collection"]
+
+
+def _drop_alias():
+    qdrant_service.client.update_collection_aliases(change_aliases_operations=[
+        DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=qdrant_service.collection_name))
+    ])
+
+
+def test_ensure_collection_creates_the_first_collection(stores):
+    live = qdrant_service.resolve_collection()
+    qdrant_service.ensure_collection()
+    assert qdrant_service.resolve_collection() == live
+
+    _drop_alias()
+    qdrant_service.ensure_collection()
+
+    created = qdrant_service.resolve_collection()
+    assert created not in (None, live)
+    assert qdrant_service.has_named_vectors()
+
+
+def test_ensure_collection_adopts_the_collection_from_before_aliases(stores):
+    qdrant_service.client.create_collection(
+        collection_name=COLLECTION_PREFIX,
+        vectors_config=VectorParams(size=qdrant_service.embedder.dimensions, distance=Distance.COSINE)
+    )
+    _drop_alias()
+    qdrant_service.ensure_collection()
+
+    assert qdrant_service.resolve_collection() == COLLECTION_PREFIX
+    assert not qdrant_service.has_named_vectors()
@@ -0,0 +1,14 @@
+from server.utils import rate_limiter
+from server.utils.rate_limiter import TokenBucket
+
+
+def test_taking_more_than_the_burst_waits_for_the_rest(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=10, burst=2)
+
+    assert bucket._reserve(2) == 0
+    assert bucket._reserve(5) == 0.5
+    now[0] += 0.5
+    # the debt is paid off, the next token refills in another tenth of a second
+    assert bucket._reserve(1) == 0.1
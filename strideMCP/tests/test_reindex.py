@@ -0,0 +1,47 @@
+from server.jobs.reindex import ReindexJob
+from server.services.activity_store import activity_store
+from server.services.qdrant_tool import qdrant_service
+from server.utils.activity_record import ActivityRecord
+from server.utils.activity_text import activity_to_paragraph
+from legacy_points import baseline_run, add_baseline_point
+
+
+def _points():
+    records, _ = qdrant_service.client.scroll(collection_name=qdrant_service.collection_name, limit=100, with_payload=True)
+    return records
+
+
+def test_reindex_keeps_baseline_points_without_activity_id(stores):
+    baseline = baseline_run("2024-03-02T07:00:00Z")
+    add_baseline_point(baseline)
+    # a point from after activity ids, still carrying its full run in the payload
+    add_baseline_point({**baseline_run("2024-03-04T07:00:00Z"), "activity_id": 42})
+    baseline_id = next(r.id for r in _points() if "activity_id" not in r.payload["run"])
+
+    ReindexJob().run()
+
+    points = {r.payload["run"]["activity_id"]: r for r in _points()}
+    assert set(points) == {None, 42}
+    assert points[None].id == baseline_id
+    assert points[None].payload["run"]["paces_per_mile_raw"] == baseline["paces_per_mile_raw"]
+    assert points[None].payload["embedding"]["model"] == qdrant_service.embedding_model
+    assert "paces_per_mile_raw" not in points[42].payload["run"]
+    assert set(activity_store.load_many([42])) == {42}
+
+
+def test_reindex_copies_points_ingest_changed_during_the_copy(stores, monkeypatch):
+    before = ActivityRecord.from_dict({**baseline_run("2024-03-04T07:00:00Z"), "activity_id": 42, "name": "Easy run"})
+    qdrant_service.insert_points([before], [activity_to_paragraph(before)])
+    swap_alias = qdrant_service.swap_alias
+
+    def ingest_then_swap(target):
+        # the alias still points at the old collection, as it does for a sync running alongside the copy
+        after = ActivityRecord.from_dict({**before.to_dict(), "name": "Tempo run"})
+        qdrant_service.insert_points([after], [activity_to_paragraph(after)])
+        swap_alias(target)
+    monkeypatch.setattr(qdrant_service, "swap_alias", ingest_then_swap)
+
+    ReindexJob().run()
+
+    [point] = _points()
+    assert point.payload["run"]["name"] == "Tempo run"
@@ -0,0 +1,34 @@
+import httpx
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from server.services.resilience_service import _is_dependency_failure
+
+
+def _status_error(status_code):
+    request = httpx.Request("GET", "http://strava.test")
+    return httpx.HTTPStatusError("", request=request, response=httpx.Response(status_code, request=request))
+
+
+@pytest.mark.parametrize("error", [
+    httpx.ConnectError("refused"),
+    httpx.ReadTimeout("slow"),
+    TimeoutError(),
+    OperationalError("SELECT 1", {}, Exception("server closed the connection")),
+    ResponseHandlingException(Exception("bad gateway")),
+    UnexpectedResponse(503, "Service Unavailable", b"", httpx.Headers()),
+    _status_error(502),
+])
+def test_transport_timeout_and_5xx_errors_are_failures(error):
+    assert _is_dependency_failure(error)
+
+
+@pytest.mark.parametrize("error", [
+    _status_error(404),
+    UnexpectedResponse(400, "Bad Request", b"", httpx.Headers()),
+    IntegrityError("INSERT", {}, Exception("duplicate key")),
+    ValueError("bad argument"),
+    KeyError("activity_id"),
+])
+def test_other_errors_are_not_failures(error):
+    assert not _is_dependency_failure(error)
@@ -0,0 +1,40 @@
+from array import array
+import pytest
+from server.utils.activity_record import ActivityRecord
+from server.utils.run_features import raw_features, feature_vector, FEATURE_DIMENSIONS
+
+
+def _run(splits, **fields):
+    return ActivityRecord(activity_id=1, date="2025-06-01T07:00:00Z", paces_per_mile_raw=array("d", splits), **fields)
+
+
+def test_raw_features_of_a_positive_split_run():
+    features = raw_features(_run([8.0, 8.0, 9.0, 9.0], distance_miles=4.0, pace_min_per_mile=8.5, total_elevation_gain=120))
+
+    assert features == {
+        "distance_miles": 4.0,
+        "pace_min_per_mile": 8.5,
+        "elevation_per_mile": 30.0,
+        "split_variation": pytest.approx(0.5 / 8.5),
+        "split_trend": pytest.approx(0.125),
+    }
+
+
+def test_split_trend_skips_the_middle_mile_of_an_odd_split_count():
+    assert raw_features(_run([8.0, 12.0, 10.0], distance_miles=3.0))["split_trend"] == pytest.approx(0.25)
+    assert raw_features(_run([9.0, 8.0], distance_miles=2.0))["split_trend"] == pytest.approx(8 / 9 - 1)
+
+
+def test_runs_without_distance_or_splits_have_zero_features():
+    features = raw_features(_run([8.0], total_elevation_gain=50))
+
+    assert features == dict.fromkeys(features, 0.0)
+
+
+def test_feature_vector_divides_by_the_scales():
+    features = raw_features(_run([8.0, 8.0, 9.0, 9.0], distance_miles=4.0, pace_min_per_mile=8.5, total_elevation_gain=120))
+
+    vector = feature_vector(features)
+
+    assert len(vector) == FEATURE_DIMENSIONS
+    assert vector == pytest.approx([4.0 / 3.0, 8.5, 1.0, 0.5 / 8.5 / 0.03, 0.125 / 0.03])
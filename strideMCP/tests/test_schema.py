@@ -0,0 +1,49 @@
+import os
+import pytest
+from sqlalchemy import create_engine, text
+from benchmarks.explain import populate, capture, sqlite_problems, RANGE_START, RANGE_END
+from server.database import queries
+from server.database.db import init_db, get_db
+from server.database.schema import SchemaOutdated
+from server.jobs.compact_metrics import CompactMetricsJob
+from conftest import WORKDIR
+
+# the snapshot tables as the first releases created them
+OLD_SCHEMA = (
+    "CREATE TABLE rolling_average_snapshots (id INTEGER PRIMARY KEY, date_of_run DATETIME NOT NULL, snapshot_date DATETIME NOT NULL)",
+    "CREATE TABLE snapshot_metrics (id INTEGER PRIMARY KEY, snapshot_id INTEGER NOT NULL REFERENCES rolling_average_snapshots (id), "
+    "metric_name VARCHAR NOT NULL, metric_value FLOAT NOT NULL, metric_unit VARCHAR NOT NULL)",
+    "INSERT INTO rolling_average_snapshots (id, date_of_run, snapshot_date) VALUES (1, '2024-03-02 07:00:00', '2024-03-05 00:00:00')",
+    "INSERT INTO snapshot_metrics (snapshot_id, metric_name, metric_value, metric_unit) VALUES (1, 'distance_miles', 5.0, '')",
+)
+
+
+def test_old_schema_fails_at_startup_until_compact_metrics_runs(stores):
+    url = f"sqlite:///{os.path.join(WORKDIR, 'old_schema.db')}"
+    with create_engine(url).begin() as connection:
+        for statement in OLD_SCHEMA:
+            connection.execute(text(statement))
+    get_db().remove()
+
+    with pytest.raises(SchemaOutdated, match="compact-metrics"):
+        init_db(url)
+
+    init_db(url, check_schema=False)
+    CompactMetricsJob(link_activities=False).run()
+    get_db().remove()
+    init_db(url)
+
+    assert queries.get_historic_average_by_metric("distance_miles") == {"average": 5.0}
+
+
+@pytest.mark.parametrize("query, args", [
+    (queries.get_historic_average_by_metric, ("distance_miles",)),
+    (queries.get_average_by_metric_between_dates, ("distance_miles", RANGE_START, RANGE_END)),
+    (queries.query_get_data_points_for_metric_between_dates, ("distance_miles", RANGE_START, RANGE_END)),
+])
+def test_metric_queries_read_snapshot_metrics_through_its_index(stores, query, args):
+    populate(stores, 300)
+
+    for statement, parameters in capture(stores, query, *args):
+        details, problems = sqlite_problems(stores, statement, parameters)
+        assert problems == [], details
@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy.exc import OperationalError
+from server.models.sync_state import SyncState
+from server.services.cache_service import tool_cache
+from server.services import strava_service
+from server.services.strava_service import StravaService
+from activities import activity_batch
+
+
+def test_failed_commit_invalidates_the_cache_and_raises(stores, monkeypatch):
+    service = StravaService("token")
+    service.sync_state = SyncState(athlete_id=7, last_start_time=0, last_activity_id=0, total_embedded=0, updated_at=datetime.now(timezone.utc))
+
+    def fail(db, activities):
+        raise OperationalError("INSERT", {}, Exception("server closed the connection"))
+    monkeypatch.setattr(service, "_replace_snapshots", fail)
+    version = tool_cache._read_shared_version()
+
+    with pytest.raises(OperationalError):
+        service._store_snapshots_and_metrics(activity_batch(2))
+
+    assert tool_cache._read_shared_version() == tool_cache.data_version == version + 1
+
+
+def test_activity_details_are_fetched_a_few_at_a_time(stores, monkeypatch):
+    service = StravaService("token")
+    in_flight = []
+    most = 0
+
+    async def get_activity_details(activity_id):
+        nonlocal most
+        in_flight.append(activity_id)
+        most = max(most, len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(activity_id)
+        return {"id": activity_id}
+    monkeypatch.setattr(service, "_get_activity_details", get_activity_details)
+    monkeypatch.setattr(strava_service, "STRAVA_MAX_CONCURRENT_REQUESTS", 3)
+
+    details = asyncio.run(service._get_all_activity_details([{"id": n} for n in range(10)]))
+
+    assert details == [{"id": n} for n in range(10)]
+    assert most == 3
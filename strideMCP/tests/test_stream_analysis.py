@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from server.utils.stream_analysis import best_effort, precise_splits, heart_rate_drift
+
+
+def _stream(*segments):
+    """Time and distance sampled every second over (seconds, meters per second) segments."""
+    speeds = np.concatenate([np.full(seconds, speed, dtype=np.float64) for seconds, speed in segments])
+    return np.arange(speeds.size + 1, dtype=np.float64), np.concatenate(([0.0], np.cumsum(speeds)))
+
+
+def test_best_effort_finds_the_fast_segment():
+    time, distance = _stream((500, 3.0), (200, 5.0), (300, 3.0))
+
+    effort = best_effort(time, distance, 1000)
+
+    assert effort["elapsed_seconds"] == pytest.approx(200)
+    assert effort["start_offset_seconds"] == 500
+    assert effort["start_distance_meters"] == 1500
+    assert effort["pace_min_per_mile"] == pytest.approx(200 / 60 / (1000 / 1609.34))
+
+
+def test_best_effort_interpolates_between_samples_and_ignores_gps_dips():
+    time, distance = _stream((100, 4.0))
+    distance[50] -= 10
+
+    assert best_effort(time, distance, 302)["elapsed_seconds"] == pytest.approx(75.5)
+    assert best_effort(time, distance, 401) is None
+
+
+def test_precise_splits_end_exactly_on_a_boundary():
+    time, distance = _stream((750, 4.0))
+
+    splits = precise_splits(time, distance, 1000)
+
+    assert [(s["distance_meters"], s["elapsed_seconds"]) for s in splits] == [(1000, 250), (1000, 250), (1000, 250)]
+
+
+def test_precise_splits_keep_the_partial_last_split():
+    time, distance = _stream((250, 4.0), (140, 5.0))
+
+    splits = precise_splits(time, distance, 1000)
+
+    assert [(s["distance_meters"], s["elapsed_seconds"]) for s in splits] == [(1000, 250), (700, 140)]
+    assert splits[1]["pace_min_per_mile"] == round(140 / 60 / (700 / 1609.34), 3)
+
+
+def test_heart_rate_drift_compares_speed_per_beat_between_halves():
+    time, distance = _stream((50, 4.0), (50, 3.0))
+    heartrate = np.full(time.size, 150.0)
+
+    drift = heart_rate_drift(time, distance, heartrate)
+
+    assert drift["first_half"]["average_heartrate"] == 150
+    assert drift["decoupling_percent"] == 25.0
+
+
+def test_heart_rate_drift_needs_recorded_heart_rate():
+    time, distance = _stream((100, 4.0))
+    heartrate = np.full(time.size, np.nan)
+    heartrate[:3] = 150
+
+    assert heart_rate_drift(time, distance, heartrate) is None
@@ -0,0 +1,15 @@
+import asyncio
+import pytest
+from server.tools.strava_tools import find_best_effort_in_run, get_precise_splits_for_run
+
+
+@pytest.mark.parametrize("distance_meters", [0, -400])
+def test_best_effort_rejects_distances_that_are_not_positive(stores, distance_meters):
+    with pytest.raises(ValueError, match="distance_meters must be greater than 0"):
+        asyncio.run(find_best_effort_in_run(date="2024-03-02", distance_meters=distance_meters))
+
+
+@pytest.mark.parametrize("split_meters", [0, -1000])
+def test_precise_splits_rejects_splits_that_are_not_positive(stores, split_meters):
+    with pytest.raises(ValueError, match="split_meters must be greater than 0"):
+        asyncio.run(get_precise_splits_for_run(date="2024-03-02", split_meters=split_meters))
@@ -0,0 +1,110 @@
+import asyncio
+import numpy as np
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select
+from server.jobs.compact_metrics import CompactMetricsJob
+from server.models.rolling_average_snapshots import RollingAverageSnapshots
+from server.models.rolling_metric_series import RollingMetricSeries
+from server.models.snapshot_metrics import SnapshotMetrics
+from server.services.training_load_service import training_load_service, rolling_sums, ewma, EWMA_CHUNK_DAYS
+from server.tools.strava_tools import get_training_load_trend
+
+
+def _series_rows(db):
+    return db.execute(select(func.count()).select_from(RollingMetricSeries)).scalar()
+
+
+def _add_run(db, activity_id, date_of_run, distance=5.0):
+    snapshot = RollingAverageSnapshots(activity_id=activity_id, date_of_run=date_of_run, snapshot_date=date_of_run)
+    snapshot.metrics.append(SnapshotMetrics(
+        activity_id=activity_id, date_of_run=date_of_run, metric_name="distance_miles", metric_value=distance, metric_unit=""
+    ))
+    db.add(snapshot)
+
+
+def test_trend_tool_does_not_build_the_series(stores):
+    start = datetime.now() - timedelta(days=3)
+    _add_run(stores, 1, start)
+    stores.commit()
+    day = start.strftime("%Y-%m-%d")
+
+    trend = asyncio.run(get_training_load_trend(metric_name="distance_miles", start_date=day, end_date=day))
+
+    assert trend["series"] == []
+    assert "compact-metrics" in trend["INSTRUCTIONS"]
+    assert _series_rows(stores) == 0
+
+
+def test_compact_metrics_builds_the_series(stores):
+    start = datetime.now() - timedelta(days=3)
+    _add_run(stores, 1, start)
+    stores.commit()
+    CompactMetricsJob(link_activities=False).run()
+    day = start.strftime("%Y-%m-%d")
+
+    trend = asyncio.run(get_training_load_trend(metric_name="distance_miles", start_date=day, end_date=day))
+
+    assert [point["day_total"] for point in trend["series"]] == [5.0]
+
+
+def _naive_ewma(values, window, initial=0.0):
+    alpha = 2 / (window + 1)
+    result = []
+    for value in values:
+        initial = alpha * value + (1 - alpha) * initial
+        result.append(initial)
+    return result
+
+
+def _daily_totals(days):
+    return np.random.default_rng(7).choice([0.0, 3.0, 5.5, 10.0], size=days)
+
+
+def test_rolling_sums_match_trailing_windows():
+    totals = _daily_totals(60)
+
+    sums = rolling_sums(totals, 7)
+
+    assert sums == pytest.approx([totals[max(i - 6, 0):i + 1].sum() for i in range(totals.size)])
+
+
+@pytest.mark.parametrize("window", [7, 42])
+def test_ewma_matches_the_recurrence_across_chunks(window):
+    totals = _daily_totals(EWMA_CHUNK_DAYS * 3 + 5)
+
+    assert ewma(totals, window, 4.0) == pytest.approx(_naive_ewma(totals, window, 4.0))
+
+
+def test_ewma_continued_from_its_last_value_matches_one_pass():
+    totals = _daily_totals(200)
+    head = ewma(totals[:90], 28)
+
+    tail = ewma(totals[90:], 28, head[-1])
+
+    assert np.concatenate((head, tail)) == pytest.approx(ewma(totals, 28))
+
+
+def test_incremental_update_matches_a_full_rebuild(stores):
+    start = datetime.now() - timedelta(days=150)
+    for n in range(40):
+        _add_run(stores, n + 1, start + timedelta(days=3 * n + n % 2), distance=3.0 + n % 5)
+    stores.commit()
+    training_load_service.update()
+
+    latest = start + timedelta(days=140)
+    _add_run(stores, 100, latest, distance=13.1)
+    stores.commit()
+    training_load_service.update(latest.date())
+    incremental = stores.execute(select(RollingMetricSeries).order_by(RollingMetricSeries.metric_name, RollingMetricSeries.day)).scalars().all()
+    incremental = [(row.metric_name, row.day, row.sum_42d, row.ewma_7d, row.ewma_42d) for row in incremental]
+
+    stores.execute(delete(RollingMetricSeries))
+    stores.commit()
+    training_load_service.update()
+    rebuilt = stores.execute(select(RollingMetricSeries).order_by(RollingMetricSeries.metric_name, RollingMetricSeries.day)).scalars().all()
+
+    assert len(incremental) == len(rebuilt) > 140
+    for row, (metric_name, day, sum_42d, ewma_7d, ewma_42d) in zip(rebuilt, incremental):
+        assert (row.metric_name, row.day) == (metric_name, day)
+        assert (row.sum_42d, row.ewma_7d, row.ewma_42d) == pytest.approx((sum_42d, ewma_7d, ewma_42d))